@@ -1,59 +1,89 @@
 # bank.py
 from mesa import Agent
-from agents.consumer import Consumer
-from transactions import Transaction
+import numpy as np
+from agents.loanbook import LoanBook
+from history import make_history
 
 class CentralBank(Agent):
-    def __init__(self, unique_id, model, initial_money_supply, base_interest_rate):
+    def __init__(self, unique_id, model, initial_money_supply, base_interest_rate, amortization_rate=0.0,
+                 history_retention=None):
         super().__init__(unique_id, model)
         self.money_supply = initial_money_supply
         self.base_interest_rate = base_interest_rate
+        self.amortization_rate = amortization_rate  # Share of outstanding principal repaid each step
         self.total_loans = 0
         self.bankrupted_firms = 0
         self.bankrupted_consumers = 0
-        self.price_history = []
-        
+        self.price_history = make_history(history_retention)
+        self.loan_book = LoanBook()
+
     def step(self):
         self.lend_to_agents()
-        
-    def calculate_loan_interest_rate(self, credit_score):
-        return max(0.01, self.base_interest_rate * (2 - credit_score))
-    
+
     def approve_loan(self, agent, amount):
-        if amount > self.money_supply * 0.1:  # Limit loan to 10% of money supply
-            return False, 0
-        
-        interest_rate = self.calculate_loan_interest_rate(agent.credit_score)
-        self.total_loans += amount
+        # Approve loan without considering credit score
+        if self.money_supply > amount:
+            return True, self.base_interest_rate
+        return False, 0
+
+    def issue_loan(self, agent, amount, interest_rate):
         self.money_supply -= amount  # Money is lent out, so decrease supply
-        agent.loans.append((amount, interest_rate))
-        return True, interest_rate
+        self.loan_book.issue(agent, amount, interest_rate, self.model.current_step)
+        self.model.add_transaction(self.unique_id, agent.unique_id, amount, 'loan')
 
     def lend_to_agents(self):
-        for agent in self.model.schedule.agents:
-            if isinstance(agent, Consumer) and not agent.bankrupt:
-                needed_capital = agent.calculate_needed_capital()
-                approved, interest_rate = self.approve_loan(agent, needed_capital)
-
-                if approved:
-                    loan_amount = needed_capital
-                    agent.money += loan_amount
-                    self.money_supply -= loan_amount
-                    self.total_loans += loan_amount
-                    agent.debt += loan_amount  # Ensure you have a debt attribute in Consumer class
-                    print(f"Lent {loan_amount} to Consumer {agent.unique_id}. Total debt now: {agent.debt}")
-
-    def approve_loan(self, agent, needed_capital):
-        # Approve loan without considering credit score
-        if(self.money_supply > needed_capital):
-            return True, self.base_interest_rate
-        else:
-            return False, 0
-        
+        borrower_ids = []
+        amounts = []
+        for agent in self.model.registry.active_consumers.values():
+            needed_capital = agent.calculate_needed_capital()
+            approved, interest_rate = self.approve_loan(agent, needed_capital)
+
+            if approved:
+                loan_amount = needed_capital
+                agent.money += loan_amount
+                self.money_supply -= loan_amount
+                self.total_loans += loan_amount
+                agent.debt += loan_amount  # Ensure you have a debt attribute in Consumer class
+                self.model.events.emit("bank_loan", agent.unique_id, loan_amount, agent.debt)
+                borrower_ids.append(agent.unique_id)
+                amounts.append(loan_amount)
+        self.model.add_transactions([self.unique_id] * len(borrower_ids), borrower_ids, amounts, 'loan')
+
+    def service_loans(self):
+        # Collect interest and amortization on every loan in one pass. Which
+        # borrowers can cover what is due this step is decided for all of them at
+        # once; only the payments and the defaults (which go bankrupt) touch agents
+        book = self.loan_book
+        if not len(book):
+            return
+        _, principal, interest_due, principal_due = book.dues(self.amortization_rate)
+        total_due = interest_due + principal_due
+        borrowers = book.borrowers
+        owing = np.array([index for index in np.flatnonzero(total_due > 0).tolist()
+                          if not borrowers[index].bankrupt], dtype=np.int64)
+        funds = np.fromiter((borrowers[index].funds for index in owing.tolist()), dtype=np.float64,
+                            count=len(owing))
+        amounts = total_due[owing]
+        covered = amounts <= funds
+        paid, payments = owing[covered].tolist(), amounts[covered].tolist()
+        payer_ids = []
+        for index, amount in zip(paid, payments):
+            borrower = borrowers[index]
+            borrower.repay(amount)
+            payer_ids.append(borrower.unique_id)
+        self.money_supply = sum(payments, self.money_supply)  # Add payments back to bank's supply
+        self.model.events.emit_many("interest_paid", payer_ids, payments)
+        for index, amount in zip(owing[~covered].tolist(), amounts[~covered].tolist()):
+            borrower = borrowers[index]
+            self.model.events.emit("interest_default", borrower.unique_id, amount)
+            borrower.bankrupt = True
+        # Interest and amortization land in the ledger together as 'interest' rows
+        self.model.add_transactions(payer_ids, [self.unique_id] * len(paid), payments, 'interest')
+        if self.amortization_rate and paid:
+            book.repay(paid, principal)
+        book.compact()
+
     def update_inflation_rate(self, firm_prices):
         if firm_prices:
             average_price = sum(firm_prices) / len(firm_prices)
             self.inflation_rate = (average_price / self.money_supply) * 100  # Simple inflation calculation
-
-    def step(self):
-        self.lend_to_agents()
@@ -1,33 +1,94 @@
 # consumer.py
+import math
 from mesa import Agent
-from transactions import Transaction
 
 class Consumer(Agent):
+    __slots__ = ('unique_id', 'model', 'pos', '_money', 'initial_money', 'watch_floor', 'satisfaction_threshold',
+                 '_employer', '_bankrupt', '_satisfaction', 'debt')
+
     def __init__(self, unique_id, model, initial_money, satisfaction_threshold):
         super().__init__(unique_id, model)
-        self.money = initial_money
+        self._bankrupt = False
         self.initial_money = initial_money
+        self.watch_floor = -math.inf  # Money below this queues the consumer; set by the model that adds it
+        self.money = initial_money
         self.satisfaction_threshold = satisfaction_threshold
-        self.employer = None
-        self.bankrupt = False
-        self.loans = []  # Keep track of loans
-        self.satisfaction = 1.0  # Satisfaction level (1.0 = fully satisfied)
+        self._employer = None
+        self._satisfaction = 1.0  # Satisfaction level (1.0 = fully satisfied)
         self.debt = 0  # Initialize debt
 
+    # Satisfaction, employment and bankruptcy changes are reported to the model's
+    # aggregates and registry, and money falling under the watch floor to its
+    # threshold watch
+    @property
+    def money(self):
+        return self._money
+
+    @money.setter
+    def money(self, value):
+        self._money = value
+        if value < self.watch_floor and not self._bankrupt:
+            self.model.watch.consumer_below(self)
+
+    @property
+    def satisfaction(self):
+        return self._satisfaction
+
+    @satisfaction.setter
+    def satisfaction(self, value):
+        if not self._bankrupt:
+            self.model.aggregates.satisfaction_changed(self._satisfaction, value)
+        self._satisfaction = value
+
+    @property
+    def employer(self):
+        return self._employer
+
+    @employer.setter
+    def employer(self, firm):
+        was_employed = self._employer is not None
+        self._employer = firm
+        if not self._bankrupt and was_employed != (firm is not None):
+            self.model.employment_changed(self, was_employed)
+
+    @property
+    def bankrupt(self):
+        return self._bankrupt
+
+    @bankrupt.setter
+    def bankrupt(self, value):
+        if value and not self._bankrupt:
+            self._bankrupt = True
+            self.model.consumer_bankrupted(self)
+        elif not value and self._bankrupt:
+            self._bankrupt = False
+            self.model.consumer_restored(self)
+
     def step(self):
         if not self.bankrupt:
+            if self.model.market is not None:
+                # The goods market settles the order after the schedule and then
+                # finishes the step, so satisfaction and borrowing see the purchase
+                self.model.market.order(self)
+                return
             self.make_purchase()
-            self.update_satisfaction()
-            self.service_loans()
+            self.finish_step()
+
+    def finish_step(self):
+        self.update_satisfaction()
+        self.service_loans()
 
     def make_purchase(self):
-        # Simulate making a purchase
         if self.employer:
-            purchase_amount = min(self.money, self.employer.price)
-            if purchase_amount > 0:
-                self.money -= purchase_amount
-                transaction = Transaction(self.employer, self, purchase_amount, 'purchase')
-                self.model.add_transaction(transaction)
+            self.buy_from(self.employer)
+
+    def buy_from(self, firm):
+        purchase_amount = min(self.money, firm.price)
+        if purchase_amount > 0:
+            self.money -= purchase_amount
+            self.model.add_transaction(firm.unique_id, self.unique_id, purchase_amount, 'purchase')
+            return True
+        return False
 
     def calculate_needed_capital(self):
         # Get the average price of goods from the model
@@ -63,23 +124,24 @@ class Consumer(Agent):
             loan_needed = basic_expenditure - self.money
             if loan_needed > self.get_borrowing_limit():  # Check if the loan needed is within borrowing limit
                 loan_needed = self.get_borrowing_limit()  # Cap it at borrowing limit
-            if self.request_loan(loan_needed):  # Attempt to request the loan
-                print(f"Consumer {self.unique_id} requested loan: {loan_needed}")
-        else:
-            # If they can cover expenditures, handle existing loans
-            for loan in self.loans[:]:
-                amount, rate = loan
-                interest_payment = amount * rate
-
-                if interest_payment > self.money:  # Check if they can pay interest
-                    print(f"Consumer {self.unique_id} unable to pay interest, going bankrupt.")
-                    self.bankrupt = True
-                    return
-                else:
-                    self.money -= interest_payment  # Pay the interest
-                    self.debt = max(0,self.debt-interest_payment)  # Decrease debt
-                    self.model.central_bank.money_supply += interest_payment  # Add payment back to bank's supply
-                    print(f"Consumer {self.unique_id} repaid interest: {interest_payment}")
+            self.request_loan(loan_needed)  # Attempt to request the loan
+        # Interest on existing loans is collected by CentralBank.service_loans
+
+    def receive_wage(self, amount):
+        self.money += amount
+
+    @property
+    def funds(self):
+        # What the consumer can put towards its loan payments
+        return self._money
+
+    def repay(self, amount):
+        # Pay the bank; returns False if the consumer can't cover it
+        if amount > self.money:
+            return False
+        self.money -= amount
+        self.debt = max(0, self.debt - amount)  # Decrease debt
+        return True
 
     def request_loan(self, amount):
         # Ensure the loan request is reasonable and the bank has enough funds
@@ -88,9 +150,8 @@ class Consumer(Agent):
             if approved:
                 self.money += amount
                 self.debt += amount
-                self.model.central_bank.money_supply -= amount
-                print(f"Loan approved for Consumer {self.unique_id}: Amount={amount}, Rate={interest_rate}")
-                self.loans.append((amount, interest_rate))
+                self.model.central_bank.issue_loan(self, amount, interest_rate)
+                self.model.events.emit("consumer_loan_approved", self.unique_id, amount, interest_rate)
                 return True
-        print(f"Loan request denied for Consumer {self.unique_id}: Requested={amount}")
+        self.model.events.emit("consumer_loan_denied", self.unique_id, amount)
         return False
@@ -1,34 +1,78 @@
 # firm.py
+import math
 from mesa import Agent
-import numpy as np
-from transactions import Transaction
+from history import make_history
 
 class Firm(Agent):
-    def __init__(self, unique_id, model, initial_capital, market_volatility):
+    # Slots for every attribute, mesa's included, so they live in fixed fields. mesa's
+    # Agent has no __slots__, so instances still have a __dict__; it only holds what
+    # is attached on top (the profiler's timing wrappers, for instance)
+    __slots__ = ('unique_id', 'model', 'pos', '_capital', 'initial_capital', 'watch_floor', '_price',
+                 'production_capacity', 'inventory', 'employees', 'market_volatility', '_bankrupt', 'wage',
+                 'costs_history')
+
+    def __init__(self, unique_id, model, initial_capital, market_volatility, history_retention=None):
         super().__init__(unique_id, model)
-        self.capital = initial_capital
+        self._bankrupt = False
         self.initial_capital = initial_capital
-        self.price = max(1, initial_capital * 0.01)
+        self.watch_floor = -math.inf  # Capital below this queues the firm; set by the model that adds it
+        self._capital = initial_capital
+        self._price = max(1, initial_capital * 0.01)
         self.production_capacity = max(1, int(initial_capital / 1000))
         self.inventory = 0
         self.employees = []
-        self.loans = []
         self.market_volatility = market_volatility
-        self.bankrupt = False
         self.wage = 2000
-        self.costs_history = []
+        self.costs_history = make_history(history_retention)  # Unbounded unless a retention is given
+
+    # Price and bankruptcy changes are reported to the model's aggregates and registry,
+    # capital changes to its labor market and capital falling under the watch floor
+    # to its threshold watch
+    @property
+    def capital(self):
+        return self._capital
+
+    @capital.setter
+    def capital(self, value):
+        self._capital = value
+        if not self._bankrupt:
+            self.model.labor_market.firm_changed(self)
+            if value < self.watch_floor:
+                self.model.watch.firm_below(self)
+
+    @property
+    def price(self):
+        return self._price
+
+    @price.setter
+    def price(self, value):
+        if not self._bankrupt:
+            self.model.aggregates.price_changed(self._price, value)
+        self._price = value
+
+    @property
+    def bankrupt(self):
+        return self._bankrupt
+
+    @bankrupt.setter
+    def bankrupt(self, value):
+        if value and not self._bankrupt:
+            self._bankrupt = True
+            self.model.firm_bankrupted(self)
+        elif not value and self._bankrupt:
+            self._bankrupt = False
+            self.model.firm_restored(self)
 
     def step(self):
         if not self.bankrupt:
             self.adjust_price()
             self.produce()
             self.pay_wages()
-            self.service_loans()
             self.invest()  # Attempt to invest to increase capital
 
     def adjust_price(self):
         inventory_factor = max(0.8, min(1.2, 1 - (self.inventory / (self.production_capacity * 2))))
-        volatility_factor = 1 + (np.random.random() - 0.5) * self.market_volatility
+        volatility_factor = 1 + self.model.volatility_shock(self) * self.market_volatility
         self.price = max(1, self.price * inventory_factor * volatility_factor)
 
     def produce(self):
@@ -48,44 +92,39 @@ class Firm(Agent):
     def pay_wages(self):
         total_wages = sum(self.wage for _ in self.employees)
         
-        # If total wages exceed capital, try to borrow or lay off employees
-        while total_wages > self.capital:
-            if self.request_loan(min(total_wages - self.capital, 500)):  # Request a loan to cover wages
-                total_wages = sum(self.wage for _ in self.employees)  # Recalculate after loan
-            else:
+        # If total wages exceed capital, borrow the whole shortfall or lay off employees
+        if total_wages > self.capital and not self.request_loan(total_wages - self.capital):
+            while total_wages > self.capital and self.employees:
                 self.lay_off_employees()
                 total_wages = sum(self.wage for _ in self.employees)  # Recalculate after layoffs
         
         if total_wages > self.capital:
-            self.bankrupt = True
-            for employee in self.employees:
-                employee.employer = None
-            self.employees.clear()
+            self.bankrupt = True  # The model's bankruptcy hook releases the employees
             return
             
         for employee in self.employees:
             self.capital -= self.wage
-            employee.money += self.wage
-            transaction = Transaction(self, employee, self.wage, 'wage')
-            self.model.add_transaction(transaction)
-
-    def service_loans(self):
-        for loan in self.loans[:]:
-            amount, rate = loan
-            interest_payment = amount * rate
-            if interest_payment > self.capital:
-                self.bankrupt = True
-                return
-            self.capital -= interest_payment
-            self.model.central_bank.money_supply += interest_payment
+            employee.receive_wage(self.wage)
+            self.model.add_transaction(self.unique_id, employee.unique_id, self.wage, 'wage')
 
-    def request_loan(self, amount):
+    @property
+    def funds(self):
+        # What the firm can put towards its loan payments
+        return self._capital
 
-        if self.model.central_bank.money_supply > amount:  # Ensure bank has enough money
-            self.loans.append((amount, self.model.central_bank.base_interest_rate))  # Simple loan request
+    def repay(self, amount):
+        # Pay the bank; returns False if the firm can't cover it
+        if amount > self.capital:
+            return False
+        self.capital -= amount
+        return True
+
+    def request_loan(self, amount):
+        approved, interest_rate = self.model.central_bank.approve_loan(self, amount)  # Ensure bank has enough money
+        if approved:
             self.capital += amount
-            self.model.central_bank.money_supply -= amount  # Deduct from bank supply
-            print(f"Firm {self.unique_id} received loan: {amount}")
+            self.model.central_bank.issue_loan(self, amount, interest_rate)
+            self.model.events.emit("firm_loan", self.unique_id, amount)
             return True
         return False
 
@@ -94,6 +133,7 @@ class Firm(Agent):
         if self.employees:
             employee_to_lay_off = self.employees.pop()  # Lay off the last employee
             employee_to_lay_off.employer = None
+            self.model.labor_market.firm_changed(self)
 
     def invest(self):
         if self.capital > 200:  # Check if there is enough capital to invest
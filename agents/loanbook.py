@@ -0,0 +1,103 @@
+# loanbook.py
+import numpy as np
+
+LOAN_COLUMNS = (
+    ('borrower', np.int64),       # index into LoanBook.borrowers
+    ('principal', np.float64),
+    ('rate', np.float64),
+    ('origination_step', np.int64),
+    ('outstanding', np.float64),
+)
+
+
+# Every loan the central bank has issued, one row per loan in parallel arrays.
+# Interest and amortization for the whole economy are computed in one pass and
+# summed per borrower, so servicing doesn't walk per-agent loan lists.
+class LoanBook:
+    def __init__(self, capacity=1024):
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in LOAN_COLUMNS}
+        self.size = 0
+        self.borrowers = []  # Agents, in the order they first borrowed
+        self.borrower_index = {}  # unique_id -> position in borrowers
+        self.written_off = []  # Borrowers whose loans the next compact() drops
+
+    def issue(self, agent, amount, rate, step):
+        index = self.borrower_index.get(agent.unique_id)
+        if index is None:
+            index = len(self.borrowers)
+            self.borrowers.append(agent)
+            self.borrower_index[agent.unique_id] = index
+        if self.size == len(self.columns['borrower']):
+            self._grow()
+        row = self.size
+        self.columns['borrower'][row] = index
+        self.columns['principal'][row] = amount
+        self.columns['rate'][row] = rate
+        self.columns['origination_step'][row] = step
+        self.columns['outstanding'][row] = amount
+        self.size += 1
+
+    def _grow(self):
+        for name, column in self.columns.items():
+            grown = np.zeros(len(column) * 2, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def view(self, name):
+        return self.columns[name][:self.size]
+
+    def dues(self, amortization_rate=0.0):
+        # Interest and principal due this step, per loan and summed per borrower
+        outstanding = self.view('outstanding')
+        interest = outstanding * self.view('rate')
+        principal = outstanding * amortization_rate
+        borrowers = self.view('borrower')
+        count = len(self.borrowers)
+        return (interest, principal,
+                np.bincount(borrowers, weights=interest, minlength=count),
+                np.bincount(borrowers, weights=principal, minlength=count))
+
+    def repay(self, paid_borrowers, principal):
+        # Apply principal repayments for the loans of the borrowers who paid
+        paid = np.zeros(len(self.borrowers), dtype=bool)
+        paid[paid_borrowers] = True
+        rows = paid[self.view('borrower')]
+        outstanding = self.view('outstanding')
+        outstanding[rows] -= principal[rows]
+        outstanding[rows & (outstanding < 1e-9)] = 0.0
+
+    def write_off(self, agent):
+        # A bankrupt borrower's loans are never serviced again; drop them at the
+        # next compact()
+        index = self.borrower_index.get(agent.unique_id)
+        if index is not None:
+            self.written_off.append(index)
+
+    def compact(self):
+        # Drop loans that have been fully repaid or written off
+        keep = self.view('outstanding') > 0
+        if self.written_off:
+            keep &= ~np.isin(self.view('borrower'), self.written_off)
+            self.written_off.clear()
+        if keep.all():
+            return
+        count = int(keep.sum())
+        for name, column in self.columns.items():
+            column[:count] = column[:self.size][keep]
+        self.size = count
+
+    def outstanding_by_borrower(self):
+        return np.bincount(self.view('borrower'), weights=self.view('outstanding'),
+                           minlength=len(self.borrowers))
+
+    def loans_of(self, agent):
+        # (principal, rate, origination_step, outstanding) rows for one borrower
+        index = self.borrower_index.get(agent.unique_id)
+        if index is None:
+            return []
+        rows = self.view('borrower') == index
+        return list(zip(self.view('principal')[rows].tolist(), self.view('rate')[rows].tolist(),
+                        self.view('origination_step')[rows].tolist(), self.view('outstanding')[rows].tolist()))
+
+    def __len__(self):
+        return self.size
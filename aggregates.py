@@ -0,0 +1,86 @@
+# aggregates.py
+import math
+from agents import Firm, Consumer
+
+# Running sums and counts behind EconomyModel's market getters. Agents report
+# changes to price, satisfaction, employment and bankruptcy as they happen, so the
+# averages are read in O(1) instead of rescanning the schedule on every call.
+class MarketAggregates:
+    def __init__(self):
+        self.active_firms = 0
+        self.price_sum = 0.0
+        self.active_consumers = 0
+        self.employed_consumers = 0
+        self.satisfaction_sum = 0.0
+
+    def add_firm(self, firm):
+        if not firm.bankrupt:
+            self.active_firms += 1
+            self.price_sum += firm.price
+
+    def add_consumer(self, consumer):
+        if not consumer.bankrupt:
+            self.active_consumers += 1
+            self.satisfaction_sum += consumer.satisfaction
+            if consumer.employer is not None:
+                self.employed_consumers += 1
+
+    def remove_firm(self, firm):
+        self.active_firms -= 1
+        self.price_sum -= firm.price
+        if not self.active_firms:
+            self.price_sum = 0.0  # Drop accumulated rounding error
+
+    def remove_consumer(self, consumer):
+        self.active_consumers -= 1
+        self.satisfaction_sum -= consumer.satisfaction
+        if consumer.employer is not None:
+            self.employed_consumers -= 1
+        if not self.active_consumers:
+            self.satisfaction_sum = 0.0
+
+    def price_changed(self, old, new):
+        self.price_sum += new - old
+
+    def satisfaction_changed(self, old, new):
+        self.satisfaction_sum += new - old
+
+    def employment_changed(self, was_employed, is_employed):
+        if was_employed != is_employed:
+            self.employed_consumers += 1 if is_employed else -1
+
+    def average_price(self):
+        if not self.active_firms:
+            return 0
+        return self.price_sum / self.active_firms
+
+    def employment_rate(self):
+        if not self.active_consumers:
+            return 0
+        return self.employed_consumers / self.active_consumers
+
+    def average_satisfaction(self):
+        if not self.active_consumers:
+            return 0
+        return self.satisfaction_sum / self.active_consumers
+
+    def recompute(self, agents):
+        # Rebuild from scratch; used to check the running values
+        fresh = MarketAggregates()
+        for agent in agents:
+            if isinstance(agent, Firm):
+                fresh.add_firm(agent)
+            elif isinstance(agent, Consumer):
+                fresh.add_consumer(agent)
+        return fresh
+
+    def verify(self, agents):
+        fresh = self.recompute(agents)
+        for name in ("active_firms", "active_consumers", "employed_consumers"):
+            if getattr(self, name) != getattr(fresh, name):
+                raise AssertionError(f"Aggregate {name} drifted: cached={getattr(self, name)} "
+                                     f"actual={getattr(fresh, name)}")
+        for name in ("price_sum", "satisfaction_sum"):
+            if not math.isclose(getattr(self, name), getattr(fresh, name), rel_tol=1e-9, abs_tol=1e-6):
+                raise AssertionError(f"Aggregate {name} drifted: cached={getattr(self, name)} "
+                                     f"actual={getattr(fresh, name)}")
@@ -0,0 +1,149 @@
+# benchmarks/coldstart.py
+#
+# Cold-start benchmark: the time a fresh interpreter takes to import the engine,
+# build a model and finish its first step, which is what every short batch run
+# pays before doing useful work. Each repeat runs in a new process:
+#
+#     python -m benchmarks.coldstart --targets object vectorized --repeats 5 --out cold.json
+#     python -m benchmarks.coldstart --compare base.json cold.json
+#
+# The "server" target imports main and builds the visualization server instead,
+# to keep an eye on what the interactive path costs.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_TARGETS = ["object", "vectorized"]
+PHASES = ("import_s", "construct_s", "first_step_s")
+# Modules worth knowing about when they turn up in a headless process
+HEAVY_MODULES = ("networkx", "pandas", "tornado", "mesa.visualization", "matplotlib", "scipy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(target, num_consumers, seed):
+    # Runs in the fresh interpreter; nothing from the package is imported before
+    # the clock starts
+    started = time.perf_counter()
+    if target == "server":
+        import main
+
+        imported = time.perf_counter()
+        main.build_server()
+        constructed = time.perf_counter()
+        stepped = constructed
+    else:
+        from sweep import engine_class
+        from params import default_params
+
+        model_class = engine_class(target)
+        imported = time.perf_counter()
+        params = default_params()
+        params["num_consumers"] = num_consumers
+        params["num_firms"] = max(1, num_consumers // 5)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            model = model_class(seed=seed, **params)
+            constructed = time.perf_counter()
+            model.step()
+            stepped = time.perf_counter()
+    return {
+        "import_s": imported - started,
+        "construct_s": constructed - imported,
+        "first_step_s": stepped - constructed,
+        "modules": len(sys.modules),
+        "heavy_modules": sorted(name for name in HEAVY_MODULES if name in sys.modules),
+    }
+
+
+def measure(target, num_consumers, seed):
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.coldstart", "--child", target, str(num_consumers), str(seed)],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - started
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["wall_s"] = wall  # Includes interpreter start-up and exit
+    return result
+
+
+def run(targets, repeats, num_consumers, seed):
+    from benchmarks.scaling import git_commit
+
+    results = []
+    for target in targets:
+        samples = [measure(target, num_consumers, seed) for _ in range(repeats)]
+        result = {"target": target, "repeats": repeats,
+                  "modules": samples[-1]["modules"], "heavy_modules": samples[-1]["heavy_modules"]}
+        for name in PHASES + ("wall_s",):
+            result[name] = statistics.median(sample[name] for sample in samples)
+        results.append(result)
+        print(f"{target:>10}: import {result['import_s']:.3f}s, construct {result['construct_s']:.3f}s, "
+              f"first step {result['first_step_s']:.3f}s, wall {result['wall_s']:.3f}s", file=sys.stderr)
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "num_consumers": num_consumers,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def summarize(report):
+    lines = [f"commit {report['commit']} consumers={report['num_consumers']} (medians)"]
+    lines.append(f"{'target':>10} {'import s':>9} {'build s':>8} {'step s':>8} {'wall s':>8} {'modules':>8}")
+    for r in report["results"]:
+        lines.append(f"{r['target']:>10} {r['import_s']:>9.3f} {r['construct_s']:>8.3f} "
+                     f"{r['first_step_s']:>8.3f} {r['wall_s']:>8.3f} {r['modules']:>8}")
+        if r["heavy_modules"]:
+            lines.append(f"{'':>10} loaded: {', '.join(r['heavy_modules'])}")
+    return "\n".join(lines)
+
+
+def compare(base, head):
+    lines = [f"{'target':>10} {'import':>8} {'build':>8} {'step':>8} {'wall':>8}  (head / base)"]
+    base_results = {r["target"]: r for r in base["results"]}
+    for r in head["results"]:
+        b = base_results.get(r["target"])
+        if b is None:
+            continue
+        ratios = [r[name] / b[name] if b[name] else float("nan") for name in PHASES + ("wall_s",)]
+        lines.append(f"{r['target']:>10} " + " ".join(f"{ratio:>8.2f}" for ratio in ratios))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark: import, build and first step")
+    parser.add_argument("--targets", nargs="+", choices=["object", "vectorized", "ensemble", "server"],
+                        default=DEFAULT_TARGETS)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--consumers", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"),
+                        help="Compare two JSON reports instead of running")
+    parser.add_argument("--child", nargs=3, metavar=("TARGET", "CONSUMERS", "SEED"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        target, num_consumers, seed = args.child
+        print(json.dumps(child(target, int(num_consumers), int(seed))))
+        return
+    if args.compare:
+        with open(args.compare[0]) as base, open(args.compare[1]) as head:
+            print(compare(json.load(base), json.load(head)))
+        return
+
+    report = run(args.targets, args.repeats, args.consumers, args.seed)
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump(report, handle, indent=2)
+    print(summarize(report))
+
+
+if __name__ == "__main__":
+    main()
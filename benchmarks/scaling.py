@@ -0,0 +1,245 @@
+# benchmarks/scaling.py
+#
+# Scaling benchmark for EconomyModel.step. Each population size runs in a fresh
+# process so peak memory is measured per size:
+#
+#     python -m benchmarks.scaling --sizes 100 1000 10000 --steps 20 --out bench.json
+#     python -m benchmarks.scaling --compare base.json bench.json
+#
+# The sharded engine runs every size once per shard count, and the summary gives
+# each count's speedup over one shard. Peak memory is the coordinator's only.
+#
+#     python -m benchmarks.scaling --engine sharded --shards 1 2 4 --sizes 10000 100000
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+FIRM_RATIO = 5  # Consumers per firm, as in the default slider settings
+
+
+def model_params(num_consumers):
+    from params import default_params
+
+    params = default_params()
+    params["num_consumers"] = num_consumers
+    params["num_firms"] = max(1, num_consumers // FIRM_RATIO)
+    # Keep the bank's supply proportional so large economies don't starve at step one
+    params["initial_money_supply"] = params["initial_money_supply"] * max(1, num_consumers // 100)
+    return params
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def growth(model):
+    # Sizes of the structures that grow with the length of a run
+    sample = {}
+    transactions = getattr(model, "transactions", None)
+    if transactions is not None:
+        sample["transactions_retained"] = len(transactions)
+        sample["transactions_total"] = transactions.total
+        sample["graph_edges"] = len(transactions.edge_totals())
+    registry = getattr(model, "registry", None)
+    if registry is not None:
+        sample["costs_history"] = sum(len(firm.costs_history) for firm in registry.firms())
+    return sample
+
+
+def measure(num_consumers, steps, engine, seed, until=None, shards=None):
+    from convergence import RunController
+    from profiling import memory_report
+    from sweep import engine_class
+
+    model_class = engine_class(engine)
+    params = model_params(num_consumers)
+    if shards is not None:
+        params["shards"] = shards
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        started = time.perf_counter()
+        model = model_class(seed=seed, **params)
+        construct = time.perf_counter() - started
+        controller = RunController(model, **until) if until is not None else None
+        if shards is not None:
+            shard_work = model.shard_seconds.sum()
+            critical = model.critical_seconds
+
+        step_times = []
+        samples = []
+        for step in range(steps):
+            started = time.perf_counter()
+            model.step()
+            step_times.append(time.perf_counter() - started)
+            if step == 0 or (step + 1) % max(1, steps // 4) == 0:
+                samples.append({"step": step + 1, **growth(model)})
+            if controller is not None and controller.observe() is not None:
+                break
+        shard_report = projected = None
+        if shards is not None:
+            # What a step would take with a core per shard: the coordinator's own time
+            # plus only the slowest shard of each phase, from the workers' CPU times
+            shard_work = model.shard_seconds.sum() - shard_work
+            critical = model.critical_seconds - critical
+            projected = (sum(step_times) - shard_work + critical) / len(step_times)
+            shard_report = model.shard_report()
+            model.close()
+
+    return {
+        "num_consumers": num_consumers,
+        "num_firms": params["num_firms"],
+        "shards": shards,
+        "shard_report": shard_report,
+        "projected_step_s": projected,
+        "construct_s": construct,
+        "step_mean_s": float(np.mean(step_times)),
+        "step_median_s": float(np.median(step_times)),
+        "step_max_s": float(np.max(step_times)),
+        "peak_rss_mb": peak_rss_mb(),
+        "steps_run": len(step_times),
+        "stop_reason": controller.reason if controller is not None and controller.reason else "max_steps",
+        "growth": samples,
+        "memory": memory_report(model) if hasattr(model, "registry") else None,
+    }
+
+
+def _measure_in_child(queue, *args):
+    queue.put(measure(*args))
+
+
+def measure_isolated(*args):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure_in_child, args=(queue, *args))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def loglog_slope(sizes, values):
+    # Empirical exponent k in time ~ n^k
+    sizes, values = np.asarray(sizes, dtype=float), np.asarray(values, dtype=float)
+    keep = (sizes > 0) & (values > 0)
+    if keep.sum() < 2:
+        return None
+    return float(np.polyfit(np.log(sizes[keep]), np.log(values[keep]), 1)[0])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, steps, engine, seed, until=None, shard_counts=None):
+    results = []
+    for size in sizes:
+        for shards in shard_counts or [None]:
+            result = measure_isolated(size, steps, engine, seed, until, shards)
+            results.append(result)
+            label = f"{size:>8} consumers" + (f", {shards} shards" if shards is not None else "")
+            print(f"{label}: construct {result['construct_s']:.3f}s, "
+                  f"step {result['step_mean_s'] * 1000:.2f}ms, peak {result['peak_rss_mb']:.0f}MB",
+                  file=sys.stderr)
+
+    # Growth with size is fitted at one shard count, the first one listed
+    fitted = [r for r in results if r["shards"] == (shard_counts[0] if shard_counts else None)]
+    agents = [r["num_consumers"] + r["num_firms"] for r in fitted]
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "engine": engine,
+        "steps": steps,
+        "seed": seed,
+        "results": results,
+        "complexity": {
+            "construct_slope": loglog_slope(agents, [r["construct_s"] for r in fitted]),
+            "step_slope": loglog_slope(agents, [r["step_mean_s"] for r in fitted]),
+            "memory_slope": loglog_slope(agents, [r["peak_rss_mb"] for r in fitted]),
+        },
+    }
+
+
+def summarize(report):
+    lines = [f"commit {report['commit']} engine={report['engine']} steps={report['steps']} "
+             f"cpus={report.get('cpus')}"]
+    sharded = any(r.get("shards") is not None for r in report["results"])
+    if sharded:
+        # "projected" is the step time with a core per shard, see measure()
+        lines.append(f"{'consumers':>10} {'shards':>7} {'construct s':>12} {'step ms':>10} {'speedup':>8} "
+                     f"{'proj. ms':>9} {'speedup':>8} {'peak MB':>9}")
+        one_shard = {r["num_consumers"]: r["step_mean_s"] for r in report["results"] if r["shards"] == 1}
+        for r in report["results"]:
+            base = one_shard.get(r["num_consumers"])
+            speedups = [f"{base / seconds:>8.2f}" if base else f"{'n/a':>8}"
+                        for seconds in (r["step_mean_s"], r["projected_step_s"])]
+            lines.append(f"{r['num_consumers']:>10} {r['shards']:>7} {r['construct_s']:>12.3f} "
+                         f"{r['step_mean_s'] * 1000:>10.2f} {speedups[0]} {r['projected_step_s'] * 1000:>9.2f} "
+                         f"{speedups[1]} {r['peak_rss_mb']:>9.0f}")
+    else:
+        lines.append(f"{'consumers':>10} {'construct s':>12} {'step ms':>10} {'peak MB':>9}")
+        for r in report["results"]:
+            lines.append(f"{r['num_consumers']:>10} {r['construct_s']:>12.3f} "
+                         f"{r['step_mean_s'] * 1000:>10.2f} {r['peak_rss_mb']:>9.0f}")
+    for name, slope in report["complexity"].items():
+        lines.append(f"{name}: {'n/a' if slope is None else f'{slope:.2f}'}")
+    return "\n".join(lines)
+
+
+def compare(base, head):
+    lines = [f"{'consumers':>10} {'construct':>10} {'step':>10} {'memory':>10}  (head / base)"]
+    base_results = {(r["num_consumers"], r.get("shards")): r for r in base["results"]}
+    for r in head["results"]:
+        b = base_results.get((r["num_consumers"], r.get("shards")))
+        if b is None:
+            continue
+        label = f"{r['num_consumers']}" + (f"/{r['shards']}" if r.get("shards") is not None else "")
+        lines.append(f"{label:>10} {r['construct_s'] / b['construct_s']:>10.2f} "
+                     f"{r['step_mean_s'] / b['step_mean_s']:>10.2f} "
+                     f"{r['peak_rss_mb'] / b['peak_rss_mb']:>10.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for EconomyModel.step")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--engine", choices=["object", "vectorized", "sharded"], default="object")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4],
+                        help="Shard counts to run each size at, for the sharded engine")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--until-steady", action="store_true",
+                        help="Treat --steps as a cap and stop each size at steady state or collapse")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"),
+                        help="Compare two JSON reports instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as base, open(args.compare[1]) as head:
+            print(compare(json.load(base), json.load(head)))
+        return
+
+    report = run(args.sizes, args.steps, args.engine, args.seed, {} if args.until_steady else None,
+                 args.shards if args.engine == "sharded" else None)
+    if args.out:
+        with open(args.out, "w") as handle:
+            json.dump(report, handle, indent=2)
+    print(summarize(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+# checkpoint.py
+import gc
+import io
+import json
+import numpy as np
+from agents import Firm, Consumer
+from flows import FlowAnalytics
+from history import RingBuffer
+from ledger import COLUMNS as LEDGER_COLUMNS
+from market import GoodsMarket
+from model import EconomyModel
+
+# Per-agent state saved as one column per attribute, in registry order
+FIRM_FIELDS = (
+    ('unique_id', np.int64),
+    ('capital', np.float64),
+    ('initial_capital', np.float64),
+    ('_price', np.float64),
+    ('production_capacity', np.int64),
+    ('inventory', np.int64),
+    ('market_volatility', np.float64),
+    ('wage', np.float64),
+    ('_bankrupt', bool),
+)
+CONSUMER_FIELDS = (
+    ('unique_id', np.int64),
+    ('money', np.float64),
+    ('initial_money', np.float64),
+    ('satisfaction_threshold', np.float64),
+    ('_satisfaction', np.float64),
+    ('debt', np.float64),
+    ('_bankrupt', bool),
+)
+BANK_FIELDS = ('money_supply', 'base_interest_rate', 'amortization_rate', 'total_loans',
+               'bankrupted_firms', 'bankrupted_consumers', 'inflation_rate')
+HISTORY_STATS = (('count', np.int64), ('total', np.float64), ('minimum', np.float64), ('maximum', np.float64))
+AGGREGATE_FIELDS = ('active_firms', 'price_sum', 'active_consumers', 'employed_consumers', 'satisfaction_sum')
+# Saved fields that are properties, restored straight into the slot behind them so
+# the model hooks their setters call don't run on a half-built model
+PROPERTY_SLOTS = {'capital': '_capital', 'money': '_money'}
+FLOW_SETTINGS = ('decay', 'window', 'epsilon', 'damping', 'tolerance', 'max_iterations')
+
+# Where fork() applies each policy parameter: an attribute of the model or central
+# bank, or one set on every firm or consumer
+FORK_PARAMETERS = {
+    'base_interest_rate': 'central_bank',
+    'amortization_rate': 'central_bank',
+    'bankruptcy_threshold': 'model',
+    'distress_threshold': 'model',
+    'market_volatility': 'firms',
+    'satisfaction_threshold': 'consumers',
+}
+
+
+# Binary snapshot of a running EconomyModel: a JSON header of scalars and RNG
+# states, plus NumPy columns for agents, employment links, loans, cost histories,
+# collected metrics, the transaction edge totals and, when the model has them, the
+# flow matrices and the profiler's totals. Retained ledger rows are not included;
+# the restored ledger starts empty but keeps the totals and edges.
+class Checkpoint:
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+
+    def save(self, path):
+        header = np.frombuffer(json.dumps(self.meta).encode(), dtype=np.uint8)
+        np.savez(path, _meta=header, **self.arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        meta = json.loads(arrays.pop('_meta').tobytes().decode())
+        return cls(meta, arrays)
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        self.save(buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.load(io.BytesIO(data))
+
+
+def _columns(agents, fields):
+    count = len(agents)
+    return {name: np.fromiter((getattr(agent, name) for agent in agents), dtype=dtype, count=count)
+            for name, dtype in fields}
+
+
+def _ragged(lists, dtype):
+    # Flattened values plus offsets, so list i is values[offsets[i]:offsets[i + 1]]
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=offsets[1:])
+    values = np.fromiter((value for values in lists for value in values), dtype=dtype, count=int(offsets[-1]))
+    return values, offsets
+
+
+def _set_columns(agents, fields, arrays, prefix):
+    # Field by field rather than agent by agent, through each slot's descriptor
+    if not agents:
+        return
+    cls = type(agents[0])
+    for name, _ in fields:
+        set_value = getattr(cls, PROPERTY_SLOTS.get(name, name)).__set__
+        for agent, value in zip(agents, arrays[prefix + name].tolist()):
+            set_value(agent, value)
+
+
+def _save_flows(flows, arrays):
+    # The matrices, windowed rows and ledger chunks not yet folded in, so the
+    # restored analytics report exactly what the original would have
+    for code, matrix in flows.matrices.items():
+        arrays[f'flows.{code}.keys'] = matrix.keys
+        arrays[f'flows.{code}.values'] = matrix.values
+        held = list(flows._held[code])
+        for index, name in enumerate(('steps', 'keys', 'amounts')):
+            parts = [part[index] for part in held]
+            arrays[f'flows.{code}.held_{name}'] = np.concatenate(parts) if parts else np.empty(0)
+        arrays[f'flows.{code}.held_offsets'] = np.cumsum([0] + [len(part[0]) for part in held])
+    chunks = flows._chunks
+    for name, dtype in LEDGER_COLUMNS:
+        arrays['flows.chunks.' + name] = np.concatenate([chunk[name] for chunk in chunks] or [np.empty(0, dtype)])
+    arrays['flows.chunk_offsets'] = np.cumsum([0] + [len(chunk['step']) for chunk in chunks])
+    arrays['flows.firm_ids'] = flows.firm_ids
+    if flows._rank is not None:
+        arrays['flows.rank'] = flows._rank
+    settings = {name: getattr(flows, name) for name in FLOW_SETTINGS}
+    return {'settings': settings, 'now': flows.now, 'steps': flows.steps}
+
+
+def _load_flows(flows, state, arrays):
+    flows.now = state['now']
+    flows.steps = state['steps']
+    for code, matrix in flows.matrices.items():
+        matrix.keys = arrays[f'flows.{code}.keys']
+        matrix.values = arrays[f'flows.{code}.values']
+        offsets = arrays[f'flows.{code}.held_offsets'].tolist()
+        parts = [arrays[f'flows.{code}.held_{name}'] for name in ('steps', 'keys', 'amounts')]
+        flows._held[code].extend(tuple(part[start:end] for part in parts)
+                                 for start, end in zip(offsets, offsets[1:]))
+    offsets = arrays['flows.chunk_offsets'].tolist()
+    flows._chunks[:] = [{name: arrays['flows.chunks.' + name][start:end] for name, _ in LEDGER_COLUMNS}
+                        for start, end in zip(offsets, offsets[1:])]
+    flows.firm_ids = arrays['flows.firm_ids']
+    flows._rank = arrays.get('flows.rank')
+
+
+def _history(retention, values, arrays, prefix, index):
+    if retention is None:
+        return values
+    return RingBuffer.restore(retention, values, *(arrays[prefix + name][index].item() for name, _ in HISTORY_STATS))
+
+
+def snapshot(model):
+    firms = model.registry.firms()
+    consumers = model.registry.consumers()
+    bank = model.central_bank
+    book = bank.loan_book
+    ledger = model.transactions
+    edges = ledger.edge_totals()  # Flushes staged rows first
+
+    arrays = {}
+    for name, values in _columns(firms, FIRM_FIELDS).items():
+        arrays['firm.' + name] = values
+    for name, values in _columns(consumers, CONSUMER_FIELDS).items():
+        arrays['consumer.' + name] = values
+    arrays['firm.pos'] = np.array([firm.pos for firm in firms], dtype=np.int64).reshape(-1, 2)
+    arrays['consumer.pos'] = np.array([consumer.pos for consumer in consumers], dtype=np.int64).reshape(-1, 2)
+    arrays['consumer.employer'] = np.fromiter(
+        (consumer.employer.unique_id if consumer.employer is not None else -1 for consumer in consumers),
+        dtype=np.int64, count=len(consumers))
+    arrays['firm.employees'], arrays['firm.employee_offsets'] = _ragged(
+        [[employee.unique_id for employee in firm.employees] for firm in firms], np.int64)
+    arrays['firm.costs_history'], arrays['firm.costs_offsets'] = _ragged(
+        [firm.costs_history for firm in firms], np.float64)
+    if model.history_retention is not None:
+        # Running statistics of the ring buffers, over everything they have seen
+        for name, dtype in HISTORY_STATS:
+            arrays['firm.costs_' + name] = np.fromiter(
+                (getattr(firm.costs_history, name) for firm in firms), dtype=dtype, count=len(firms))
+            arrays['bank.price_' + name] = np.asarray([getattr(bank.price_history, name)], dtype=dtype)
+
+    arrays['schedule.order'] = np.fromiter(model.schedule._agents, dtype=np.int64)
+    arrays['labor.queue'] = np.fromiter((consumer.unique_id for consumer in model.labor_market.queue),
+                                        dtype=np.int64)
+    arrays['bank.price_history'] = np.asarray(bank.price_history, dtype=np.float64)
+    arrays['loans.borrower_ids'] = np.fromiter((agent.unique_id for agent in book.borrowers), dtype=np.int64)
+    for name in book.columns:
+        arrays['loans.' + name] = book.view(name).copy()
+    keys = np.array(list(edges), dtype=np.int64).reshape(-1, 3)
+    totals = np.array(list(edges.values()), dtype=np.float64).reshape(-1, 2)
+    arrays['ledger.edge_keys'] = keys
+    arrays['ledger.edge_amounts'] = totals[:, 0]
+    arrays['ledger.edge_counts'] = totals[:, 1].astype(np.int64)
+    for name, values in model.datacollector.model_vars.items():
+        arrays['metrics.' + name] = np.asarray(values)
+    arrays['collector.row_steps'] = np.asarray(model.datacollector.row_steps, dtype=np.int64)
+
+    version, internal, gauss = model.random.getstate()
+    arrays['random.state'] = np.asarray(internal, dtype=np.uint32)
+    meta = {
+        'num_consumers': model.num_consumers,
+        'num_firms': model.num_firms,
+        'width': model.grid.width,
+        'height': model.grid.height,
+        'torus': model.grid.torus,
+        'seed': model._seed,
+        'bankruptcy_threshold': model.bankruptcy_threshold,
+        'distress_threshold': model._distress_threshold,
+        'remove_bankrupt': model.remove_bankrupt,
+        'debug_aggregates': model.debug_aggregates,
+        'transaction_retention': ledger.retention,
+        'history_retention': model.history_retention,
+        'market': None if model.market is None else {'radius': model.market.radius,
+                                                     'distance_cost': model.market.distance_cost},
+        'running': model.running,
+        'current_id': model.current_id,
+        'steps': model.schedule.steps,
+        'time': model.schedule.time,
+        'bank': {name: getattr(bank, name, None) for name in BANK_FIELDS},
+        'aggregates': {name: getattr(model.aggregates, name) for name in AGGREGATE_FIELDS},
+        'transactions_total': ledger.total,
+        'metrics': list(model.datacollector.model_vars),
+        'collector': {name: getattr(model.datacollector, name)
+                      for name in ('interval', 'decimation', 'calls', 'rows', 'trimmed')},
+        'events': {'counts': dict(model.events.counts), 'sums': dict(model.events.sums)},
+        'random': {'version': version, 'gauss': gauss},
+        'streams': model.streams.get_state(),
+        'flows': None if model.flows is None else _save_flows(model.flows, arrays),
+        'profiler': None if model.profiler is None else {
+            'totals': dict(model.profiler.totals), 'calls': dict(model.profiler.calls),
+            'steps': model.profiler.steps},
+    }
+    return Checkpoint(meta, arrays)
+
+
+def restore(checkpoint, sink=None, events=None):
+    # Rebuild a model from a checkpoint. The result steps exactly as the original
+    # would have, flow analytics included, and its profiler carries on from the
+    # saved totals. The cyclic garbage collector is paused while the agents are
+    # built, since it would otherwise rescan the growing object graph many times over.
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return _restore(checkpoint, sink, events)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def _restore(checkpoint, sink, events):
+    meta, arrays = checkpoint.meta, checkpoint.arrays
+    bank_state = meta['bank']
+    model = EconomyModel(0, 0, bank_state['money_supply'], bank_state['base_interest_rate'], 0, 0,
+                         width=meta['width'], height=meta['height'], seed=meta['seed'],
+                         debug_aggregates=meta['debug_aggregates'], remove_bankrupt=meta['remove_bankrupt'],
+                         transaction_retention=meta['transaction_retention'], events=events,
+                         amortization_rate=bank_state['amortization_rate'],
+                         collect_interval=meta['collector']['interval'],
+                         metric_decimation=meta['collector']['decimation'],
+                         history_retention=meta.get('history_retention'),
+                         flows=None if meta.get('flows') is None else FlowAnalytics(**meta['flows']['settings']),
+                         profile=meta.get('profiler') is not None)
+    market = meta.get('market')
+    if market is not None:
+        model.market = GoodsMarket(model.grid, market['radius'], market['distance_cost'])
+    model.num_consumers = meta['num_consumers']
+    model.num_firms = meta['num_firms']
+    model.bankruptcy_threshold = meta['bankruptcy_threshold']
+    model.distress_threshold = meta.get('distress_threshold')
+    model.running = meta['running']
+    model.current_id = meta['current_id']
+    model.schedule.steps = meta['steps']
+    model.current_step = meta['steps']
+    model.schedule.time = meta['time']
+    bank = model.central_bank
+    for name, value in bank_state.items():
+        if value is not None:
+            setattr(bank, name, value)
+    retention = model.history_retention
+    bank.price_history = _history(retention, arrays['bank.price_history'].tolist(), arrays, 'bank.price_', 0)
+
+    # Agents, created in registry order so every partition iterates as before
+    agents = {bank.unique_id: bank}
+    firms = [Firm(unique_id, model, initial_capital, market_volatility) for unique_id, initial_capital, market_volatility
+             in zip(*(arrays['firm.' + name].tolist() for name in ('unique_id', 'initial_capital', 'market_volatility')))]
+    _set_columns(firms, FIRM_FIELDS, arrays, 'firm.')
+    costs, cost_offsets = arrays['firm.costs_history'].tolist(), arrays['firm.costs_offsets'].tolist()
+    for i, (firm, pos) in enumerate(zip(firms, arrays['firm.pos'].tolist())):
+        firm.costs_history = _history(retention, costs[cost_offsets[i]:cost_offsets[i + 1]], arrays, 'firm.costs_', i)
+        model.grid.place_agent(firm, tuple(pos))
+        agents[firm.unique_id] = firm
+    model.registry.add_firms(firms)
+    if model.market is not None:
+        for firm in firms:
+            model.market.add_firm(firm)
+
+    consumers = [Consumer(unique_id, model, initial_money, satisfaction_threshold)
+                 for unique_id, initial_money, satisfaction_threshold in zip(*(
+                     arrays['consumer.' + name].tolist()
+                     for name in ('unique_id', 'initial_money', 'satisfaction_threshold')))]
+    _set_columns(consumers, CONSUMER_FIELDS, arrays, 'consumer.')
+    for consumer, pos, employer in zip(consumers, arrays['consumer.pos'].tolist(),
+                                       arrays['consumer.employer'].tolist()):
+        if employer >= 0:
+            consumer._employer = agents[employer]
+        model.grid.place_agent(consumer, tuple(pos))
+        agents[consumer.unique_id] = consumer
+    model.registry.add_consumers(consumers)
+
+    employees, employee_offsets = arrays['firm.employees'].tolist(), arrays['firm.employee_offsets'].tolist()
+    for i, firm in enumerate(firms):
+        firm.employees = [agents[unique_id] for unique_id in employees[employee_offsets[i]:employee_offsets[i + 1]]]
+
+    # The running sums are restored as saved rather than recomputed, so they carry
+    # the same rounding as the uninterrupted run
+    for name, value in meta['aggregates'].items():
+        setattr(model.aggregates, name, value)
+    model.schedule._agents = {unique_id: agents[unique_id] for unique_id in arrays['schedule.order'].tolist()}
+    model.labor_market.queue.extend(agents[unique_id] for unique_id in arrays['labor.queue'].tolist())
+
+    book = bank.loan_book
+    book.borrowers = [agents[unique_id] for unique_id in arrays['loans.borrower_ids'].tolist()]
+    book.size = len(arrays['loans.borrower'])
+    for name in book.columns:
+        column = arrays['loans.' + name]
+        book.columns[name] = np.zeros(max(len(column), 1024), dtype=column.dtype)
+        book.columns[name][:book.size] = column
+
+    # Indexes derived from the state above. Floors aren't saved; recomputing them
+    # requeues the distressed firms, the only agents left queued between steps,
+    # since they're all under their floor
+    book.borrower_index = {agent.unique_id: index for index, agent in enumerate(book.borrowers)}
+    for agent in book.borrowers:
+        if agent.bankrupt:
+            book.write_off(agent)  # Loans of borrowers that failed since the last compaction
+    model.update_watch_floors()
+
+    ledger = model.transactions
+    ledger.total = meta['transactions_total']
+    ledger.edges = {tuple(key): [amount, count] for key, amount, count in zip(
+        arrays['ledger.edge_keys'].tolist(), arrays['ledger.edge_amounts'].tolist(),
+        arrays['ledger.edge_counts'].tolist())}
+
+    model.datacollector.calls = meta['collector']['calls']
+    model.datacollector.rows = meta['collector']['rows']
+    model.datacollector.trimmed = meta['collector']['trimmed']
+    model.datacollector.row_steps.extend(arrays['collector.row_steps'].tolist())
+    model_vars = model.datacollector.model_vars
+    for name in meta['metrics']:
+        if name in model_vars:
+            model_vars[name] = arrays['metrics.' + name].tolist()
+
+    for event, count in meta['events']['counts'].items():
+        model.events.counts[event] = count
+    for event, amount in meta['events']['sums'].items():
+        model.events.sums[event] = amount
+    model.random.setstate((meta['random']['version'], tuple(arrays['random.state'].tolist()),
+                           meta['random']['gauss']))
+    model.streams.set_state(meta['streams'])
+    model.volatility_shocks = np.zeros(model.num_firms)
+
+    if model.flows is not None:
+        _load_flows(model.flows, meta['flows'], arrays)
+    profiler = model.profiler
+    if profiler is not None:
+        profiler.attach_agents([*firms, *consumers])
+        profiler.totals.update(meta['profiler']['totals'])
+        profiler.calls.update(meta['profiler']['calls'])
+        profiler.steps = meta['profiler']['steps']
+
+    model.sink = sink
+    if sink is not None:
+        sink.attach(model)
+    return model
+
+
+def fork(checkpoint, variants, sink_factory=None):
+    # One restored model per variant, each a dict of FORK_PARAMETERS overrides. All
+    # variants continue the same random streams, so their paths differ only by the
+    # policy change; pass a 'seed' in a variant to reseed it instead.
+    models = []
+    for index, overrides in enumerate(variants):
+        model = restore(checkpoint, sink=sink_factory(index) if sink_factory else None)
+        overrides = dict(overrides)
+        seed = overrides.pop('seed', None)
+        if seed is not None:
+            model._seed = seed
+            model.random.seed(seed)
+            model.streams = type(model.streams)(seed)
+        for name, value in overrides.items():
+            target = FORK_PARAMETERS.get(name)
+            if target is None:
+                raise ValueError(f"Unknown fork parameter: {name}")
+            if target == 'central_bank':
+                setattr(model.central_bank, name, value)
+            elif target == 'model':
+                setattr(model, name, value)
+            else:
+                for agent in (model.registry.firms() if target == 'firms' else model.registry.consumers()):
+                    setattr(agent, name, value)
+        models.append(model)
+    return models
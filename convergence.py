@@ -0,0 +1,133 @@
+# convergence.py
+import math
+from collections import deque
+
+DEFAULT_WATCHED = ("Average Price", "Employment Rate")
+
+
+# Mean and variance of the last `size` values, updated in O(1) per value with a
+# sliding form of Welford's algorithm. The sums are recomputed from the window
+# once per `size` values, so rounding left behind by large values that have
+# since slid out can't build up.
+class RollingWindow:
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.mean = 0.0
+        self._m2 = 0.0  # Sum of squared deviations from the mean
+        self._pushes = 0
+
+    def push(self, value):
+        values = self.values
+        if len(values) < self.size:
+            values.append(value)
+            delta = value - self.mean
+            self.mean += delta / len(values)
+            self._m2 += delta * (value - self.mean)
+        else:
+            old = values.popleft()
+            values.append(value)
+            old_mean = self.mean
+            self.mean += (value - old) / self.size
+            self._m2 += (value - old) * (value - self.mean + old - old_mean)
+        self._m2 = max(self._m2, 0.0)
+        self._pushes += 1
+        if self._pushes % self.size == 0:
+            self.mean = sum(values) / len(values)
+            self._m2 = sum((item - self.mean) ** 2 for item in values)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def variance(self):
+        count = len(self.values)
+        return self._m2 / (count - 1) if count > 1 else 0.0
+
+    def shift(self):
+        # Change-point check: difference between the means of the newer and the
+        # older half of the window
+        half = len(self.values) // 2
+        if not half:
+            return 0.0
+        values = list(self.values)
+        return sum(values[-half:]) / half - sum(values[:half]) / half
+
+
+# Watches collected series of a running model and decides when to stop it:
+#   "steady_state" - every watched series has been flat over the last `window`
+#                    rows: standard deviation and half-window mean shift both
+#                    within `tolerance` of the series' scale
+#   "collapse"     - no active firms or no active consumers are left
+#   "predicate"    - predicate(model) returned True
+# Values are pushed by a datacollector listener as each row is recorded, so
+# collect_interval and decimation only slow the checks down, and a sink trimming
+# the collector doesn't hide them. Rows recorded before the controller was built
+# are read from the columns.
+class RunController:
+    def __init__(self, model, watch=DEFAULT_WATCHED, window=20, tolerance=1e-3, min_steps=0,
+                 predicate=None, stop_on_collapse=True, floor=1e-9):
+        self.model = model
+        self.window = window
+        self.tolerance = tolerance
+        self.min_steps = min_steps
+        self.predicate = predicate
+        self.stop_on_collapse = stop_on_collapse
+        self.floor = floor  # Smallest scale, so series sitting at zero count as flat
+        self.windows = {name: RollingWindow(window) for name in watch}
+        collector = model.datacollector
+        for name, window in self.windows.items():
+            for value in collector.model_vars[name]:
+                window.push(value if value is not None else math.nan)
+        collector.listeners.append(self._recorded)
+        self.steps = 0
+        self.reason = None
+        self.stopped_at = None
+
+    def observe(self):
+        # Call after each model step; returns the stop reason, or None to go on
+        self.steps += 1
+        if self.stop_on_collapse and self.model.collapsed():
+            return self._stop("collapse")
+        if self.predicate is not None and self.predicate(self.model):
+            return self._stop("predicate")
+        if self.steps >= self.min_steps and self.steady():
+            return self._stop("steady_state")
+        return None
+
+    def _recorded(self, values):
+        for name, window in self.windows.items():
+            if name in values:
+                value = values[name]
+                window.push(value if value is not None else math.nan)
+
+    def steady(self):
+        for window in self.windows.values():
+            if not window.full:
+                return False
+            scale = max(abs(window.mean), self.floor)
+            limit = self.tolerance * scale
+            # NaN fails both comparisons, so a series with gaps never counts as flat
+            if not (math.sqrt(window.variance()) <= limit and abs(window.shift()) <= limit):
+                return False
+        return True
+
+    def _stop(self, reason):
+        self.reason = reason
+        self.stopped_at = self.steps
+        return reason
+
+    def run(self, max_steps):
+        # Step until a stop condition or max_steps; returns outcome()
+        while self.steps < max_steps:
+            self.model.step()
+            if self.observe() is not None:
+                break
+        return self.outcome()
+
+    def outcome(self):
+        return {
+            "stop_reason": self.reason or "max_steps",
+            "stopped_at": self.stopped_at if self.reason else self.steps,
+            "window_means": {name: window.mean for name, window in self.windows.items()},
+        }
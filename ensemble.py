@@ -0,0 +1,41 @@
+# ensemble.py
+import numpy as np
+from metrics import EnsembleCollector, MODEL_METRICS
+from vectorized import VectorizedEconomyModel
+
+# R replicas of VectorizedEconomyModel advanced together through its step: the
+# engine already keeps every piece of state on a leading replica axis, so this
+# class only chooses the seeds and reduces across replicas. Replica r makes exactly
+# the draws VectorizedEconomyModel(seed=seeds[r]) would and follows that run. The
+# bands therefore describe EconomyModel only as far as the vectorized engine
+# matches it in distribution, which tests/test_vectorized.py checks.
+class EnsembleEconomyModel(VectorizedEconomyModel):
+    def __init__(self, num_consumers, num_firms, initial_money_supply, base_interest_rate,
+                 initial_firm_capital, initial_consumer_money, market_volatility=0.2,
+                 bankruptcy_threshold=0.3, satisfaction_threshold=0.5, width=20, height=20,
+                 seed=None, amortization_rate=0.0, collect_interval=1, metric_decimation=None,
+                 replicas=32, seeds=None, distress_threshold=None):
+        if seeds is None:
+            seeds = np.random.SeedSequence(seed).generate_state(replicas).tolist()
+        super().__init__(num_consumers, num_firms, initial_money_supply, base_interest_rate,
+                         initial_firm_capital, initial_consumer_money, market_volatility,
+                         bankruptcy_threshold, satisfaction_threshold, width, height, seed=seed,
+                         amortization_rate=amortization_rate, collect_interval=collect_interval,
+                         metric_decimation=metric_decimation, distress_threshold=distress_threshold,
+                         seeds=seeds)
+
+    def make_collector(self, interval, decimation):
+        # model_vars holds the replica means; replica_vars and summary() the spread
+        collector = EnsembleCollector(self.replicas, interval=interval, decimation=decimation)
+        collector.add_fused(MODEL_METRICS, EnsembleEconomyModel.collect_metrics)
+        return collector
+
+    def collect_metrics(self):
+        # All MODEL_METRICS as one value per replica
+        return self.replica_metrics()
+
+    def get_total_transactions(self):
+        return self.transaction_count
+
+    def summary(self, name, quantiles=(0.05, 0.5, 0.95), confidence=0.95):
+        return self.datacollector.summary(name, quantiles, confidence)
@@ -0,0 +1,159 @@
+# events.py
+import json
+import queue
+import random
+import sys
+import threading
+from collections import defaultdict
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# event -> (level, message template); templates are only filled in for events
+# that pass the level and sampling checks
+EVENTS = {
+    "bank_loan": (INFO, "Lent {amount} to Consumer {agent}. Total debt now: {detail}"),
+    "consumer_loan_approved": (INFO, "Loan approved for Consumer {agent}: Amount={amount}, Rate={detail}"),
+    "consumer_loan_denied": (INFO, "Loan request denied for Consumer {agent}: Requested={amount}"),
+    "firm_loan": (INFO, "Firm {agent} received loan: {amount}"),
+    "interest_paid": (DEBUG, "Agent {agent} repaid interest: {amount}"),
+    "interest_default": (WARNING, "Agent {agent} unable to pay interest, going bankrupt."),
+}
+
+APPROVED_LOAN_EVENTS = ("bank_loan", "consumer_loan_approved", "firm_loan")
+DENIED_LOAN_EVENTS = ("consumer_loan_denied",)
+
+
+# Leveled, sampled event log for the lending path. Every emit updates the run and
+# per-step counters and amount sums; only events at or above `level` that also pass
+# their sampling rate are formatted and handed to the writer.
+class EventLog:
+    def __init__(self, level=WARNING, sample_rates=None, writer=None, seed=0):
+        self.level = level
+        self.sample_rates = dict(sample_rates or {})  # event -> fraction of records kept
+        self.writer = writer if writer is not None else StreamEventWriter()  # stderr, so stdout stays clean
+        self.counts = defaultdict(int)
+        self.sums = defaultdict(float)
+        self.step_counts = defaultdict(int)
+        self.step_sums = defaultdict(float)
+        self.model = None
+        self._random = random.Random(seed)
+        self._enabled = {event for event, (event_level, _) in EVENTS.items() if event_level >= level}
+
+    def bind(self, model):
+        self.model = model
+
+    def set_level(self, level):
+        self.level = level
+        self._enabled = {event for event, (event_level, _) in EVENTS.items() if event_level >= level}
+
+    def start_step(self):
+        self.step_counts.clear()
+        self.step_sums.clear()
+
+    def emit(self, event, agent, amount=0.0, detail=None):
+        self.counts[event] += 1
+        self.sums[event] += amount
+        self.step_counts[event] += 1
+        self.step_sums[event] += amount
+        if event not in self._enabled:
+            return
+        rate = self.sample_rates.get(event)
+        if rate is not None and self._random.random() >= rate:
+            return
+        level, template = EVENTS[event]
+        self.writer.write({
+            "step": self.model.current_step if self.model is not None else None,
+            "event": event,
+            "level": LEVEL_NAMES[level],
+            "agent": agent,
+            "amount": amount,
+            "detail": detail,
+            "message": template.format(agent=agent, amount=amount, detail=detail),
+        })
+
+    def emit_many(self, event, agents, amounts):
+        # emit() for a batch of one event. Unless its records are written, the
+        # counters and sums are updated once for the whole batch
+        if event in self._enabled:
+            for agent, amount in zip(agents, amounts):
+                self.emit(event, agent, amount)
+            return
+        self.counts[event] += len(agents)
+        self.sums[event] = sum(amounts, self.sums[event])
+        self.step_counts[event] += len(agents)
+        self.step_sums[event] = sum(amounts, self.step_sums[event])
+
+    def step_count(self, events):
+        return sum(self.step_counts.get(event, 0) for event in events)
+
+    def reporters(self):
+        return {
+            "Loans Approved": lambda m: self.step_count(APPROVED_LOAN_EVENTS),
+            "Loans Denied": lambda m: self.step_count(DENIED_LOAN_EVENTS),
+        }
+
+    def close(self):
+        self.writer.close()
+
+
+# Prints each record's message, as the lending path used to. Without a stream it
+# writes to whatever sys.stderr is at the time, so redirecting it still works.
+class StreamEventWriter:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, record):
+        print(record["message"], file=self.stream if self.stream is not None else sys.stderr)
+
+    def close(self):
+        pass
+
+
+# Appends records as JSON lines, batching writes; with threaded=True a background
+# thread does the encoding and file I/O
+class FileEventWriter:
+    def __init__(self, path, batch_size=1000, threaded=False):
+        self.path = path
+        self.batch_size = batch_size
+        self._handle = open(path, "a")
+        self._batch = []
+        self._queue = None
+        self._thread = None
+        if threaded:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._drain, daemon=True)
+            self._thread.start()
+
+    def write(self, record):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        if self._queue is not None:
+            self._queue.put(batch)
+        else:
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        self._handle.write("".join(json.dumps(record) + "\n" for record in batch))
+        self._handle.flush()
+
+    def _drain(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            self._write_batch(batch)
+
+    def close(self):
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._handle.close()
@@ -0,0 +1,234 @@
+# flows.py
+from collections import deque
+import numpy as np
+from ledger import TRANSACTION_TYPES, TYPE_CODES
+
+# The flow series a model reports when built with a FlowAnalytics
+FLOW_METRICS = (
+    "Money Velocity",
+    "Flow Concentration",
+    "Bank Centrality",
+    "Top Firm Centrality",
+)
+
+# Ledger rows record a purchase as firm -> consumer; the money goes the other way
+REVERSED_TYPES = frozenset((TYPE_CODES['purchase'],))
+
+KEY_BITS = 32
+KEY_MASK = (1 << KEY_BITS) - 1
+
+
+def flow_keys(payers, payees):
+    # One int64 key per (payer, payee) pair; sorting by key sorts row-major
+    return (payers.astype(np.int64) << KEY_BITS) | payees.astype(np.int64)
+
+
+def accumulate(keys, values, new_keys, new_values, epsilon=0.0):
+    # Sum two coordinate lists into one with sorted, unique keys, dropping entries
+    # whose magnitude is at most epsilon
+    keys = np.concatenate((keys, new_keys))
+    values = np.concatenate((values, new_values))
+    keys, inverse = np.unique(keys, return_inverse=True)
+    values = np.bincount(inverse.reshape(-1), weights=values, minlength=len(keys))
+    keep = np.abs(values) > epsilon
+    return keys[keep], values[keep]
+
+
+# Sparse payer x payee matrix of money flows in coordinate form: sorted unique
+# keys and the amount on each. Adding a batch of rows merges it in, so the matrix
+# only ever holds one entry per pair that has traded.
+class FlowMatrix:
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+
+    def add(self, keys, values, epsilon=0.0):
+        if len(keys):
+            self.keys, self.values = accumulate(self.keys, self.values, keys, values, epsilon)
+
+    def scale(self, factor, epsilon=0.0):
+        self.values *= factor
+        if epsilon:
+            keep = self.values > epsilon
+            self.keys, self.values = self.keys[keep], self.values[keep]
+
+    def coo(self):
+        return self.keys >> KEY_BITS, self.keys & KEY_MASK, self.values
+
+    def total(self):
+        return float(self.values.sum())
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# Money-flow analytics over the transaction ledger. Each flushed ledger chunk is
+# folded into one sparse matrix per transaction type, and the network metrics are
+# computed from those with bincount-based sparse products instead of rebuilding
+# the networkx graph. Older flows fade out in one of three ways:
+#   decay=None, window=None - everything since attach counts equally
+#   decay=d                 - a flow k steps old is weighted d**k
+#   window=w                - only flows from the last w steps count
+# Reported per collected step:
+#   "Money Velocity"      - purchase volume per step over the money agents hold
+#   "Flow Concentration"  - Herfindahl index of the firms' shares of wage and
+#                           purchase flows (1/firms when even, 1 when one firm
+#                           handles all of it)
+#   "Bank Centrality"     - PageRank of the central bank in the money-flow network
+#   "Top Firm Centrality" - the highest PageRank among firms
+class FlowAnalytics:
+    def __init__(self, decay=None, window=None, epsilon=1e-6, damping=0.85, tolerance=1e-10,
+                 max_iterations=100):
+        if decay is not None and window is not None:
+            raise ValueError("Use either decay or window, not both")
+        self.decay = decay
+        self.window = window
+        self.epsilon = epsilon  # Entries this small are dropped from the matrices
+        self.damping = damping
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.matrices = {code: FlowMatrix() for code in range(len(TRANSACTION_TYPES))}
+        self.model = None
+        self.now = None  # Last completed step the matrices are current for
+        self.steps = 0   # Steps folded in since attach
+        self.firm_ids = np.empty(0, dtype=np.int64)
+        self._chunks = []  # Ledger chunks not yet folded in
+        self._held = {code: deque() for code in self.matrices}  # Windowed rows: (steps, keys, amounts)
+        self._rank = None
+
+    def attach(self, model):
+        self.model = model
+        self.now = model.schedule.steps - 1
+        self.firm_ids = np.array(sorted(firm.unique_id for firm in model.registry.firms()), dtype=np.int64)
+        model.transactions.listeners.append(self._chunks.append)
+
+    def refresh(self):
+        # Bring the matrices up to the model's last completed step
+        self.model.transactions.flush()
+        now = self.model.schedule.steps - 1
+        if now > self.now:
+            elapsed = now - self.now
+            self.steps += elapsed
+            if self.decay is not None:
+                for matrix in self.matrices.values():
+                    matrix.scale(self.decay ** elapsed, self.epsilon)
+            self.now = now
+        chunks = self._chunks[:]
+        self._chunks.clear()
+        for chunk in chunks:
+            self._fold(chunk)
+        if self.window is not None:
+            self._expire()
+
+    def _fold(self, chunk):
+        codes = chunk['type']
+        for code in np.unique(codes).tolist():
+            rows = codes == code
+            senders, receivers = chunk['sender'][rows], chunk['receiver'][rows]
+            if code in REVERSED_TYPES:
+                senders, receivers = receivers, senders
+            keys = flow_keys(senders, receivers)
+            amounts = chunk['amount'][rows]
+            steps = chunk['step'][rows]
+            if self.decay is not None:
+                amounts = amounts * self.decay ** (self.now - steps)
+            elif self.window is not None:
+                self._held[code].append((steps, keys, amounts))
+            self.matrices[code].add(keys, amounts, self.epsilon)
+
+    def _expire(self):
+        # Subtract rows that have slid out of the window; ledger steps never go
+        # backwards, so they are always at the front
+        cutoff = self.now - self.window
+        for code, held in self._held.items():
+            expired_keys, expired_amounts = [], []
+            while held:
+                steps, keys, amounts = held[0]
+                count = np.searchsorted(steps, cutoff, side='right')
+                if not count:
+                    break
+                expired_keys.append(keys[:count])
+                expired_amounts.append(amounts[:count])
+                if count == len(steps):
+                    held.popleft()
+                else:
+                    held[0] = (steps[count:], keys[count:], amounts[count:])
+                    break
+            if expired_keys:
+                self.matrices[code].add(np.concatenate(expired_keys), -np.concatenate(expired_amounts),
+                                        self.epsilon)
+
+    def effective_steps(self):
+        # Steps' worth of flow the matrices hold, for per-step rates
+        if self.decay is not None:
+            return (1 - self.decay ** self.steps) / (1 - self.decay) if self.decay < 1 else float(self.steps)
+        if self.window is not None:
+            return float(min(self.window, self.steps))
+        return float(self.steps)
+
+    def combined(self, types=TRANSACTION_TYPES):
+        # One coordinate list summing the given transaction types
+        matrices = [self.matrices[TYPE_CODES[name]] for name in types]
+        keys, values = accumulate(np.empty(0, dtype=np.int64), np.empty(0), np.concatenate([m.keys for m in matrices]),
+                                  np.concatenate([m.values for m in matrices]))
+        return keys >> KEY_BITS, keys & KEY_MASK, values
+
+    def size(self):
+        # Number of agent slots: unique ids are dense from the central bank's 0
+        model = self.model
+        return 1 + model.num_firms + model.num_consumers
+
+    def velocity(self):
+        steps = self.effective_steps()
+        if not steps:
+            return 0.0
+        registry = self.model.registry
+        held = (sum(consumer.money for consumer in registry.active_consumers.values())
+                + sum(firm.capital for firm in registry.active_firms.values()))
+        if held <= 0:
+            return 0.0
+        return self.matrices[TYPE_CODES['purchase']].total() / steps / held
+
+    def concentration(self):
+        payers, payees, values = self.combined(('wage', 'purchase'))
+        size = max(self.size(), int(max(payers.max(initial=0), payees.max(initial=0))) + 1)
+        # A firm's throughput: wages it pays plus purchases it receives
+        throughput = (np.bincount(payers, weights=values, minlength=size)
+                      + np.bincount(payees, weights=values, minlength=size))[self.firm_ids]
+        total = throughput.sum()
+        if total <= 0:
+            return 0.0
+        shares = throughput / total
+        return float(shares @ shares)
+
+    def centrality(self):
+        # PageRank over the combined money-flow matrix by power iteration, warm
+        # started from the previous step's ranks
+        payers, payees, values = self.combined()
+        size = max(self.size(), int(max(payers.max(initial=0), payees.max(initial=0))) + 1)
+        out_strength = np.bincount(payers, weights=values, minlength=size)
+        weights = values / out_strength[payers] if len(values) else values
+        dangling = out_strength <= 0
+        rank = self._rank
+        if rank is None or len(rank) != size:
+            rank = np.full(size, 1.0 / size)
+        teleport = (1 - self.damping) / size
+        for _ in range(self.max_iterations):
+            spread = np.bincount(payees, weights=rank[payers] * weights, minlength=size)
+            updated = teleport + self.damping * (spread + rank[dangling].sum() / size)
+            change = np.abs(updated - rank).sum()
+            rank = updated
+            if change < self.tolerance:
+                break
+        self._rank = rank
+        return rank
+
+    def collect(self, model):
+        # Fused reporter for FLOW_METRICS
+        self.refresh()
+        rank = self.centrality()
+        top_firm = float(rank[self.firm_ids].max()) if len(self.firm_ids) else 0.0
+        return (self.velocity(), self.concentration(), float(rank[model.central_bank.unique_id]), top_firm)
+
+    def nbytes(self):
+        return sum(matrix.keys.nbytes + matrix.values.nbytes for matrix in self.matrices.values())
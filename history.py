@@ -0,0 +1,83 @@
+# history.py
+import numpy as np
+
+
+# Fixed-size history: keeps the last `capacity` values in a NumPy ring and running
+# count, sum and extremes over everything ever appended, so summary statistics
+# survive the trimming. With capacity 0 only the running statistics are kept.
+# Iterating and indexing go oldest to newest, as on the list it replaces.
+class RingBuffer:
+    __slots__ = ('values', 'start', 'size', 'count', 'total', 'minimum', 'maximum')
+
+    def __init__(self, capacity):
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.start = 0  # Index of the oldest retained value
+        self.size = 0
+        self.count = 0  # Values appended over the whole run
+        self.total = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    @property
+    def capacity(self):
+        return len(self.values)
+
+    def append(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        capacity = len(self.values)
+        if not capacity:
+            return
+        if self.size < capacity:
+            self.values[(self.start + self.size) % capacity] = value
+            self.size += 1
+        else:
+            self.values[self.start] = value
+            self.start = (self.start + 1) % capacity
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def view(self):
+        # Retained values, oldest first (a copy once the ring has wrapped)
+        end = self.start + self.size
+        if end <= len(self.values):
+            return self.values[self.start:end]
+        return np.concatenate((self.values[self.start:], self.values[:end - len(self.values)]))
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.view().tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.view()[index].tolist()
+        return self.view()[index].item()
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.view()
+        return view if dtype is None else view.astype(dtype)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    @classmethod
+    def restore(cls, capacity, values, count, total, minimum, maximum):
+        buffer = cls(capacity)
+        values = values[max(0, len(values) - capacity):] if capacity else values[:0]
+        buffer.values[:len(values)] = values
+        buffer.size = len(values)
+        buffer.count, buffer.total, buffer.minimum, buffer.maximum = count, total, minimum, maximum
+        return buffer
+
+
+def make_history(retention=None):
+    # Unbounded list by default, as before; a RingBuffer when a retention is set
+    return [] if retention is None else RingBuffer(retention)
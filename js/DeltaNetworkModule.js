@@ -0,0 +1,140 @@
+// Network view fed by DeltaNetworkModule: nodes and edges persist between ticks,
+// each update only carries what changed, and the force layout is only rerun when
+// nodes or edges were added or removed.
+const DeltaNetworkModule = function (svg_width, svg_height) {
+  const svg = d3.create("svg");
+  svg
+    .attr("class", "NetworkModule_d3")
+    .attr("width", svg_width)
+    .attr("height", svg_height)
+    .style("border", "1px dotted");
+
+  document.getElementById("elements").appendChild(svg.node());
+
+  const g = svg.append("g").classed("network_root", true);
+
+  const tooltip = d3
+    .select("body")
+    .append("div")
+    .attr("class", "d3tooltip")
+    .style("opacity", 0);
+
+  const zoom = d3.zoom().on("zoom", (event) => {
+    g.attr("transform", event.transform);
+  });
+  svg.call(zoom);
+  svg.call(zoom.transform, d3.zoomIdentity.translate(svg_width / 2, svg_height / 2));
+
+  const linkLayer = g.append("g").attr("class", "links");
+  const nodeLayer = g.append("g").attr("class", "nodes");
+
+  const nodes = new Map();
+  const edges = new Map();
+
+  const simulation = d3
+    .forceSimulation()
+    .force("charge", d3.forceManyBody().strength(-80).distanceMin(2))
+    .force("link", d3.forceLink().id((d) => d.id))
+    .force("center", d3.forceCenter())
+    .stop();
+
+  // Run the layout to rest from the given energy; existing nodes keep their
+  // positions as the starting point, so a small change only nudges the picture
+  const layout = (alpha) => {
+    simulation.nodes(Array.from(nodes.values()));
+    simulation.force("link").links(Array.from(edges.values()));
+    simulation.alpha(alpha);
+    const ticks = Math.ceil(
+      Math.log(simulation.alphaMin() / alpha) / Math.log(1 - simulation.alphaDecay())
+    );
+    for (let i = 0; i < ticks; ++i) {
+      simulation.tick();
+    }
+  };
+
+  const draw = () => {
+    const lines = linkLayer
+      .selectAll("line")
+      .data(Array.from(edges.values()), (d) => d.id);
+    lines.exit().remove();
+    lines
+      .enter()
+      .append("line")
+      .merge(lines)
+      .attr("x1", (d) => d.source.x)
+      .attr("y1", (d) => d.source.y)
+      .attr("x2", (d) => d.target.x)
+      .attr("y2", (d) => d.target.y)
+      .attr("stroke-width", (d) => d.width)
+      .attr("stroke", (d) => d.color);
+
+    const circles = nodeLayer
+      .selectAll("circle")
+      .data(Array.from(nodes.values()), (d) => d.id);
+    circles.exit().remove();
+    circles
+      .enter()
+      .append("circle")
+      .on("mouseover", function (event, d) {
+        tooltip.transition().duration(200).style("opacity", 0.9);
+        tooltip
+          .html(d.tooltip)
+          .style("left", event.pageX + "px")
+          .style("top", event.pageY + "px");
+      })
+      .on("mouseout", function () {
+        tooltip.transition().duration(500).style("opacity", 0);
+      })
+      .merge(circles)
+      .attr("cx", (d) => d.x)
+      .attr("cy", (d) => d.y)
+      .attr("r", (d) => d.size)
+      .attr("fill", (d) => d.color);
+  };
+
+  this.render = (data) => {
+    if (data.reset) {
+      nodes.clear();
+      edges.clear();
+    }
+    let structural = data.reset;
+
+    data.removed_edges.forEach((id) => {
+      structural = edges.delete(id) || structural;
+    });
+    data.removed_nodes.forEach((id) => {
+      structural = nodes.delete(id) || structural;
+    });
+    data.nodes.forEach((node) => {
+      const current = nodes.get(node.id);
+      if (current) {
+        Object.assign(current, node);
+      } else {
+        nodes.set(node.id, node);
+        structural = true;
+      }
+    });
+    data.edges.forEach((edge) => {
+      const current = edges.get(edge.id);
+      if (current) {
+        // source and target were resolved to node objects by the layout
+        current.color = edge.color;
+        current.width = edge.width;
+      } else {
+        edges.set(edge.id, edge);
+        structural = true;
+      }
+    });
+
+    if (structural) {
+      layout(data.reset ? 1 : 0.3);
+    }
+    draw();
+  };
+
+  this.reset = () => {
+    nodes.clear();
+    edges.clear();
+    draw();
+  };
+};
@@ -0,0 +1,109 @@
+# labor.py
+import heapq
+from collections import deque
+
+
+# Matches unemployed consumers to firms with open positions. The unemployed pool is
+# a persistent FIFO queue fed by the model's employment hooks (layoffs, bankruptcies,
+# hires), so a matching round only touches the consumers it actually hires. Entries
+# are validated against the registry when they are popped, which lets a consumer who
+# was rehired elsewhere simply be skipped instead of searched for and removed.
+#
+# Hiring firms are kept in a persistent heap the same way. The firm hooks (capital
+# writes, layoffs, losing an employee, bankruptcy, restore) mark a firm changed, and
+# the next round pushes a fresh entry for each changed firm; an entry is live only
+# while it is the one recorded for its firm, so outdated ones are skipped when
+# popped. When most firms changed, or stale entries pile up, the heap is rebuilt.
+class LaborMarket:
+    def __init__(self, registry):
+        self.registry = registry
+        self.queue = deque()
+        self.heap = []
+        self.entries = {}  # unique_id -> the firm's live heap entry
+        self.changed = {}  # unique_id -> firm, since the heap was last brought up to date
+        self.rebuild = True  # Nothing is in the heap yet
+
+    def consumer_available(self, consumer):
+        self.queue.append(consumer)
+
+    def firm_changed(self, firm):
+        self.changed[firm.unique_id] = firm
+
+    def next_unemployed(self):
+        unemployed = self.registry.unemployed_consumers
+        while self.queue:
+            consumer = self.queue.popleft()
+            if consumer.unique_id in unemployed:
+                return consumer
+        return None
+
+    @staticmethod
+    def vacancies(firm):
+        # Max employees a firm can support from its capital and production capacity
+        max_employees = min(firm.production_capacity, int(firm.capital / (firm.wage * 3)))
+        return max_employees - len(firm.employees)
+
+    def _push(self, firm, vacancies):
+        # Richest first, ties by id (as a stable sort would give)
+        entry = (-firm.capital, firm.unique_id, firm, vacancies)
+        self.entries[firm.unique_id] = entry
+        heapq.heappush(self.heap, entry)
+
+    def hiring_firms(self):
+        # Bring the heap of active firms with open positions up to date and return it
+        active = self.registry.active_firms
+        if self.rebuild or len(self.changed) * 2 > len(active) or len(self.heap) > 2 * len(active) + 64:
+            self.heap = []
+            self.entries = {}
+            for firm in active.values():
+                vacancies = self.vacancies(firm)
+                if vacancies > 0:
+                    entry = (-firm.capital, firm.unique_id, firm, vacancies)
+                    self.heap.append(entry)
+                    self.entries[firm.unique_id] = entry
+            heapq.heapify(self.heap)
+            self.rebuild = False
+        else:
+            for unique_id, firm in self.changed.items():
+                vacancies = 0 if firm.bankrupt else self.vacancies(firm)
+                if vacancies > 0:
+                    self._push(firm, vacancies)
+                else:
+                    self.entries.pop(unique_id, None)
+        self.changed.clear()
+        return self.heap
+
+    def _pop(self):
+        heap, entries = self.heap, self.entries
+        while heap:
+            entry = heapq.heappop(heap)
+            if entries.get(entry[1]) is entry:
+                del entries[entry[1]]
+                return entry
+        return None
+
+    def match(self, max_hires):
+        hired = 0
+        if max_hires <= 0 or not self.registry.unemployed_consumers:
+            return hired
+        self.hiring_firms()
+        while hired < max_hires:
+            entry = self._pop()
+            if entry is None:
+                break
+            _, _, firm, vacancies = entry
+            quota = min(vacancies, max_hires - hired)
+            filled = 0
+            while filled < quota:
+                consumer = self.next_unemployed()
+                if consumer is None:
+                    break
+                consumer.employer = firm
+                firm.employees.append(consumer)
+                filled += 1
+            hired += filled
+            if filled < vacancies:
+                self._push(firm, vacancies - filled)  # Still hiring next round
+            if filled < quota:
+                break  # Nobody left to hire
+        return hired
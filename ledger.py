@@ -0,0 +1,157 @@
+# ledger.py
+import numpy as np
+from transactions import Transaction
+
+TRANSACTION_TYPES = ('purchase', 'wage', 'loan', 'interest')
+TYPE_CODES = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+
+COLUMNS = (
+    ('step', np.int64),
+    ('sender', np.int64),
+    ('receiver', np.int64),
+    ('amount', np.float64),
+    ('type', np.int8),
+)
+
+
+# Columnar record of every transaction as (step, sender_id, receiver_id, amount,
+# type_code). Rows are staged in plain lists and moved into NumPy columns a chunk
+# at a time; with a retention limit the columns form a ring buffer holding only the
+# most recent rows. Per-edge totals (amount and count per sender, receiver and
+# type) are folded in as each chunk lands, so they cover the full history even
+# when old rows have been overwritten.
+class TransactionLedger:
+    def __init__(self, retention=None, chunk_size=4096):
+        self.retention = retention
+        self.chunk_size = chunk_size
+        capacity = retention if retention else chunk_size
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS}
+        self.size = 0   # Rows currently held in the columns
+        self.head = 0   # Next write position in the columns
+        self.total = 0  # Rows ever recorded
+        self.edges = {}  # (sender, receiver, type_code) -> [amount, count]
+        self.listeners = []  # Called with each chunk as it is flushed
+        self._staged = tuple([] for _ in COLUMNS)
+
+    def append(self, step, sender_id, receiver_id, amount, transaction_type):
+        steps, senders, receivers, amounts, types = self._staged
+        steps.append(step)
+        senders.append(sender_id)
+        receivers.append(receiver_id)
+        amounts.append(amount)
+        types.append(TYPE_CODES[transaction_type])
+        self.total += 1
+        if len(steps) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, step, sender_ids, receiver_ids, amounts, transaction_type):
+        # Batch form of append for many rows sharing a step and type
+        count = len(sender_ids)
+        if not count:
+            return
+        steps, senders, receivers, staged_amounts, types = self._staged
+        steps.extend([step] * count)
+        senders.extend(sender_ids)
+        receivers.extend(receiver_ids)
+        staged_amounts.extend(amounts)
+        types.extend([TYPE_CODES[transaction_type]] * count)
+        self.total += count
+        if len(steps) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        staged = self._staged
+        count = len(staged[0])
+        if not count:
+            return None
+        chunk = {name: np.asarray(values, dtype=dtype) for (name, dtype), values in zip(COLUMNS, staged)}
+        for values in staged:
+            values.clear()
+        self._fold_edges(chunk)
+        self._store(chunk, count)
+        for listener in self.listeners:
+            listener(chunk)
+        return chunk
+
+    def _fold_edges(self, chunk):
+        keys = np.stack((chunk['sender'], chunk['receiver'], chunk['type'].astype(np.int64)), axis=1)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        amounts = np.bincount(inverse, weights=chunk['amount'], minlength=len(unique))
+        counts = np.bincount(inverse, minlength=len(unique))
+        edges = self.edges
+        for (sender, receiver, code), amount, count in zip(unique.tolist(), amounts.tolist(), counts.tolist()):
+            edge = edges.get((sender, receiver, code))
+            if edge is None:
+                edges[(sender, receiver, code)] = [amount, count]
+            else:
+                edge[0] += amount
+                edge[1] += count
+
+    def _store(self, chunk, count):
+        if not self.retention:
+            capacity = len(self.columns['step'])
+            if self.size + count > capacity:
+                capacity = max(capacity * 2, self.size + count)
+                for name, column in self.columns.items():
+                    grown = np.empty(capacity, dtype=column.dtype)
+                    grown[:self.size] = column[:self.size]
+                    self.columns[name] = grown
+            for name, column in self.columns.items():
+                column[self.size:self.size + count] = chunk[name]
+            self.size += count
+            self.head = self.size
+            return
+
+        # Ring buffer: only the newest `retention` rows survive
+        capacity = self.retention
+        if count >= capacity:
+            for name, column in self.columns.items():
+                column[:] = chunk[name][-capacity:]
+            self.head = 0
+            self.size = capacity
+            return
+        positions = (self.head + np.arange(count)) % capacity
+        for name, column in self.columns.items():
+            column[positions] = chunk[name]
+        self.head = (self.head + count) % capacity
+        self.size = min(capacity, self.size + count)
+
+    def set_retention(self, retention):
+        # Switch to a ring buffer of the newest `retention` rows, keeping those held now
+        columns = self.arrays()
+        count = min(len(columns['step']), retention)
+        self.retention = retention
+        self.columns = {name: np.empty(retention, dtype=dtype) for name, dtype in COLUMNS}
+        for name, column in self.columns.items():
+            column[:count] = columns[name][len(columns[name]) - count:]
+        self.size = count
+        self.head = count % retention
+
+    def arrays(self):
+        # Retained rows in chronological order
+        self.flush()
+        if self.retention and self.size == self.retention:
+            order = np.roll(np.arange(self.size), -self.head)
+            return {name: column[order] for name, column in self.columns.items()}
+        return {name: column[:self.size].copy() for name, column in self.columns.items()}
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        frame = pd.DataFrame(self.arrays())
+        frame['type'] = pd.Categorical.from_codes(frame['type'], TRANSACTION_TYPES)
+        return frame
+
+    def edge_totals(self):
+        self.flush()
+        return self.edges
+
+    def __len__(self):
+        held = self.size + len(self._staged[0])
+        return min(held, self.retention) if self.retention else held
+
+    def __iter__(self):
+        columns = self.arrays()
+        for step, sender, receiver, amount, code in zip(*(columns[name].tolist() for name, _ in COLUMNS)):
+            yield Transaction(sender, receiver, amount, TRANSACTION_TYPES[code], step)
@@ -1,52 +1,6 @@
 # main.py
-from mesa.visualization.ModularVisualization import ModularServer
-from mesa.visualization.modules import ChartModule, CanvasGrid, TextElement
-from mesa.visualization.UserParam import Slider
-from agents import Firm, CentralBank, Consumer
-from model import EconomyModel
-import numpy as np
-from mesa.visualization.modules import NetworkModule
-
-def network_portrayal(G):
-    portrayal = {
-        "nodes": [],
-        "edges": []
-    }
-    
-    # Add nodes
-    for node in G.nodes():
-        node_type = G.nodes[node]["type"]
-        color = "blue" if node_type == "firm" else "green" if node_type == "consumer" else "red"
-        size = 6 if node_type == "firm" else 4 if node_type == "consumer" else 8
-        
-        portrayal["nodes"].append({
-            "id": node,
-            "size": size,
-            "color": "gray" if G.nodes[node].get("bankrupt", False) else color,
-            "label": G.nodes[node]["type"]
-        })
-    
-    # Add edges with arrowheads
-    for edge in G.edges(data=True):
-        source, target, data = edge        
-        edge_color = "#666666"
-        
-        if "purchase" in data["transactions"]:
-            edge_color = "#00ff00"
-        elif "wage" in data["transactions"]:
-            edge_color = "#0000ff" 
-        elif "loan" in data["transactions"]:
-            edge_color = "#ff0000"
-        
-        portrayal["edges"].append({
-            "source": source,
-            "target": target,
-            "color": edge_color,
-            "arrow": True
-        })
-    
-    return portrayal
-
+from agents import Firm, Consumer
+from params import MODEL_PARAMS
 
 def agent_portrayal(agent):
     portrayal = {"Shape": "circle", "Filled": "true", "r": 0.5}
@@ -73,84 +27,75 @@ def agent_portrayal(agent):
     
     return portrayal
 
-# Create canvas element with improved resolution
-grid = CanvasGrid(agent_portrayal, 20, 20, 600, 600)
 
-charts = [
-    ChartModule([
-        {"Label": "Economic Health Index", "Color": "black"}
-    ], data_collector_name="datacollector"),
-    
-    ChartModule([
-        {"Label": "Inflation Rate", "Color": "red"},
-        {"Label": "Employment Rate", "Color": "blue"},
-        {"Label": "Average Credit Score", "Color": "purple"}
-    ], data_collector_name="datacollector"),
-    
-    ChartModule([
-        {"Label": "Average Satisfaction", "Color": "green"},
-        {"Label": "Average Price", "Color": "orange"}
-    ], data_collector_name="datacollector"),
-    
-    ChartModule([
-        {"Label": "Money Supply", "Color": "purple"},
-        {"Label": "Total Loans", "Color": "brown"}
-    ], data_collector_name="datacollector"),
-    
-    ChartModule([
-        {"Label": "Bankrupted Firms", "Color": "red"},
-        {"Label": "Bankrupted Consumers", "Color": "gray"}
-    ], data_collector_name="datacollector")
-]
-
-
-model_params = {
-    "num_consumers": Slider(
-        "Number of Consumers", 100, 10, 500, 10,
-        description="Number of consumers in the economy"
-    ),
-    "num_firms": Slider(
-        "Number of Firms", 20, 5, 100, 5,
-        description="Number of firms in the economy"
-    ),
-    "initial_money_supply": Slider(
-        "Initial Money Supply", 2000000, 500000, 10000000, 100000,
-        description="Initial money supply in the economy"
-    ),
-    "base_interest_rate": Slider(
-        "Base Interest Rate", 0.05, 0.01, 0.20, 0.01,
-        description="Base interest rate set by central bank"
-    ),
-    "initial_firm_capital": Slider(
-        "Initial Firm Capital", 200000, 50000, 1000000, 50000,
-        description="Initial capital for each firm"
-    ),
-    "initial_consumer_money": Slider(
-        "Initial Consumer Money", 2000, 500, 20000, 500,
-        description="Initial money for each consumer"
-    ),
-    "market_volatility": Slider(
-        "Market Volatility", 0.2, 0.0, 1.0, 0.05,
-        description="Market price volatility (0 = stable, 1 = volatile)"
-    ),
-    "bankruptcy_threshold": Slider(
-        "Bankruptcy Threshold", 0.3, 0.1, 0.9, 0.05,
-        description="Capital ratio threshold for bankruptcy (lower = stricter)"
-    ),
-    "satisfaction_threshold": Slider(
-        "Satisfaction Threshold", 0.5, 0.1, 0.9, 0.05,
-        description="Consumer satisfaction threshold for loyalty"
+# The server and the mesa visualization modules behind it are only loaded when
+# asked for, so importing this module (or running models headless with run.py)
+# doesn't pay for them
+def build_server():
+    from mesa.visualization.ModularVisualization import ModularServer
+    from mesa.visualization.modules import ChartModule
+    from mesa.visualization.UserParam import Slider
+    from model import EconomyModel
+    from visualization import ClusteredCanvasGrid, DeltaNetworkModule
+
+    # Create canvas element with improved resolution; large populations are drawn
+    # as per-cell consumer clusters
+    grid = ClusteredCanvasGrid(agent_portrayal, 20, 20, 600, 600)
+
+    charts = [
+        ChartModule([
+            {"Label": "Economic Health Index", "Color": "black"}
+        ], data_collector_name="datacollector"),
+
+        ChartModule([
+            {"Label": "Inflation Rate", "Color": "red"},
+            {"Label": "Employment Rate", "Color": "blue"}
+        ], data_collector_name="datacollector"),
+
+        ChartModule([
+            {"Label": "Average Satisfaction", "Color": "green"},
+            {"Label": "Average Price", "Color": "orange"}
+        ], data_collector_name="datacollector"),
+
+        ChartModule([
+            {"Label": "Money Supply", "Color": "purple"},
+            {"Label": "Total Loans", "Color": "brown"}
+        ], data_collector_name="datacollector"),
+
+        ChartModule([
+            {"Label": "Bankrupted Firms", "Color": "red"},
+            {"Label": "Bankrupted Consumers", "Color": "gray"}
+        ], data_collector_name="datacollector")
+    ]
+
+    model_params = {
+        name: Slider(label, default, minimum, maximum, step, description=description)
+        for name, (label, default, minimum, maximum, step, description) in MODEL_PARAMS.items()
+    }
+
+    network = DeltaNetworkModule(800, 800)
+
+    return ModularServer(
+        EconomyModel,
+        [grid, network] + charts,
+        "Advanced Economy Simulation",
+        model_params
     )
-}
 
-network = NetworkModule(network_portrayal, 800, 800)
 
-server = ModularServer(
-    EconomyModel,
-    [grid, network] + charts,
-    "Advanced Economy Simulation",
-    model_params
-)
+_server = None
+
+
+def __getattr__(name):
+    # `main.server` still works for callers that expect the module-level server;
+    # it is built on first access
+    global _server
+    if name == "server":
+        if _server is None:
+            _server = build_server()
+        return _server
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
-    server.launch()
+    build_server().launch()
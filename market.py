@@ -0,0 +1,79 @@
+# market.py
+
+# Goods market over the model's MultiGrid. Active firms are bucketed by the cell
+# they sit in, and the index only changes when a firm goes bankrupt or recovers,
+# so finding a consumer's candidates touches the cells within `radius` of it
+# rather than every firm. Consumers place orders during their step; clear() then
+# settles them in bulk, one cell at a time: every buyer in a cell faces the same
+# candidates at the same distances, so the cell's best offer is found once and
+# shared by all of them.
+class GoodsMarket:
+    def __init__(self, grid, radius=2, distance_cost=0.1):
+        self.grid = grid
+        self.radius = radius
+        self.distance_cost = distance_cost  # Price markup per cell of distance
+        self.buckets = {}  # pos -> {unique_id: firm}, active firms only
+        self.orders = {}   # pos -> consumers waiting for this step's clearing
+        self._reach = {}   # pos -> [(pos, distance)] for the cells within radius
+
+    def add_firm(self, firm):
+        if not firm.bankrupt:
+            self.buckets.setdefault(firm.pos, {})[firm.unique_id] = firm
+
+    def remove_firm(self, firm):
+        bucket = self.buckets.get(firm.pos)
+        if bucket is not None:
+            bucket.pop(firm.unique_id, None)
+            if not bucket:
+                del self.buckets[firm.pos]
+
+    def reach(self, pos):
+        cells = self._reach.get(pos)
+        if cells is None:
+            cells = [(cell, self.distance(pos, cell)) for cell in
+                     self.grid.get_neighborhood(pos, moore=True, include_center=True, radius=self.radius)]
+            self._reach[pos] = cells
+        return cells
+
+    def distance(self, a, b):
+        # Chebyshev distance, wrapping around when the grid is a torus
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        if self.grid.torus:
+            dx, dy = min(dx, self.grid.width - dx), min(dy, self.grid.height - dy)
+        return max(dx, dy)
+
+    def candidates(self, pos):
+        # (firm, distance) for every active firm within reach of pos
+        buckets = self.buckets
+        return [(firm, distance) for cell, distance in self.reach(pos) if cell in buckets
+                for firm in buckets[cell].values()]
+
+    def best_offer(self, pos):
+        # The firm with the lowest price once distance is priced in; ties go to the
+        # lower id so the choice doesn't depend on bucket order
+        best = None
+        best_key = None
+        for firm, distance in self.candidates(pos):
+            key = (firm.price * (1 + self.distance_cost * distance), firm.unique_id)
+            if best_key is None or key < best_key:
+                best, best_key = firm, key
+        return best
+
+    def order(self, consumer):
+        self.orders.setdefault(consumer.pos, []).append(consumer)
+
+    def clear(self):
+        # Settle every order placed this step and finish each buyer's step, so its
+        # satisfaction and borrowing see the purchase as they did when consumers
+        # bought during their own step; returns the number of purchases
+        purchases = 0
+        orders, self.orders = self.orders, {}
+        for pos, buyers in orders.items():
+            firm = self.best_offer(pos)
+            for consumer in buyers:
+                if consumer.bankrupt:
+                    continue
+                if firm is not None and consumer.buy_from(firm):
+                    purchases += 1
+                consumer.finish_step()
+        return purchases
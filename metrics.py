@@ -0,0 +1,332 @@
+# metrics.py
+import types
+from functools import partial
+from statistics import NormalDist
+import numpy as np
+
+# The model-level series both engines report, in DataCollector column order
+MODEL_METRICS = (
+    "Inflation Rate",
+    "Employment Rate",
+    "Average Satisfaction",
+    "Bankrupted Firms",
+    "Bankrupted Consumers",
+    "Money Supply",
+    "Total Loans",
+    "Average Price",
+    "Economic Health Index",
+)
+
+# One metric's values in a preallocated NumPy column. Indexing and iteration give
+# Python scalars, and it supports the list operations callers use on
+# DataCollector's model_vars lists (len, [-1], truth value, clear), so it can stand
+# in for them. The dtype comes from the first value: int64 for integers, float64
+# otherwise, widened to float64 if a float turns up later.
+class MetricColumn:
+    def __init__(self, capacity=256):
+        self.values = None
+        self.size = 0
+        self.capacity = max(1, capacity)
+
+    def append(self, value):
+        if value is None:
+            value = np.nan
+        integer = isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+        if self.values is None:
+            self.values = np.empty(self.capacity, dtype=np.int64 if integer else np.float64)
+        elif not integer and self.values.dtype != np.float64:
+            self.values = self.values.astype(np.float64)
+        if self.size == len(self.values):
+            self.reserve(self.size * 2)
+        self.values[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def reserve(self, capacity):
+        self.capacity = max(self.capacity, capacity)
+        if self.values is not None and len(self.values) < capacity:
+            grown = np.empty(capacity, dtype=self.values.dtype)
+            grown[:self.size] = self.values[:self.size]
+            self.values = grown
+
+    def view(self):
+        if self.values is None:
+            return np.empty(0, dtype=np.float64)
+        return self.values[:self.size]
+
+    def clear(self):
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.view()[index].tolist()
+        return self.view()[index].item()
+
+    def __iter__(self):
+        return iter(self.view().tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        view = self.view()
+        return view if dtype is None else view.astype(dtype)
+
+
+# model_vars mapping whose values are MetricColumns; assigning a list to a name
+# loads it into that column
+class MetricColumns(dict):
+    def __setitem__(self, name, values):
+        if isinstance(values, MetricColumn):
+            super().__setitem__(name, values)
+            return
+        column = self[name]
+        column.clear()
+        column.extend(values)
+
+
+# Drop-in for mesa's DataCollector (model reporters only) that records into
+# preallocated NumPy columns. Reporters are added one at a time as in DataCollector,
+# or as a fused group: one function computing several metrics in a single pass.
+# Rows are recorded every `interval` collect() calls, and a metric listed in
+# `decimation` keeps only every k-th of those rows. Each row remembers the step it
+# was collected at (the models collect once per step, so the collect() call count
+# before it). Collecting every step without decimation, row and step coincide and
+# get_model_vars_dataframe keeps DataCollector's unnamed RangeIndex; otherwise its
+# index is the rows' steps, named "step".
+class MetricsCollector:
+    def __init__(self, model_reporters=None, capacity=256, interval=1, decimation=None):
+        self.capacity = capacity
+        self.interval = interval
+        self.decimation = dict(decimation or {})  # name -> keep every k-th row
+        self.model_reporters = {}
+        self.model_vars = MetricColumns()
+        self.calls = 0  # collect() calls so far
+        self.rows = 0   # Rows recorded so far
+        self.last_recorded = ()  # Names the latest collect() recorded a value for
+        self.row_steps = MetricColumn(capacity)  # Step of each row still held
+        self.trimmed = 0  # Rows dropped by trim()
+        # Called with {name: value} for each row as it is recorded, before a sink
+        # can trim it
+        self.listeners = []
+        self._groups = []  # (names, reporter, fused)
+        for name, reporter in (model_reporters or {}).items():
+            self.add_reporter(name, reporter)
+
+    def add_reporter(self, name, reporter):
+        self.model_reporters[name] = reporter
+        self.model_vars[name] = self._new_column(name)
+        self._groups.append(((name,), reporter, False))
+
+    def add_fused(self, names, reporter):
+        # reporter(model) returns one value per name, in order
+        names = tuple(names)
+        for name in names:
+            self.model_reporters[name] = reporter
+            self.model_vars[name] = self._new_column(name)
+        self._groups.append((names, reporter, True))
+
+    def _new_column(self, name):
+        return MetricColumn(self.capacity)
+
+    def _record(self, name, value):
+        self.model_vars[name].append(value)
+
+    def reserve(self, rows):
+        # Preallocate for a run of known length
+        for column in self.model_vars.values():
+            column.reserve(rows)
+        self.row_steps.reserve(rows)
+
+    def trim(self):
+        # Drop every row held so far, e.g. once a sink has written them out
+        for column in self.model_vars.values():
+            column.clear()
+        self.row_steps.clear()
+        self.trimmed = self.rows
+
+    def steps(self, name):
+        # Steps of the values `name` holds: with decimation k it kept the rows whose
+        # overall number is a multiple of k
+        every = self.decimation.get(name, 1)
+        return self.row_steps.view()[-self.trimmed % every::every][:len(self.model_vars[name])]
+
+    def collect(self, model):
+        call = self.calls
+        self.calls += 1
+        self.last_recorded = ()
+        if call % self.interval:
+            return
+        row = self.rows
+        self.rows += 1
+        self.row_steps.append(call)
+        decimation = self.decimation
+        record = self._record
+        recorded = []
+        for names, reporter, fused in self._groups:
+            due = [not row % decimation.get(name, 1) for name in names]
+            if not any(due):
+                continue
+            if fused:
+                values = reporter(model)
+            else:
+                values = (self._report(reporter, model),)
+            for name, value, keep in zip(names, values, due):
+                if keep:
+                    record(name, value)
+                    recorded.append(name)
+        self.last_recorded = tuple(recorded)
+        if self.listeners:
+            values = {name: self.model_vars[name][-1] for name in recorded}
+            for listener in self.listeners:
+                listener(values)
+
+    @staticmethod
+    def _report(reporter, model):
+        # Same dispatch as DataCollector.collect
+        if isinstance(reporter, (types.LambdaType, partial)):
+            return reporter(model)
+        if isinstance(reporter, str):
+            return getattr(model, reporter, None)
+        if isinstance(reporter, list):
+            return reporter[0](*reporter[1])
+        return reporter()
+
+    def get_model_vars_dataframe(self):
+        import pandas as pd
+
+        if self.decimation:
+            # Decimated metrics are NaN on the rows they skipped
+            frame = pd.DataFrame({name: pd.Series(column.view(), index=self.steps(name))
+                                  for name, column in self.model_vars.items()})
+        elif self.interval == 1:
+            # A trimmed collector's rows start at the first step it still holds
+            index = pd.RangeIndex(self.trimmed, self.trimmed + len(self.row_steps))
+            return pd.DataFrame({name: column.view() for name, column in self.model_vars.items()}, index=index)
+        else:
+            frame = pd.DataFrame({name: column.view() for name, column in self.model_vars.items()},
+                                 index=self.row_steps.view())
+        frame.index.name = "step"
+        return frame
+
+
+def t_critical(df, confidence=0.95):
+    # Two-sided Student t critical value, from the normal quantile by the
+    # Cornish-Fisher expansion (within 1e-3 of the exact value for df >= 5)
+    if df < 1:
+        return np.nan
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return (z + (z ** 3 + z) / (4 * df)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+def replica_summary(values, quantiles=(0.05, 0.5, 0.95), confidence=0.95):
+    # Per-row mean, standard deviation, confidence interval of the mean and
+    # quantiles of a (rows, replicas) matrix
+    values = np.asarray(values, dtype=np.float64)
+    replicas = values.shape[1]
+    mean = values.mean(axis=1)
+    std = values.std(axis=1, ddof=1) if replicas > 1 else np.zeros(len(values))
+    half_width = t_critical(replicas - 1, confidence) * std / np.sqrt(replicas)
+    summary = {"mean": mean, "std": std, "ci_low": mean - half_width, "ci_high": mean + half_width}
+    if len(values):
+        for q, column in zip(quantiles, np.quantile(values, quantiles, axis=1)):
+            summary[f"q{q * 100:g}"] = column
+    else:
+        summary.update({f"q{q * 100:g}": mean for q in quantiles})
+    return summary
+
+
+# One metric's values across replicas: a preallocated (rows, replicas) matrix
+class ReplicaColumn:
+    def __init__(self, replicas, capacity=256):
+        self.replicas = replicas
+        self.values = None
+        self.size = 0
+        self.capacity = max(1, capacity)
+
+    def append(self, row):
+        row = np.asarray(row)
+        if self.values is None:
+            dtype = np.int64 if row.dtype.kind in "iu" else np.float64
+            self.values = np.empty((self.capacity, self.replicas), dtype=dtype)
+        elif row.dtype.kind not in "iu" and self.values.dtype != np.float64:
+            self.values = self.values.astype(np.float64)
+        if self.size == len(self.values):
+            self.reserve(self.size * 2)
+        self.values[self.size] = row
+        self.size += 1
+
+    def reserve(self, capacity):
+        self.capacity = max(self.capacity, capacity)
+        if self.values is not None and len(self.values) < capacity:
+            grown = np.empty((capacity, self.replicas), dtype=self.values.dtype)
+            grown[:self.size] = self.values[:self.size]
+            self.values = grown
+
+    def view(self):
+        if self.values is None:
+            return np.empty((0, self.replicas), dtype=np.float64)
+        return self.values[:self.size]
+
+    def clear(self):
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+
+# Collector for ensemble models, whose reporters return one value per replica.
+# Each metric is kept as a (rows, replicas) matrix in replica_vars, and model_vars
+# holds the across-replica mean, so code written against MetricsCollector reads
+# the ensemble average.
+class EnsembleCollector(MetricsCollector):
+    def __init__(self, replicas, model_reporters=None, capacity=256, interval=1, decimation=None):
+        self.replicas = replicas
+        self.replica_vars = {}
+        super().__init__(model_reporters, capacity, interval, decimation)
+
+    def _new_column(self, name):
+        self.replica_vars[name] = ReplicaColumn(self.replicas, self.capacity)
+        return super()._new_column(name)
+
+    def _record(self, name, values):
+        values = np.asarray(values)
+        self.replica_vars[name].append(values)
+        self.model_vars[name].append(values.mean().item())
+
+    def reserve(self, rows):
+        super().reserve(rows)
+        for column in self.replica_vars.values():
+            column.reserve(rows)
+
+    def trim(self):
+        super().trim()
+        for column in self.replica_vars.values():
+            column.clear()
+
+    def _index(self, name):
+        import pandas as pd
+
+        return pd.Index(self.steps(name), name="step")
+
+    def get_replica_dataframe(self, name):
+        import pandas as pd
+
+        return pd.DataFrame(self.replica_vars[name].view(), index=self._index(name))
+
+    def summary(self, name, quantiles=(0.05, 0.5, 0.95), confidence=0.95):
+        import pandas as pd
+
+        values = self.replica_vars[name].view()
+        return pd.DataFrame(replica_summary(values, quantiles, confidence), index=self._index(name))
+
+    def get_summary_dataframe(self, quantiles=(0.05, 0.5, 0.95), confidence=0.95):
+        # Every metric's summary side by side, with (metric, statistic) columns
+        import pandas as pd
+
+        return pd.concat({name: self.summary(name, quantiles, confidence) for name in self.replica_vars}, axis=1)
@@ -2,68 +2,165 @@
 from mesa import Model
 from mesa.time import RandomActivation
 from mesa.space import MultiGrid
-from mesa.datacollection import DataCollector
 import numpy as np
 from agents import Firm, CentralBank, Consumer
-import networkx as nx
+from aggregates import MarketAggregates
+from registry import AgentRegistry
+from ledger import TransactionLedger, TRANSACTION_TYPES
+from profiling import StepProfiler
+from events import EventLog
+from labor import LaborMarket
+from market import GoodsMarket
+from watch import ThresholdWatch
+from metrics import MetricsCollector, MODEL_METRICS
+from flows import FLOW_METRICS
+from rng import RandomStreams
 
 class EconomyModel(Model):
     def __init__(self, num_consumers, num_firms, initial_money_supply, base_interest_rate,
                  initial_firm_capital, initial_consumer_money, market_volatility=0.2,
-                 bankruptcy_threshold=0.3, satisfaction_threshold=0.5, width=20, height=20):
+                 bankruptcy_threshold=0.3, satisfaction_threshold=0.5, width=20, height=20,
+                 seed=None, debug_aggregates=False, remove_bankrupt=False, transaction_retention=None,
+                 sink=None, profile=False, events=None, amortization_rate=0.0, collect_interval=1,
+                 metric_decimation=None, goods_market=False, market_radius=2, market_distance_cost=0.1,
+                 history_retention=None, flows=None, distress_threshold=None):
         super().__init__()
+        if seed is not None:
+            self.reset_randomizer(seed)  # mesa's __new__ only sees a seed passed by keyword
         self.num_consumers = num_consumers
         self.num_firms = num_firms
         self.grid = MultiGrid(width, height, True)
         self.schedule = RandomActivation(self)
-        self.bankruptcy_threshold = bankruptcy_threshold
-        self.transactions = []
-        self.G = nx.DiGraph()
+        # The step being simulated. schedule.steps moves on as soon as the agents have
+        # stepped, so rows written by the phases after it are stamped with this instead
+        self.current_step = 0
+        self._bankruptcy_threshold = bankruptcy_threshold
+        self._distress_threshold = distress_threshold  # Firms under it get loans; None means the bankruptcy threshold
+        self.watch = ThresholdWatch()
+        self.transactions = TransactionLedger(retention=transaction_retention)
+        self._graph = None
+        self._graph_key = None
+        self.aggregates = MarketAggregates()
+        self.debug_aggregates = debug_aggregates  # Check the cache against a full rescan on every read
+        self.registry = AgentRegistry()
+        self.remove_bankrupt = remove_bankrupt  # Drop bankrupt agents from the schedule
+        self.labor_market = LaborMarket(self.registry)
+        # Consumers buy from the best nearby firm instead of their employer
+        self.market = GoodsMarket(self.grid, market_radius, market_distance_cost) if goods_market else None
+        self.events = events if events is not None else EventLog()
+        self.events.bind(self)
+        self.streams = RandomStreams(seed)  # Named numpy streams for the stochastic terms of a step
+        self.volatility_shocks = np.zeros(num_firms)
+        self.history_retention = history_retention  # Per-agent history length; None keeps everything
         
         # Create Central Bank
-        self.central_bank = CentralBank(0, self, initial_money_supply, base_interest_rate)
+        self.central_bank = CentralBank(0, self, initial_money_supply, base_interest_rate, amortization_rate,
+                                        history_retention)
         self.schedule.add(self.central_bank)
-        self.G.add_node(0, type="bank")
         
         # Create Firms
         for i in range(num_firms):
-            firm = Firm(i + 1, self, initial_firm_capital, market_volatility)
-            self.schedule.add(firm)
+            firm = Firm(i + 1, self, initial_firm_capital, market_volatility, history_retention)
             x = self.random.randrange(self.grid.width)
             y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(firm, (x, y))
-            self.G.add_node(firm.unique_id, type="firm")
+            self.add_firm(firm, (x, y))
         
         # Create Consumers
         for i in range(num_consumers):
             consumer = Consumer(i + num_firms + 1, self, initial_consumer_money, satisfaction_threshold)
-            self.schedule.add(consumer)
             x = self.random.randrange(self.grid.width)
             y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(consumer, (x, y))
-            self.G.add_node(consumer.unique_id, type="consumer")
+            self.add_consumer(consumer, (x, y))
         
         self.distribute_employment()
         
         # Enhanced Data Collection
-        self.datacollector = DataCollector(
-            model_reporters={
-                "Inflation Rate": lambda m: m.central_bank.inflation_rate,
-                "Employment Rate": self.get_employment_rate,
-                "Average Satisfaction": self.get_average_satisfaction,
-                "Bankrupted Firms": lambda m: m.central_bank.bankrupted_firms,
-                "Bankrupted Consumers": lambda m: m.central_bank.bankrupted_consumers,
-                "Money Supply": lambda m: m.central_bank.money_supply,
-                "Total Loans": lambda m: m.central_bank.total_loans,
-                "Average Price": lambda m: self.get_average_price(),
-                "Economic Health Index": lambda m: self.get_economic_health_index(),
-            }
-        )
-
-    def add_transaction(self, transaction):
-        self.transactions.append(transaction)
-        self.G.add_edges_from([(transaction.sender.unique_id, transaction.receiver.unique_id, 
-                                {"amount": transaction.amount, "transactions": transaction.transaction_type})])
+        self.sink = sink  # Optional ColumnarSink streaming transactions and metrics to disk
+        if sink is not None:
+            sink.attach(self)
+
+        # The MODEL_METRICS series come from one fused read of the aggregates
+        self.datacollector = MetricsCollector(interval=collect_interval, decimation=metric_decimation)
+        self.datacollector.add_fused(MODEL_METRICS, EconomyModel.collect_metrics)
+
+        # Optional money-flow analytics (a flows.FlowAnalytics) fed from the ledger
+        self.flows = flows
+        if flows is not None:
+            flows.attach(self)
+            self.datacollector.add_fused(FLOW_METRICS, flows.collect)
+        model_reporters = self.events.reporters()
+
+        # Optional per-phase timing; without it no timing code runs at all
+        self.profiler = StepProfiler() if profile else None
+        if self.profiler is not None:
+            model_reporters.update(self.profiler.reporters())
+
+        for name, reporter in model_reporters.items():
+            self.datacollector.add_reporter(name, reporter)
+        if self.profiler is not None:
+            self.profiler.attach(self)
+
+    def add_firm(self, firm, pos):
+        self.schedule.add(firm)
+        self.grid.place_agent(firm, pos)
+        self.aggregates.add_firm(firm)
+        self.registry.add_firm(firm)
+        if self.market is not None:
+            self.market.add_firm(firm)
+        self.labor_market.firm_changed(firm)
+        firm.watch_floor = self.firm_watch_floor(firm)
+        if not firm.bankrupt and firm.capital < firm.watch_floor:
+            self.watch.firm_below(firm)
+
+    def add_consumer(self, consumer, pos):
+        self.schedule.add(consumer)
+        self.grid.place_agent(consumer, pos)
+        self.aggregates.add_consumer(consumer)
+        self.registry.add_consumer(consumer)
+        self.labor_market.consumer_available(consumer)
+        consumer.watch_floor = self.consumer_watch_floor(consumer)
+        if not consumer.bankrupt and consumer.money < consumer.watch_floor:
+            self.watch.consumer_below(consumer)
+
+    def add_transaction(self, sender_id, receiver_id, amount, transaction_type):
+        self.transactions.append(self.current_step, sender_id, receiver_id, amount, transaction_type)
+
+    def add_transactions(self, sender_ids, receiver_ids, amounts, transaction_type):
+        self.transactions.extend(self.current_step, sender_ids, receiver_ids, amounts, transaction_type)
+
+    @property
+    def G(self):
+        # The transaction network is an aggregated view of the ledger, rebuilt only
+        # when it is read after new transactions or bankruptcies
+        key = (self.transactions.total, len(self.registry.bankrupt_firms), len(self.registry.bankrupt_consumers))
+        if self._graph is None or key != self._graph_key:
+            self._graph = self.build_graph()
+            self._graph_key = key
+        return self._graph
+
+    def build_graph(self):
+        import networkx as nx
+
+        G = nx.DiGraph()
+        G.add_node(self.central_bank.unique_id, type="bank", bankrupt=False)
+        for firm in sorted(self.registry.firms(), key=lambda f: f.unique_id):
+            G.add_node(firm.unique_id, type="firm", bankrupt=firm.bankrupt)
+        for consumer in sorted(self.registry.consumers(), key=lambda c: c.unique_id):
+            G.add_node(consumer.unique_id, type="consumer", bankrupt=consumer.bankrupt)
+
+        # One edge per sender/receiver pair, with totals per transaction type
+        for (sender, receiver, code), (amount, count) in self.transactions.edge_totals().items():
+            transaction_type = TRANSACTION_TYPES[code]
+            if G.has_edge(sender, receiver):
+                data = G.edges[sender, receiver]
+                data["amount"] += amount
+                data["count"] += count
+                data["transactions"].append(transaction_type)
+                data["amounts"][transaction_type] = amount
+            else:
+                G.add_edge(sender, receiver, amount=amount, count=count,
+                           transactions=[transaction_type], amounts={transaction_type: amount})
+        return G
 
     def get_graph_data(self):
         # Prepare data for Plotly visualization
@@ -81,116 +178,202 @@ class EconomyModel(Model):
 
     # model.py
     def step(self):
+        self.current_step = self.schedule.steps
+        self.events.start_step()
+        self.draw_shocks()
         self.schedule.step()
+        if self.market is not None:
+            self.market.clear()
+
+        # Collect interest and amortization on all loans
+        self.central_bank.service_loans()
         
         # Update inflation rate
-        self.central_bank.update_inflation_rate([agent.price for agent in self.schedule.agents 
-                                                if isinstance(agent, Firm) and not agent.bankrupt])
+        self.central_bank.update_inflation_rate([firm.price for firm in self.registry.active_firms.values()])
         
-        # Check bankruptcies
-        self.check_bankruptcies()
+        # Bankruptcies and distress loans queued by the threshold watch
+        self.handle_thresholds()
         
         # Distribute employment
         self.distribute_employment()
-        
-        # Firms that are at risk of bankruptcy can request loans
-        for agent in self.schedule.agents:
-            if isinstance(agent, Firm) and not agent.bankrupt:
-                if agent.capital < agent.initial_capital * self.bankruptcy_threshold:
-                    agent.request_loan(50000)  # Example loan amount
 
         self.datacollector.collect(self)
+        if self.sink is not None:
+            self.sink.record_step(self)
+
+
+    def draw_shocks(self):
+        # Pre-draw this step's volatility shocks for every firm slot in one call
+        self.volatility_shocks = self.streams.uniform_shocks("volatility", self.num_firms)
 
+    def volatility_shock(self, firm):
+        return self.volatility_shocks[firm.unique_id - 1]  # Firms hold ids 1..num_firms
 
     def get_total_transactions(self):
-        return len(self.transactions)
+        return self.transactions.total
+
+    def collapsed(self):
+        # Nothing left to simulate: every firm or every consumer is bankrupt
+        return not self.registry.active_firms or not self.registry.active_consumers
     
     def distribute_employment(self, initial_employment_rate=0.6):
-    # Limit initial employment to a fixed percentage
-        available_consumers = [agent for agent in self.schedule.agents 
-                            if isinstance(agent, Consumer) and not agent.bankrupt]
-        active_firms = [agent for agent in self.schedule.agents 
-                        if isinstance(agent, Firm) and not agent.bankrupt]
+        # Limit employment to a fixed share of the active consumers
+        initial_employment_target = int(initial_employment_rate * len(self.registry.active_consumers))
+        return self.labor_market.match(initial_employment_target - self.aggregates.employed_consumers)
 
-        active_firms.sort(key=lambda x: x.capital, reverse=True)
-        
-        # Calculate initial employment target based on rate
-        initial_employment_target = int(initial_employment_rate * len(available_consumers))
-        currently_employed = 0
-        
-        for firm in active_firms:
-            # Determine max number of employees firm can support based on capital and production capacity
-            max_employees = min(
-                firm.production_capacity,
-                int(firm.capital / (firm.wage * 3))
-            )
-            
-            # Determine needed employees while respecting the initial employment target
-            needed_employees = max(0, max_employees - len(firm.employees))
-            new_hires = min(needed_employees, initial_employment_target - currently_employed, len(available_consumers))
-            
-            # Hire new employees based on available slots and the initial employment target
-            for _ in range(new_hires):
-                if available_consumers:
-                    consumer = available_consumers.pop(0)
-                    consumer.employer = firm
-                    firm.employees.append(consumer)
-                    currently_employed += 1
-                else:
-                    break  # Exit if no more available consumers
-
-            # If the initial employment target has been met, stop
-            if currently_employed >= initial_employment_target:
-                break
+    # Balance floors the agents' watch checks against; changing a threshold
+    # recomputes every agent's floor and requeues whoever is now under it
+    @property
+    def bankruptcy_threshold(self):
+        return self._bankruptcy_threshold
 
+    @bankruptcy_threshold.setter
+    def bankruptcy_threshold(self, value):
+        self._bankruptcy_threshold = value
+        self.update_watch_floors()
+
+    @property
+    def distress_threshold(self):
+        return self._bankruptcy_threshold if self._distress_threshold is None else self._distress_threshold
+
+    @distress_threshold.setter
+    def distress_threshold(self, value):
+        self._distress_threshold = value
+        self.update_watch_floors()
+
+    def firm_watch_floor(self, firm):
+        return firm.initial_capital * max(self._bankruptcy_threshold, self.distress_threshold)
+
+    def consumer_watch_floor(self, consumer):
+        return consumer.initial_money * self._bankruptcy_threshold
+
+    def update_watch_floors(self):
+        firms, consumers = self.registry.firms(), self.registry.consumers()
+        for firm in firms:
+            firm.watch_floor = self.firm_watch_floor(firm)
+        for consumer in consumers:
+            consumer.watch_floor = self.consumer_watch_floor(consumer)
+        self.watch.rescan(firms, consumers)
+
+    def handle_thresholds(self):
+        # Once per step: bankrupt the queued agents still under the bankruptcy
+        # floor, count every bankruptcy since the last call (including wage
+        # shortfalls and loan defaults), then lend to the firms under the distress
+        # floor. Employment links are already gone: the bankruptcy hooks cut them
+        bank = self.central_bank
+        watch = self.watch
+        threshold = self._bankruptcy_threshold
+        distressed = []
+        for firm in watch.drain_below_firms():
+            if firm.bankrupt:
+                continue
+            if firm.capital < firm.initial_capital * threshold:
+                firm.bankrupt = True
+            else:
+                distressed.append(firm)
+        bank.bankrupted_firms += len(watch.drain_bankrupted_firms())
+
+        for consumer in watch.drain_below_consumers():
+            if not consumer.bankrupt and consumer.money < consumer.initial_money * threshold:
+                consumer.bankrupt = True
+        bank.bankrupted_consumers += len(watch.drain_bankrupted_consumers())
+
+        # Distressed firms stay queued, and keep asking, for as long as they are under the floor
+        distress = self.distress_threshold
+        for firm in distressed:
+            if firm.capital < firm.initial_capital * distress:
+                firm.request_loan(50000)  # Example loan amount
+            if not firm.bankrupt and firm.capital < firm.watch_floor:
+                watch.firm_below(firm)
+
+    # Hooks called by the agents' state properties
+    def firm_bankrupted(self, firm):
+        self.watch.firm_bankrupted(firm)
+        self.central_bank.loan_book.write_off(firm)
+        self.aggregates.remove_firm(firm)
+        self.registry.firm_bankrupted(firm)
+        self.labor_market.firm_changed(firm)
+        if self.market is not None:
+            self.market.remove_firm(firm)
+        if self.remove_bankrupt:
+            self.schedule.remove(firm)
+        # Released as soon as the flag is set, so nobody stepping later this round
+        # still works or shops there
+        for employee in firm.employees:
+            employee.employer = None
+        firm.employees.clear()
+
+    def firm_restored(self, firm):
+        self.watch.firm_restored(firm)
+        self.aggregates.add_firm(firm)
+        self.registry.firm_restored(firm)
+        self.labor_market.firm_changed(firm)
+        if self.market is not None:
+            self.market.add_firm(firm)
+        if self.remove_bankrupt:
+            self.schedule.add(firm)
+
+    def consumer_bankrupted(self, consumer):
+        self.watch.consumer_bankrupted(consumer)
+        self.central_bank.loan_book.write_off(consumer)
+        self.aggregates.remove_consumer(consumer)
+        self.registry.consumer_bankrupted(consumer)
+        if self.remove_bankrupt:
+            self.schedule.remove(consumer)
+        if consumer.employer is not None:  # Unlinked after the aggregates have counted it out
+            consumer.employer.employees.remove(consumer)
+            self.labor_market.firm_changed(consumer.employer)
+            consumer.employer = None
+
+    def consumer_restored(self, consumer):
+        self.watch.consumer_restored(consumer)
+        self.aggregates.add_consumer(consumer)
+        self.registry.consumer_restored(consumer)
+        if consumer.employer is None:
+            self.labor_market.consumer_available(consumer)
+        if self.remove_bankrupt:
+            self.schedule.add(consumer)
+
+    def employment_changed(self, consumer, was_employed):
+        self.aggregates.employment_changed(was_employed, consumer.employer is not None)
+        self.registry.employment_changed(consumer)
+        if consumer.employer is None:
+            self.labor_market.consumer_available(consumer)
     
-    def check_bankruptcies(self):
-        for agent in self.schedule.agents:
-            if isinstance(agent, Firm):
-                if not agent.bankrupt and agent.capital < agent.initial_capital * self.bankruptcy_threshold:
-                    agent.bankrupt = True
-                    self.central_bank.bankrupted_firms += 1
-                    for employee in agent.employees:
-                        employee.employer = None
-                    agent.employees.clear()
-            elif isinstance(agent, Consumer):
-                if not agent.bankrupt and agent.money < agent.initial_money * self.bankruptcy_threshold:
-                    agent.bankrupt = True
-                    self.central_bank.bankrupted_consumers += 1
-                    if agent.employer:
-                        agent.employer.employees.remove(agent)
-                        agent.employer = None
-    
+    def collect_metrics(self):
+        # All MODEL_METRICS values in one pass over the aggregates and bank counters
+        if self.debug_aggregates:
+            self.aggregates.verify(self.registry.firms() + self.registry.consumers())
+        bank = self.central_bank
+        employment_rate = self.aggregates.employment_rate()
+        satisfaction = self.aggregates.average_satisfaction()
+        return (bank.inflation_rate, employment_rate, satisfaction, bank.bankrupted_firms,
+                bank.bankrupted_consumers, bank.money_supply, bank.total_loans,
+                self.aggregates.average_price(), self.economic_health_index(employment_rate, satisfaction))
+
     def get_employment_rate(self):
-        active_consumers = [agent for agent in self.schedule.agents 
-                          if isinstance(agent, Consumer) and not agent.bankrupt]
-        if not active_consumers:
-            return 0
-        employed = len([c for c in active_consumers if c.employer])
-        return employed / len(active_consumers)
+        if self.debug_aggregates:
+            self.aggregates.verify(self.registry.firms() + self.registry.consumers())
+        return self.aggregates.employment_rate()
     
     def get_average_satisfaction(self):
-        active_consumers = [agent for agent in self.schedule.agents 
-                          if isinstance(agent, Consumer) and not agent.bankrupt]
-        if not active_consumers:
-            return 0
-        return sum(c.satisfaction for c in active_consumers) / len(active_consumers)
+        if self.debug_aggregates:
+            self.aggregates.verify(self.registry.firms() + self.registry.consumers())
+        return self.aggregates.average_satisfaction()
     
     def get_average_price(self):
-        active_firms = [agent for agent in self.schedule.agents 
-                       if isinstance(agent, Firm) and not agent.bankrupt]
-        if not active_firms:
-            return 0
-        return sum(f.price for f in active_firms) / len(active_firms)
+        if self.debug_aggregates:
+            self.aggregates.verify(self.registry.firms() + self.registry.consumers())
+        return self.aggregates.average_price()
 
     def get_economic_health_index(self):
+        return self.economic_health_index(self.get_employment_rate(), self.get_average_satisfaction())
+
+    def economic_health_index(self, employment_rate, satisfaction):
         employment_weight = 0.3
         satisfaction_weight = 0.2
         bankruptcy_weight = 0.5  # Adjusted to emphasize bankruptcy in index
         
-        employment_rate = self.get_employment_rate()
-        satisfaction = self.get_average_satisfaction()
-        
         total_agents = self.num_consumers + self.num_firms
         bankruptcy_rate = 1 - ((self.central_bank.bankrupted_firms + self.central_bank.bankrupted_consumers) / total_agents)
         
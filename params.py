@@ -0,0 +1,48 @@
+# params.py
+
+# Tunable model parameters shared by the visualization sliders and the headless
+# runners: name -> (label, default, minimum, maximum, step, description)
+MODEL_PARAMS = {
+    "num_consumers": (
+        "Number of Consumers", 100, 10, 500, 10,
+        "Number of consumers in the economy"
+    ),
+    "num_firms": (
+        "Number of Firms", 20, 5, 100, 5,
+        "Number of firms in the economy"
+    ),
+    "initial_money_supply": (
+        "Initial Money Supply", 2000000, 500000, 10000000, 100000,
+        "Initial money supply in the economy"
+    ),
+    "base_interest_rate": (
+        "Base Interest Rate", 0.05, 0.01, 0.20, 0.01,
+        "Base interest rate set by central bank"
+    ),
+    "initial_firm_capital": (
+        "Initial Firm Capital", 200000, 50000, 1000000, 50000,
+        "Initial capital for each firm"
+    ),
+    "initial_consumer_money": (
+        "Initial Consumer Money", 2000, 500, 20000, 500,
+        "Initial money for each consumer"
+    ),
+    "market_volatility": (
+        "Market Volatility", 0.2, 0.0, 1.0, 0.05,
+        "Market price volatility (0 = stable, 1 = volatile)"
+    ),
+    "bankruptcy_threshold": (
+        "Bankruptcy Threshold", 0.3, 0.1, 0.9, 0.05,
+        "Capital ratio threshold for bankruptcy (lower = stricter)"
+    ),
+    "satisfaction_threshold": (
+        "Satisfaction Threshold", 0.5, 0.1, 0.9, 0.05,
+        "Consumer satisfaction threshold for loyalty"
+    ),
+}
+
+INTEGER_PARAMS = {"num_consumers", "num_firms"}
+
+
+def default_params():
+    return {name: spec[1] for name, spec in MODEL_PARAMS.items()}
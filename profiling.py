@@ -0,0 +1,192 @@
+# profiling.py
+import gc
+import sys
+import time
+from collections import defaultdict
+
+# Model phases of EconomyModel.step, as (label, object attribute, method name)
+MODEL_PHASES = (
+    ("schedule", "schedule", "step"),
+    ("service_loans", "central_bank", "service_loans"),
+    ("update_inflation_rate", "central_bank", "update_inflation_rate"),
+    ("thresholds", None, "handle_thresholds"),
+    ("distribute_employment", None, "distribute_employment"),
+    ("collect", "datacollector", "collect"),
+)
+
+# Agent methods timed inside the schedule, per agent type
+AGENT_METHODS = {
+    "CentralBank": ("lend_to_agents",),
+    "Consumer": ("make_purchase", "update_satisfaction", "service_loans"),
+    "Firm": ("adjust_price", "produce", "pay_wages", "invest"),
+}
+
+
+# Wall-time and call-count instrumentation for EconomyModel.step. attach() wraps
+# the phase methods and agent methods on the instances themselves, so a model
+# built without a profiler runs the plain methods with no timing code at all.
+class StepProfiler:
+    def __init__(self):
+        self.totals = defaultdict(float)  # label -> seconds over the run
+        self.calls = defaultdict(int)
+        self.current = defaultdict(float)  # label -> seconds within the current step
+        self.steps = 0
+        self._step_started = None
+
+    def timed(self, label, method):
+        totals, calls, current = self.totals, self.calls, self.current
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            started = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - started
+                totals[label] += elapsed
+                current[label] += elapsed
+                calls[label] += 1
+        return wrapper
+
+    def attach(self, model):
+        for label, owner, name in MODEL_PHASES:
+            target = model if owner is None else getattr(model, owner)
+            setattr(target, name, self.timed(label, getattr(target, name)))
+
+        self.attach_agents(model.schedule.agents)
+
+        step = model.step
+
+        def profiled_step():
+            self.current.clear()
+            self._step_started = time.perf_counter()
+            try:
+                return step()
+            finally:
+                elapsed = time.perf_counter() - self._step_started
+                self.totals["step"] += elapsed
+                self.calls["step"] += 1
+                self.steps += 1
+                self._step_started = None
+        model.step = profiled_step
+
+    def attach_agents(self, agents):
+        # Time the methods of agents added after attach(), such as a restored model's
+        for agent in agents:
+            kind = type(agent).__name__
+            for name in AGENT_METHODS.get(kind, ()):
+                setattr(agent, name, self.timed(f"{kind}.{name}", getattr(agent, name)))
+
+    def step_time(self):
+        # Time spent so far in the step being collected
+        if self._step_started is None:
+            return 0.0
+        return time.perf_counter() - self._step_started
+
+    def reporters(self):
+        # DataCollector reporters for the phases of the step being collected; the
+        # collect phase itself is still running at that point and isn't included
+        reporters = {"Step Time": lambda m: self.step_time()}
+        for label, _, _ in MODEL_PHASES[:-1]:
+            reporters[f"Phase Time: {label}"] = lambda m, label=label: self.current.get(label, 0.0)
+        for kind, names in AGENT_METHODS.items():
+            reporters[f"{kind} Time"] = (
+                lambda m, labels=tuple(f"{kind}.{name}" for name in names):
+                sum(self.current.get(label, 0.0) for label in labels)
+            )
+        return reporters
+
+    def summary(self):
+        step_total = self.totals.get("step", 0.0)
+        summary = {}
+        for label, total in sorted(self.totals.items(), key=lambda item: -item[1]):
+            calls = self.calls[label]
+            summary[label] = {
+                "total_s": total,
+                "calls": calls,
+                "mean_s": total / calls if calls else 0.0,
+                "share": total / step_total if step_total else 0.0,
+            }
+        return summary
+
+    def by_agent_type(self):
+        totals = defaultdict(float)
+        for label, total in self.totals.items():
+            kind, _, method = label.partition(".")
+            if method:
+                totals[kind] += total
+        return dict(totals)
+
+    def report(self):
+        lines = [f"{'phase':<32} {'total s':>10} {'calls':>9} {'mean ms':>9} {'share':>7}"]
+        for label, row in self.summary().items():
+            lines.append(f"{label:<32} {row['total_s']:>10.4f} {row['calls']:>9} "
+                         f"{row['mean_s'] * 1000:>9.3f} {row['share']:>7.1%}")
+        return "\n".join(lines)
+
+
+def _attributes(agent):
+    # Values held by an agent, as the garbage collector sees them. Reading
+    # agent.__dict__ would create the dict mesa's Agent leaves unallocated until
+    # first use; the collector reports attribute values without it, and the dict
+    # itself only if it already exists. (No agent attribute holds a dict.)
+    values = []
+    instance_dict = None
+    for value in gc.get_referents(agent):
+        if isinstance(value, type):
+            continue
+        if isinstance(value, dict):
+            instance_dict = value
+            values.extend(value.values())
+        else:
+            values.append(value)
+    return values, instance_dict
+
+
+def _agent_bytes(agent):
+    # The agent object, its own __dict__ and the containers and numbers it owns;
+    # other agents and the model it points to are not counted
+    values, instance_dict = _attributes(agent)
+    size = sys.getsizeof(agent) + (sys.getsizeof(instance_dict) if instance_dict else 0)
+    for value in values:
+        if isinstance(value, (float, int)) and not isinstance(value, bool):
+            size += sys.getsizeof(value)
+        elif isinstance(value, (list, tuple)):
+            size += sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value
+                                               if isinstance(item, (float, int)) and not isinstance(item, bool))
+        elif hasattr(value, 'nbytes'):
+            size += sys.getsizeof(value) + value.nbytes
+    return size
+
+
+def memory_report(model, sample=1000):
+    # Approximate bytes per agent type, measured on up to `sample` agents of each
+    # type and scaled to the population. Agents come from the registry, which
+    # still holds the bankrupt ones remove_bankrupt drops from the schedule. The
+    # bank also carries its loan book.
+    registry = model.registry
+    groups = {"CentralBank": [model.central_bank], "Firm": registry.firms(), "Consumer": registry.consumers()}
+    report = {}
+    for kind, agents in groups.items():
+        if not agents:
+            continue
+        step = max(1, len(agents) // sample)
+        measured = agents[::step]
+        per_agent = sum(_agent_bytes(agent) for agent in measured) / len(measured)
+        report[kind] = {
+            "agents": len(agents),
+            "bytes_per_agent": per_agent,
+            "total_mb": per_agent * len(agents) / 2 ** 20,
+            "dict_free": all(_attributes(agent)[1] is None for agent in measured),  # None materialized
+        }
+    book = model.central_bank.loan_book
+    loans = sum(column.nbytes for column in book.columns.values()) + sys.getsizeof(book.borrowers)
+    report["CentralBank"]["loan_book_mb"] = loans / 2 ** 20
+    return report
+
+
+def format_memory_report(report):
+    lines = [f"{'agent type':<12} {'agents':>9} {'bytes/agent':>12} {'total MB':>9}"]
+    for kind, row in report.items():
+        lines.append(f"{kind:<12} {row['agents']:>9} {row['bytes_per_agent']:>12.0f} {row['total_mb']:>9.2f}")
+    return "\n".join(lines)
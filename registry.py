@@ -0,0 +1,92 @@
+# registry.py
+
+# Typed views of the model's agents, partitioned by state. Each partition is a dict
+# keyed by unique_id, so membership changes are O(1) and iteration follows the order
+# agents entered it (creation order for the active partitions). Listeners are called
+# with ("firm" or "consumer", agent) whenever an agent is added or changes partition.
+class AgentRegistry:
+    def __init__(self):
+        self.active_firms = {}
+        self.bankrupt_firms = {}
+        self.active_consumers = {}
+        self.bankrupt_consumers = {}
+        self.unemployed_consumers = {}  # Active consumers without an employer
+        self.listeners = []
+
+    def _changed(self, kind, agent):
+        for listener in self.listeners:
+            listener(kind, agent)
+
+    def add_firm(self, firm):
+        if firm.bankrupt:
+            self.bankrupt_firms[firm.unique_id] = firm
+        else:
+            self.active_firms[firm.unique_id] = firm
+        self._changed("firm", firm)
+
+    def add_consumer(self, consumer):
+        if consumer.bankrupt:
+            self.bankrupt_consumers[consumer.unique_id] = consumer
+        else:
+            self.active_consumers[consumer.unique_id] = consumer
+            if consumer.employer is None:
+                self.unemployed_consumers[consumer.unique_id] = consumer
+        self._changed("consumer", consumer)
+
+    def add_firms(self, firms):
+        # add_firm for a batch, such as a restored model's agents
+        for firm in firms:
+            (self.bankrupt_firms if firm.bankrupt else self.active_firms)[firm.unique_id] = firm
+        for listener in self.listeners:
+            for firm in firms:
+                listener("firm", firm)
+
+    def add_consumers(self, consumers):
+        # add_consumer for a batch
+        active, bankrupt, unemployed = self.active_consumers, self.bankrupt_consumers, self.unemployed_consumers
+        for consumer in consumers:
+            if consumer.bankrupt:
+                bankrupt[consumer.unique_id] = consumer
+            else:
+                active[consumer.unique_id] = consumer
+                if consumer.employer is None:
+                    unemployed[consumer.unique_id] = consumer
+        for listener in self.listeners:
+            for consumer in consumers:
+                listener("consumer", consumer)
+
+    def firm_bankrupted(self, firm):
+        self.active_firms.pop(firm.unique_id, None)
+        self.bankrupt_firms[firm.unique_id] = firm
+        self._changed("firm", firm)
+
+    def firm_restored(self, firm):
+        self.bankrupt_firms.pop(firm.unique_id, None)
+        self.active_firms[firm.unique_id] = firm
+        self._changed("firm", firm)
+
+    def consumer_bankrupted(self, consumer):
+        self.active_consumers.pop(consumer.unique_id, None)
+        self.unemployed_consumers.pop(consumer.unique_id, None)
+        self.bankrupt_consumers[consumer.unique_id] = consumer
+        self._changed("consumer", consumer)
+
+    def consumer_restored(self, consumer):
+        self.bankrupt_consumers.pop(consumer.unique_id, None)
+        self.active_consumers[consumer.unique_id] = consumer
+        if consumer.employer is None:
+            self.unemployed_consumers[consumer.unique_id] = consumer
+        self._changed("consumer", consumer)
+
+    def employment_changed(self, consumer):
+        if consumer.employer is None:
+            self.unemployed_consumers[consumer.unique_id] = consumer
+        else:
+            self.unemployed_consumers.pop(consumer.unique_id, None)
+        self._changed("consumer", consumer)
+
+    def firms(self):
+        return [*self.active_firms.values(), *self.bankrupt_firms.values()]
+
+    def consumers(self):
+        return [*self.active_consumers.values(), *self.bankrupt_consumers.values()]
@@ -0,0 +1,36 @@
+# rng.py
+import zlib
+import numpy as np
+
+
+# Independent random streams for one model run, all derived from the model seed.
+# Each stream is keyed by name (crc32 of the name as the SeedSequence spawn key),
+# so adding a new stream never shifts the draws of the existing ones.
+class RandomStreams:
+    def __init__(self, seed=None):
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self._streams = {}
+
+    def stream(self, name):
+        generator = self._streams.get(name)
+        if generator is None:
+            sequence = np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=(zlib.crc32(name.encode()),))
+            generator = self._streams[name] = np.random.Generator(np.random.PCG64(sequence))
+        return generator
+
+    def __getitem__(self, name):
+        return self.stream(name)
+
+    def get_state(self):
+        return {"entropy": self.seed_sequence.entropy,
+                "streams": {name: generator.bit_generator.state for name, generator in self._streams.items()}}
+
+    def set_state(self, state):
+        self.seed_sequence = np.random.SeedSequence(state["entropy"])
+        self._streams = {}
+        for name, generator_state in state["streams"].items():
+            self.stream(name).bit_generator.state = generator_state
+
+    def uniform_shocks(self, name, size):
+        # One step's worth of draws in [-0.5, 0.5), one per agent slot
+        return self.stream(name).random(size) - 0.5
@@ -0,0 +1,86 @@
+# run.py
+#
+# Headless entry point: builds one configured model, steps it and writes the
+# collected metrics, without loading the visualization server.
+#
+#     python run.py --steps 200 --set num_consumers=1000 --set num_firms=200 --out metrics.csv
+#     python run.py --engine vectorized --until-steady --steps 1000
+import argparse
+import contextlib
+import os
+import sys
+import time
+from params import MODEL_PARAMS, default_params
+from sweep import engine_class, _parse_value
+
+
+def build_model(params, seed=None, engine="object"):
+    return engine_class(engine)(seed=seed, **params)
+
+
+def run_model(model, steps, until=None):
+    # Steps `model` and returns RunController-style outcome; with `until`
+    # (RunController settings) `steps` is a cap
+    if until is None:
+        for _ in range(steps):
+            model.step()
+        return {"stop_reason": "max_steps", "stopped_at": steps}
+    from convergence import RunController
+
+    return RunController(model, **until).run(steps)
+
+
+def write_metrics(model, path, last_only=False):
+    # One CSV row per collected row, labelled with the step it was collected at;
+    # decimated metrics are blank on the rows they skipped
+    collector = model.datacollector
+    if collector.trimmed and not last_only:
+        raise ValueError(f"A sink has trimmed {collector.trimmed} rows from the collector; "
+                         "read the full series back with sinks.SinkReader")
+    frame = collector.get_model_vars_dataframe()
+    if last_only:
+        frame = frame.tail(1)
+    frame.to_csv(path, index_label="step")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one EconomyModel headless")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help=f"Override a model parameter (one of {', '.join(MODEL_PARAMS)}; repeatable)")
+    parser.add_argument("--steps", type=int, default=100, help="Steps to run (the cap with --until-steady)")
+    parser.add_argument("--until-steady", action="store_true",
+                        help="Stop early at steady state or collapse")
+    parser.add_argument("--window", type=int, default=20, help="Rows the steady-state check looks back over")
+    parser.add_argument("--tolerance", type=float, default=1e-3,
+                        help="Relative spread below which a watched series counts as flat")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--engine", choices=["object", "vectorized", "ensemble"], default="object")
+    parser.add_argument("--out", help="Write the collected metrics to this CSV")
+    parser.add_argument("--last-only", action="store_true", help="Only write the final row of metrics")
+    parser.add_argument("--quiet", action="store_true", help="Discard the model's event output")
+    args = parser.parse_args(argv)
+
+    params = default_params()
+    for item in args.set:
+        name, value = item.split("=", 1)
+        if name not in MODEL_PARAMS:
+            parser.error(f"Unknown parameter: {name}")
+        params[name] = _parse_value(name, value)
+    until = {"window": args.window, "tolerance": args.tolerance} if args.until_steady else None
+
+    started = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if args.quiet:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stderr(devnull))
+        model = build_model(params, args.seed, args.engine)
+        outcome = run_model(model, args.steps, until)
+    elapsed = time.perf_counter() - started
+
+    if args.out:
+        write_metrics(model, args.out, args.last_only)
+    print(f"{outcome['stopped_at']} steps ({outcome['stop_reason']}) in {elapsed:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+# sharded.py
+import heapq
+import multiprocessing
+import time
+import numpy as np
+from mesa import Model
+from agents import CentralBank, Firm, Consumer
+from events import EventLog
+from metrics import MetricsCollector, MODEL_METRICS
+from model import EconomyModel
+
+# Cross-shard messages, by kind: (target id, payload). The target id picks the
+# shard the message is delivered to.
+MESSAGE_KINDS = {
+    "wage": (np.int64, np.float64),    # consumer id, amount paid by a firm in another shard
+    "release": (np.int64, np.int64),   # consumer id, firm id that laid them off or went bankrupt
+    "quit": (np.int64, np.int64),      # firm id, consumer id that went bankrupt
+    "hired": (np.int64, np.int64),     # firm id, consumer id matched to it
+}
+
+
+def partition_columns(column_loads, shards):
+    # Split the grid's columns into `shards` contiguous strips of roughly equal
+    # load; returns the first column of each strip
+    loads = np.asarray(column_loads, dtype=np.float64)
+    cumulative = np.cumsum(loads)
+    total = cumulative[-1] if len(cumulative) else 0.0
+    starts = [0]
+    for shard in range(1, shards):
+        start = int(np.searchsorted(cumulative, total * shard / shards, side="right"))
+        starts.append(min(max(start, starts[-1] + 1), len(loads) - (shards - shard)))
+    return starts
+
+
+# Messages a shard produces during one phase, batched into NumPy columns per kind
+class Outbox:
+    def __init__(self):
+        self.columns = {kind: ([], []) for kind in MESSAGE_KINDS}
+
+    def send(self, kind, target, value):
+        targets, values = self.columns[kind]
+        targets.append(target)
+        values.append(value)
+
+    def drain(self):
+        batch = {}
+        for kind, (targets, values) in self.columns.items():
+            if targets:
+                target_dtype, value_dtype = MESSAGE_KINDS[kind]
+                batch[kind] = (np.asarray(targets, dtype=target_dtype), np.asarray(values, dtype=value_dtype))
+                targets.clear()
+                values.clear()
+        return batch
+
+
+# Stand-ins for agents that live in another shard. A consumer employed by a remote
+# firm holds a RemoteFirm (price refreshed at each barrier); a firm with remote
+# staff holds RemoteConsumers. Their side effects become outgoing messages.
+class RemoteStaff:
+    def __init__(self, firm):
+        self.firm = firm
+
+    def remove(self, consumer):
+        self.firm.model.outbox.send("quit", self.firm.unique_id, consumer.unique_id)
+
+
+class RemoteFirm:
+    bankrupt = False
+
+    def __init__(self, unique_id, model):
+        self.unique_id = unique_id
+        self.model = model
+        self.price = 0.0
+        self.employees = RemoteStaff(self)
+
+
+class RemoteConsumer:
+    def __init__(self, unique_id, firm):
+        self.unique_id = unique_id
+        self.firm = firm
+
+    @property
+    def employer(self):
+        return self.firm
+
+    @employer.setter
+    def employer(self, firm):
+        if firm is None:
+            self.firm.model.outbox.send("release", self.unique_id, self.firm.unique_id)
+
+    def receive_wage(self, amount):
+        self.firm.model.outbox.send("wage", self.unique_id, amount)
+
+
+# One region's firms and consumers, stepped in a worker process. It is an
+# EconomyModel whose central bank acts as a branch: it lends from the budget the
+# coordinator hands it each step and reports back what is left. A step runs in
+# three phases separated by barriers at which cross-shard messages are exchanged.
+class RegionModel(EconomyModel):
+    def __init__(self, spec):
+        params = spec["params"]
+        super().__init__(0, 0, 0, params["base_interest_rate"], 0, 0,
+                         bankruptcy_threshold=params["bankruptcy_threshold"],
+                         distress_threshold=params["distress_threshold"],
+                         width=spec["width"], height=spec["height"], seed=spec["seed"],
+                         events=EventLog(seed=spec["shard"]), amortization_rate=spec["amortization_rate"])
+        # The volatility stream follows the run's seed, so every firm draws the same
+        # shocks it would in a single process; activation order is per shard
+        self.random.seed(spec["shard_seed"])
+        self.shard = spec["shard"]
+        self.num_firms = spec["num_firms"]
+        self.num_consumers = spec["num_consumers"]
+        self.market_price = 0.0
+        self.barrier_price = 0.0  # This region's average price when market_price was set
+        self.firm_prices = np.zeros(self.num_firms + 1)
+        self.outbox = Outbox()
+        self.remote_firms = {}
+        self.agents = {}
+        for unique_id, pos in spec["firms"]:
+            firm = Firm(unique_id, self, params["initial_firm_capital"], params["market_volatility"])
+            self.add_firm(firm, pos)
+            self.agents[unique_id] = firm
+        for unique_id, pos in spec["consumers"]:
+            consumer = Consumer(unique_id, self, params["initial_consumer_money"], params["satisfaction_threshold"])
+            self.add_consumer(consumer, pos)
+            self.agents[unique_id] = consumer
+
+    def get_average_price(self):
+        # Consumers size their loans on the economy-wide price: its value at the last
+        # barrier, moved by how far this region's own prices have drifted since
+        local = self.aggregates.average_price()
+        if not self.barrier_price:
+            return self.market_price
+        return self.market_price * local / self.barrier_price
+
+    def remote_firm(self, unique_id):
+        firm = self.remote_firms.get(unique_id)
+        if firm is None:
+            firm = self.remote_firms[unique_id] = RemoteFirm(unique_id, self)
+        firm.price = self.firm_prices[unique_id]
+        return firm
+
+    def deliver(self, messages):
+        for kind, (targets, values) in messages.items():
+            for target, value in zip(targets.tolist(), values.tolist()):
+                getattr(self, "_on_" + kind)(target, value)
+
+    def _on_wage(self, consumer_id, amount):
+        self.agents[consumer_id].receive_wage(amount)
+
+    def _on_release(self, consumer_id, firm_id):
+        consumer = self.agents[consumer_id]
+        if consumer.employer is not None and consumer.employer.unique_id == firm_id:
+            consumer.employer = None
+
+    def _on_quit(self, firm_id, consumer_id):
+        firm = self.agents[firm_id]
+        firm.employees = [employee for employee in firm.employees if employee.unique_id != consumer_id]
+
+    def _on_hired(self, firm_id, consumer_id):
+        firm = self.agents[firm_id]
+        if firm.bankrupt:
+            self.outbox.send("release", consumer_id, firm_id)
+        else:
+            firm.employees.append(RemoteConsumer(consumer_id, firm))
+
+    def prices(self):
+        # Ids and prices of this region's active firms
+        firms = list(self.registry.active_firms.values())
+        return (np.fromiter((firm.unique_id for firm in firms), dtype=np.int64, count=len(firms)),
+                np.fromiter((firm.price for firm in firms), dtype=np.float64, count=len(firms)))
+
+    def advance(self, payload):
+        # Phase 1: the agents' own step and loan servicing. Phases are timed in this
+        # worker's CPU time, so shards sharing a core aren't charged for each other
+        started = time.process_time()
+        self.central_bank.money_supply = payload["budget"]
+        self.market_price = payload["market_price"]
+        self.barrier_price = self.aggregates.average_price()
+        self.deliver(payload["messages"])
+        self.current_step = self.schedule.steps
+        self.events.start_step()
+        self.draw_shocks()
+        self.schedule.step()
+        self.central_bank.service_loans()
+        firm_ids, firm_prices = self.prices()
+        return {
+            "firm_ids": firm_ids,
+            "firm_prices": firm_prices,
+            "money_supply": self.central_bank.money_supply,
+            "messages": self.outbox.drain(),
+            "seconds": time.process_time() - started,
+        }
+
+    def settle(self, payload):
+        # Phase 2: wages and layoffs from other shards land, then bankruptcies and
+        # distress loans
+        started = time.process_time()
+        self.firm_prices = payload["firm_prices"]
+        for unique_id, firm in self.remote_firms.items():
+            firm.price = self.firm_prices[unique_id]
+        self.deliver(payload["messages"])
+        if not payload.get("initial"):
+            self.handle_thresholds()
+        vacancies = [(firm.unique_id, firm.capital, self.labor_market.vacancies(firm))
+                     for firm in self.registry.active_firms.values()]
+        return {
+            "vacancies": [entry for entry in vacancies if entry[2] > 0],
+            "active_consumers": len(self.registry.active_consumers),
+            "employed": self.aggregates.employed_consumers,
+            "unemployed": len(self.registry.unemployed_consumers),
+            "messages": self.outbox.drain(),
+            "seconds": time.process_time() - started,
+        }
+
+    def match(self, payload):
+        # Phase 3: hires assigned by the coordinator
+        started = time.process_time()
+        self.deliver(payload["messages"])
+        for firm_id, count in payload["hires"]:
+            firm = self.agents.get(firm_id)
+            for _ in range(count):
+                consumer = self.labor_market.next_unemployed()
+                if consumer is None:
+                    break
+                if firm is not None:
+                    consumer.employer = firm
+                    firm.employees.append(consumer)
+                else:
+                    consumer.employer = self.remote_firm(firm_id)
+                    self.outbox.send("hired", firm_id, consumer.unique_id)
+        aggregates = self.aggregates
+        bank = self.central_bank
+        return {
+            "active_firms": aggregates.active_firms,
+            "price_sum": aggregates.price_sum,
+            "active_consumers": aggregates.active_consumers,
+            "employed": aggregates.employed_consumers,
+            "satisfaction_sum": aggregates.satisfaction_sum,
+            "money_supply": bank.money_supply,
+            "total_loans": bank.total_loans,
+            "bankrupted_firms": bank.bankrupted_firms,
+            "bankrupted_consumers": bank.bankrupted_consumers,
+            "transactions": self.transactions.total,
+            "messages": self.outbox.drain(),
+            "seconds": time.process_time() - started,
+        }
+
+    def edges(self, payload):
+        return dict(self.transactions.edge_totals())
+
+
+def _shard_worker(spec, connection):
+    model = RegionModel(spec)
+    connection.send((len(spec["firms"]) + len(spec["consumers"]), *model.prices()))
+    while True:
+        command, payload = connection.recv()
+        if command == "close":
+            break
+        connection.send(getattr(model, command)(payload))
+    connection.close()
+
+
+# One economy split across worker processes by grid region. The grid's columns
+# are cut into strips of roughly equal agent count, and each strip's firms and
+# consumers step in their own RegionModel. This process keeps the central bank's
+# books, runs the economy-wide labor match and routes the batched wage, layoff,
+# quit and hire messages between shards at the barriers of each step.
+#
+# Compared to EconomyModel, effects that cross a barrier land one phase later:
+# consumers price loans on the last barrier's average price carried forward by
+# their region's own drift, cross-shard wages are credited before the bankruptcy
+# check rather than mid-schedule, and each branch lends from its own budget, so
+# up to one loan's worth per shard can stay unlent when a branch runs short.
+# Averaged over seeds the series stay close to EconomyModel's, apart from that
+# unlent money in the first steps; single runs are not comparable draw for draw.
+class ShardedEconomyModel(Model):
+    def __init__(self, num_consumers, num_firms, initial_money_supply, base_interest_rate,
+                 initial_firm_capital, initial_consumer_money, market_volatility=0.2,
+                 bankruptcy_threshold=0.3, satisfaction_threshold=0.5, width=20, height=20,
+                 seed=None, amortization_rate=0.0, shards=2, columns=None, collect_interval=1,
+                 metric_decimation=None, distress_threshold=None):
+        super().__init__()
+        if seed is not None:
+            self.reset_randomizer(seed)  # mesa's __new__ only sees a seed passed by keyword
+        self.num_consumers = num_consumers
+        self.num_firms = num_firms
+        self.width = width
+        self.height = height
+        self.steps = 0
+        self.central_bank = CentralBank(0, self, initial_money_supply, base_interest_rate, amortization_rate)
+        self.central_bank.inflation_rate = 0
+        self.market_price = 0.0
+
+        # Same placement draws as EconomyModel, so agents land on the same cells
+        positions = [(self.random.randrange(width), self.random.randrange(height))
+                     for _ in range(num_firms + num_consumers)]
+        self.column_counts = np.bincount([x for x, _ in positions], minlength=width)  # Agents per grid column
+        self.columns = list(columns) if columns is not None else partition_columns(self.column_counts, shards)
+        self.shards = len(self.columns)
+        region_of_column = np.searchsorted(self.columns, np.arange(width), side="right") - 1
+        self.owner = np.zeros(num_firms + num_consumers + 1, dtype=np.int64)  # unique_id -> shard
+        self.owner[1:] = region_of_column[[x for x, _ in positions]]
+
+        params = {
+            "base_interest_rate": base_interest_rate,
+            "initial_firm_capital": initial_firm_capital,
+            "initial_consumer_money": initial_consumer_money,
+            "market_volatility": market_volatility,
+            "bankruptcy_threshold": bankruptcy_threshold,
+            "distress_threshold": distress_threshold,
+            "satisfaction_threshold": satisfaction_threshold,
+        }
+        seeds = np.random.SeedSequence(seed).generate_state(self.shards)
+        context = multiprocessing.get_context("spawn")
+        self.connections = []
+        self.workers = []
+        for shard in range(self.shards):
+            ids = np.flatnonzero(self.owner[1:] == shard) + 1
+            spec = {
+                "shard": shard,
+                "shard_seed": int(seeds[shard]),
+                "seed": seed,
+                "params": params,
+                "width": width,
+                "height": height,
+                "amortization_rate": amortization_rate,
+                "num_firms": num_firms,
+                "num_consumers": num_consumers,
+                "firms": [(int(i), positions[i - 1]) for i in ids if i <= num_firms],
+                "consumers": [(int(i), positions[i - 1]) for i in ids if i > num_firms],
+            }
+            parent, child = context.Pipe()
+            worker = context.Process(target=_shard_worker, args=(spec, child), daemon=True)
+            worker.start()
+            child.close()
+            self.connections.append(parent)
+            self.workers.append(worker)
+        handshakes = [connection.recv() for connection in self.connections]
+        self.shard_agents = [agents for agents, _, _ in handshakes]
+        self.shard_seconds = np.zeros((self.shards, 3))  # Per shard and phase, over the run
+        self.last_seconds = np.zeros((self.shards, 3))
+        self.critical_seconds = 0.0  # Slowest shard's time per phase, summed over the run
+        self.shard_messages = np.zeros(self.shards, dtype=np.int64)  # Messages sent, over the run
+        self.firm_prices = np.zeros(num_firms + 1)  # By firm id, as of the last barrier
+        for _, firm_ids, firm_prices in handshakes:
+            self.firm_prices[firm_ids] = firm_prices  # Remote employers charge these from the first step
+        self.totals = {"active_firms": 0, "price_sum": 0.0, "active_consumers": num_consumers,
+                       "employed": 0, "satisfaction_sum": float(num_consumers), "transactions": 0}
+        self.shard_active = np.asarray(self.shard_agents, dtype=np.float64)
+        self.shard_demand = np.zeros(self.shards)
+
+        self._pending = [{} for _ in range(self.shards)]
+        self._settle(self._pending, initial=True)
+
+        self.datacollector = MetricsCollector(interval=collect_interval, decimation=metric_decimation)
+        self.datacollector.add_fused(MODEL_METRICS, ShardedEconomyModel.collect_metrics)
+        self.datacollector.add_reporter("Shard Imbalance", lambda m: m.imbalance())
+
+    def _call(self, command, payloads):
+        for connection, payload in zip(self.connections, payloads):
+            connection.send((command, payload))
+        return [connection.recv() for connection in self.connections]
+
+    def _route(self, replies, phase):
+        # Collect every shard's outgoing messages and sort them by destination shard
+        inbound = [{} for _ in range(self.shards)]
+        self.critical_seconds += max(reply["seconds"] for reply in replies)
+        for shard, reply in enumerate(replies):
+            self.shard_seconds[shard, phase] += reply["seconds"]
+            self.last_seconds[shard, phase] = reply["seconds"]
+            for kind, (targets, values) in reply["messages"].items():
+                self.shard_messages[shard] += len(targets)
+                destinations = self.owner[targets]
+                for destination in np.unique(destinations).tolist():
+                    mask = destinations == destination
+                    batch = inbound[destination].setdefault(kind, [])
+                    batch.append((targets[mask], values[mask]))
+        return [{kind: (np.concatenate([t for t, _ in batches]), np.concatenate([v for _, v in batches]))
+                 for kind, batches in messages.items()} for messages in inbound]
+
+    def step(self):
+        bank = self.central_bank
+        # Each branch lends from a share of the supply sized to its consumers' loan
+        # needs, which Consumer.calculate_needed_capital puts at three times as much
+        # for the unemployed; falls back to active agents once no consumer is left
+        weights = self.shard_demand if self.shard_demand.sum() else self.shard_active
+        budgets = bank.money_supply * weights / max(weights.sum(), 1)
+        replies = self._call("advance", [
+            {"budget": float(budget), "market_price": self.market_price, "messages": messages}
+            for budget, messages in zip(budgets, self._pending)])
+        inbound = self._route(replies, 0)
+
+        firm_ids = np.concatenate([reply["firm_ids"] for reply in replies])
+        prices = np.concatenate([reply["firm_prices"] for reply in replies])
+        self.firm_prices[firm_ids] = prices
+        bank.money_supply = sum(reply["money_supply"] for reply in replies)
+        if len(prices):
+            bank.inflation_rate = (prices.sum() / len(prices) / bank.money_supply) * 100
+
+        self._settle(inbound)
+        self.steps += 1
+        self.datacollector.collect(self)
+
+    def _settle(self, inbound, initial=False):
+        replies = self._call("settle", [{"firm_prices": self.firm_prices, "messages": messages, "initial": initial}
+                                        for messages in inbound])
+        inbound = self._route(replies, 1)
+
+        # Economy-wide labor match, as LaborMarket.match: richest firms first, each
+        # filled from the shards' unemployed pools in turn
+        releases = [len(messages.get("release", ((),))[0]) for messages in inbound]
+        active = sum(reply["active_consumers"] for reply in replies)
+        employed = sum(reply["employed"] for reply in replies) - sum(releases)
+        available = [reply["unemployed"] + released for reply, released in zip(replies, releases)]
+        remaining = int(0.6 * active) - employed
+        heap = [(-capital, unique_id, vacancies) for reply in replies
+                for unique_id, capital, vacancies in reply["vacancies"]]
+        heapq.heapify(heap)
+        hires = [[] for _ in range(self.shards)]
+        shard = 0
+        while heap and remaining > 0 and any(available):
+            _, firm_id, vacancies = heapq.heappop(heap)
+            wanted = min(vacancies, remaining)
+            counts = [0] * self.shards
+            while wanted and any(available):
+                if available[shard]:
+                    counts[shard] += 1
+                    available[shard] -= 1
+                    wanted -= 1
+                    remaining -= 1
+                shard = (shard + 1) % self.shards
+            for target, count in enumerate(counts):
+                if count:
+                    hires[target].append((firm_id, count))
+
+        replies = self._call("match", [{"messages": messages, "hires": shard_hires, "initial": initial}
+                                       for messages, shard_hires in zip(inbound, hires)])
+        self._pending = self._route(replies, 2)
+        bank = self.central_bank
+        if not initial:
+            bank.money_supply = sum(reply["money_supply"] for reply in replies)
+        bank.total_loans = sum(reply["total_loans"] for reply in replies)
+        bank.bankrupted_firms = sum(reply["bankrupted_firms"] for reply in replies)
+        bank.bankrupted_consumers = sum(reply["bankrupted_consumers"] for reply in replies)
+        for name in self.totals:
+            self.totals[name] = sum(reply[name] for reply in replies)
+        self.shard_active = np.array([reply["active_firms"] + reply["active_consumers"] for reply in replies],
+                                     dtype=np.float64)
+        self.shard_demand = np.array([0.5 * reply["employed"] + 1.5 * (reply["active_consumers"] - reply["employed"])
+                                      for reply in replies])
+        self.market_price = self.get_average_price()
+
+    def collect_metrics(self):
+        bank = self.central_bank
+        employment_rate = self.get_employment_rate()
+        satisfaction = self.get_average_satisfaction()
+        return (bank.inflation_rate, employment_rate, satisfaction, bank.bankrupted_firms,
+                bank.bankrupted_consumers, bank.money_supply, bank.total_loans,
+                self.get_average_price(), self.economic_health_index(employment_rate, satisfaction))
+
+    def get_total_transactions(self):
+        return self.totals["transactions"]
+
+    def collapsed(self):
+        return not self.totals["active_firms"] or not self.totals["active_consumers"]
+
+    def get_employment_rate(self):
+        active = self.totals["active_consumers"]
+        return self.totals["employed"] / active if active else 0
+
+    def get_average_satisfaction(self):
+        active = self.totals["active_consumers"]
+        return self.totals["satisfaction_sum"] / active if active else 0
+
+    def get_average_price(self):
+        active = self.totals["active_firms"]
+        return self.totals["price_sum"] / active if active else 0
+
+    def get_economic_health_index(self):
+        return self.economic_health_index(self.get_employment_rate(), self.get_average_satisfaction())
+
+    def economic_health_index(self, employment_rate, satisfaction):
+        employment_weight = 0.3
+        satisfaction_weight = 0.2
+        bankruptcy_weight = 0.5
+
+        total_agents = self.num_consumers + self.num_firms
+        bankruptcy_rate = 1 - ((self.central_bank.bankrupted_firms + self.central_bank.bankrupted_consumers) / total_agents)
+
+        return (employment_rate * employment_weight +
+                satisfaction * satisfaction_weight +
+                bankruptcy_rate * bankruptcy_weight)
+
+    def edge_totals(self):
+        # Transaction edge totals merged over all shards
+        merged = {}
+        for edges in self._call("edges", [None] * self.shards):
+            for key, (amount, count) in edges.items():
+                edge = merged.get(key)
+                if edge is None:
+                    merged[key] = [amount, count]
+                else:
+                    edge[0] += amount
+                    edge[1] += count
+        return merged
+
+    def imbalance(self):
+        # Slowest shard's last step time over the mean; 1.0 is perfectly balanced
+        seconds = self.last_seconds.sum(axis=1)
+        mean = seconds.mean()
+        return float(seconds.max() / mean) if mean else 1.0
+
+    def shard_report(self):
+        return [{
+            "shard": shard,
+            "first_column": self.columns[shard],
+            "agents": self.shard_agents[shard],
+            "active_agents": int(self.shard_active[shard]),
+            "seconds": float(self.shard_seconds[shard].sum()),
+            "phase_seconds": dict(zip(("advance", "settle", "match"), self.shard_seconds[shard].tolist())),
+            "messages_sent": int(self.shard_messages[shard]),
+        } for shard in range(self.shards)]
+
+    def suggest_columns(self):
+        # Strip boundaries that would even out the measured cost: each column is
+        # charged its agents times the time per agent of the shard that ran it.
+        # Shards are fixed for a run, so pass the result as `columns` to a new one.
+        seconds = self.shard_seconds.sum(axis=1)
+        per_agent = seconds / np.maximum(self.shard_agents, 1)
+        region_of_column = np.searchsorted(self.columns, np.arange(self.width), side="right") - 1
+        return partition_columns(self.column_counts * per_agent[region_of_column], self.shards)
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for worker in self.workers:
+            worker.join()
+        self.connections = []
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
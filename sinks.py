@@ -0,0 +1,213 @@
+# sinks.py
+import json
+import os
+from abc import ABC, abstractmethod
+import numpy as np
+from ledger import TRANSACTION_TYPES
+
+
+# Streams a model's transactions and per-step reporter values to chunked columnar
+# files, so long runs keep their full history on disk instead of in memory. Every
+# `flush_every` steps the buffered rows are written as one chunk per kind and the
+# manifest is rewritten; SinkReader loads only the chunks a step range needs.
+# Attaching bounds the model's in-memory ledger to the newest `ledger_retention`
+# rows, since the full history is on disk. Subclasses choose the file format.
+class ColumnarSink(ABC):
+    format = None
+
+    def __init__(self, path, flush_every=100, trim_collector=True, ledger_retention=4096):
+        if ledger_retention is None or ledger_retention < 1:
+            raise ValueError("ledger_retention must be a positive number of rows")
+        self.path = path
+        self.flush_every = flush_every
+        self.trim_collector = trim_collector  # Drop DataCollector values once they are buffered here
+        self.ledger_retention = ledger_retention
+        self.chunks = []
+        self.metric_names = None
+        self._transactions = []
+        self._metrics = {}
+        self._steps_buffered = 0
+        self.model = None
+        os.makedirs(path, exist_ok=True)
+
+    def attach(self, model):
+        self.model = model
+        ledger = model.transactions
+        if not ledger.retention or ledger.retention > self.ledger_retention:
+            ledger.set_retention(self.ledger_retention)
+        ledger.listeners.append(self.write_transactions)
+
+    def write_transactions(self, chunk):
+        self._transactions.append(chunk)
+
+    def record_step(self, model):
+        # Buffers the row the collector recorded this step, if it recorded one;
+        # metrics it skipped on that row (decimation) are NaN
+        collector = model.datacollector
+        recorded = collector.last_recorded
+        if recorded:
+            model_vars = collector.model_vars
+            if self.metric_names is None:
+                self.metric_names = list(model_vars)
+                self._metrics = {name: [] for name in ['step'] + self.metric_names}
+            self._metrics['step'].append(collector.row_steps[-1])
+            for name in self.metric_names:
+                self._metrics[name].append(model_vars[name][-1] if name in recorded else np.nan)
+            if self.trim_collector:
+                collector.trim()
+        self._steps_buffered += 1
+        if self._steps_buffered >= self.flush_every:
+            model.transactions.flush()
+            self.flush()
+
+    def flush(self):
+        if self._transactions:
+            columns = {name: np.concatenate([chunk[name] for chunk in self._transactions])
+                       for name in self._transactions[0]}
+            self._write('transactions', columns)
+            self._transactions = []
+        if self._metrics and self._metrics['step']:
+            columns = {'step': np.asarray(self._metrics['step'], dtype=np.int64)}
+            for name in self.metric_names:
+                columns[name] = np.asarray(self._metrics[name], dtype=np.float64)
+            self._write('metrics', columns)
+            self._metrics = {name: [] for name in self._metrics}
+        self._steps_buffered = 0
+        self._write_manifest()
+
+    def close(self):
+        if self.model is not None:
+            self.model.transactions.flush()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @abstractmethod
+    def write_chunk(self, kind, index, names, columns):
+        # Writes chunk `index` of `kind` from {name: array} in `names` order and
+        # returns the file names it created, relative to self.path
+        raise NotImplementedError
+
+    def _write(self, kind, columns):
+        index = len(self.chunks)
+        names = list(columns)
+        files = self.write_chunk(kind, index, names, columns)
+        self.chunks.append({
+            "kind": kind,
+            "index": index,
+            "rows": int(len(columns['step'])),
+            "first_step": int(columns['step'].min()),
+            "last_step": int(columns['step'].max()),
+            "columns": names,
+            "files": files,
+        })
+
+    def _write_manifest(self):
+        manifest = {
+            "format": self.format,
+            "transaction_types": list(TRANSACTION_TYPES),
+            "metrics": self.metric_names or [],
+            "chunks": self.chunks,
+        }
+        temporary = os.path.join(self.path, "manifest.json.tmp")
+        with open(temporary, "w") as handle:
+            json.dump(manifest, handle)
+        os.replace(temporary, os.path.join(self.path, "manifest.json"))
+
+
+# Raw .npy file per column per chunk; the reader memory-maps them
+class NumpySink(ColumnarSink):
+    format = "npy"
+
+    def write_chunk(self, kind, index, names, columns):
+        files = []
+        for position, name in enumerate(names):
+            filename = f"{kind}-{index:06d}-{position:02d}.npy"
+            np.save(os.path.join(self.path, filename), columns[name])
+            files.append(filename)
+        return files
+
+
+class ParquetSink(ColumnarSink):
+    format = "parquet"
+
+    def __init__(self, path, flush_every=100, trim_collector=True, ledger_retention=4096):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as exc:
+            raise ImportError("ParquetSink requires pyarrow; use NumpySink instead") from exc
+        super().__init__(path, flush_every, trim_collector, ledger_retention)
+
+    def write_chunk(self, kind, index, names, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        filename = f"{kind}-{index:06d}.parquet"
+        pq.write_table(pa.table({name: columns[name] for name in names}), os.path.join(self.path, filename))
+        return [filename]
+
+
+class SinkReader:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as handle:
+            self.manifest = json.load(handle)
+
+    def _chunks(self, kind, start, stop):
+        # Chunks overlapping [start, stop)
+        for chunk in self.manifest["chunks"]:
+            if chunk["kind"] != kind:
+                continue
+            if start is not None and chunk["last_step"] < start:
+                continue
+            if stop is not None and chunk["first_step"] >= stop:
+                continue
+            yield chunk
+
+    def _load(self, chunk):
+        import pandas as pd
+
+        if self.manifest["format"] == "parquet":
+            return pd.read_parquet(os.path.join(self.path, chunk["files"][0]))
+        return pd.DataFrame({
+            name: np.load(os.path.join(self.path, filename), mmap_mode="r")
+            for name, filename in zip(chunk["columns"], chunk["files"])
+        })
+
+    def _frames(self, kind, start, stop):
+        for chunk in self._chunks(kind, start, stop):
+            frame = self._load(chunk)
+            if start is not None:
+                frame = frame[frame["step"] >= start]
+            if stop is not None:
+                frame = frame[frame["step"] < stop]
+            yield frame
+
+    def iter_transactions(self, start=None, stop=None):
+        import pandas as pd
+
+        for frame in self._frames("transactions", start, stop):
+            frame = frame.copy()
+            frame["type"] = pd.Categorical.from_codes(frame["type"], self.manifest["transaction_types"])
+            yield frame
+
+    def transactions(self, start=None, stop=None):
+        import pandas as pd
+
+        frames = list(self.iter_transactions(start, stop))
+        if not frames:
+            return pd.DataFrame(columns=["step", "sender", "receiver", "amount", "type"])
+        return pd.concat(frames, ignore_index=True)
+
+    def metrics(self, start=None, stop=None):
+        # Same columns as DataCollector.get_model_vars_dataframe, indexed by step
+        import pandas as pd
+
+        frames = list(self._frames("metrics", start, stop))
+        if not frames:
+            return pd.DataFrame(columns=self.manifest["metrics"])
+        return pd.concat(frames).set_index("step")
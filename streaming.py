@@ -0,0 +1,306 @@
+# streaming.py
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from params import default_params
+from sweep import engine_class, _parse_value
+
+
+# Steps a model and packages each step as an update: the step number, the latest
+# value of every collected metric and the transactions recorded during the step
+# as NumPy columns (None for engines without a ledger).
+class ModelStepper:
+    def __init__(self, model):
+        self.model = model
+        self.steps = 0
+        self._chunks = []
+        self.ledger = getattr(model, "transactions", None)
+        if self.ledger is not None:
+            self.ledger.listeners.append(self._chunks.append)
+
+    def step(self):
+        self.model.step()
+        self.steps += 1
+        transactions = None
+        if self.ledger is not None:
+            self.ledger.flush()
+            chunks = self._chunks[:]
+            self._chunks.clear()
+            if chunks:
+                transactions = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+        metrics = {name: (values[-1] if len(values) else None)
+                   for name, values in self.model.datacollector.model_vars.items()}
+        return {"step": self.steps, "steps_coalesced": 1, "metrics": metrics, "transactions": transactions}
+
+
+def merge_updates(older, newer, max_transactions=None):
+    # Coalesce two updates: the newer metrics win and transactions are concatenated,
+    # keeping only the newest max_transactions rows
+    transactions = newer["transactions"]
+    dropped = older.get("transactions_dropped", 0) + newer.get("transactions_dropped", 0)
+    if older["transactions"] is not None and transactions is not None:
+        transactions = {name: np.concatenate((older["transactions"][name], values))
+                        for name, values in transactions.items()}
+    elif transactions is None:
+        transactions = older["transactions"]
+    if transactions is not None and max_transactions is not None:
+        rows = len(transactions["step"])
+        if rows > max_transactions:
+            dropped += rows - max_transactions
+            transactions = {name: values[-max_transactions:] for name, values in transactions.items()}
+    merged = dict(newer)
+    merged["transactions"] = transactions
+    merged["steps_coalesced"] = older["steps_coalesced"] + newer["steps_coalesced"]
+    if dropped:
+        merged["transactions_dropped"] = dropped
+    return merged
+
+
+# One consumer's view of a run. It holds at most one pending update: anything
+# published while the consumer is still busy is merged into it, so a slow
+# subscriber sees fewer, larger updates and never holds the simulation back.
+class Subscription:
+    def __init__(self, run, transactions=True, max_transactions=100_000):
+        self.run = run
+        self.transactions = transactions
+        self.max_transactions = max_transactions
+        self.coalesced = 0  # Updates merged into a later one
+        self.closed = False
+        self._pending = None
+        self._ready = asyncio.Event()
+
+    def offer(self, update):
+        if not self.transactions:
+            update = dict(update, transactions=None)
+        if self._pending is None:
+            self._pending = update
+        else:
+            self._pending = merge_updates(self._pending, update, self.max_transactions)
+            self.coalesced += 1
+        self._ready.set()
+
+    def finish(self):
+        self.closed = True
+        self._ready.set()
+
+    def close(self):
+        self.run.unsubscribe(self)
+        self.finish()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while self._pending is None:
+            if self.closed:
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+        update, self._pending = self._pending, None
+        return update
+
+
+def build_model(engine, params, seed):
+    return engine_class(engine)(seed=seed, **params)
+
+
+def _stream_worker(engine, params, seed, steps, connection):
+    # Worker process: step the model and send every update to the parent until the
+    # run ends or the parent asks it to stop
+    stepper = ModelStepper(build_model(engine, params, seed))
+    try:
+        while steps is None or stepper.steps < steps:
+            if connection.poll() and connection.recv() == "stop":
+                break
+            connection.send(stepper.step())
+    finally:
+        connection.close()
+
+
+# Runs a model independently of any viewer and fans its per-step updates out to
+# subscribers. The model is stepped in a worker thread (mode="thread") or a
+# separate process (mode="process"); publishing only hands each subscriber the
+# update, so dashboards and recorders can come and go during a run.
+class StreamingRun:
+    def __init__(self, params=None, steps=None, engine="object", seed=None, mode="thread", model=None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if model is not None and mode != "thread":
+            raise ValueError("A prebuilt model can only be streamed in thread mode")
+        self.params = dict(params or default_params())
+        self.steps = steps
+        self.engine = engine
+        self.seed = seed
+        self.mode = mode
+        self.model = model
+        self.latest = None  # Most recent update
+        self.finished = False
+        self.subscribers = []
+        self._stopping = False
+
+    def subscribe(self, transactions=True, max_transactions=100_000):
+        subscription = Subscription(self, transactions, max_transactions)
+        if self.finished:
+            subscription.finish()
+        else:
+            self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+    async def stream(self, transactions=True):
+        subscription = self.subscribe(transactions)
+        try:
+            async for update in subscription:
+                yield update
+        finally:
+            subscription.close()
+
+    def stop(self):
+        self._stopping = True
+
+    def publish(self, update):
+        self.latest = update
+        for subscription in self.subscribers:
+            subscription.offer(update)
+
+    async def run(self):
+        try:
+            if self.mode == "thread":
+                await self._run_thread()
+            else:
+                await self._run_process()
+        finally:
+            self.finished = True
+            for subscription in self.subscribers:
+                subscription.finish()
+            self.subscribers = []
+
+    async def _run_thread(self):
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            if self.model is None:
+                self.model = await loop.run_in_executor(executor, build_model, self.engine, self.params, self.seed)
+            stepper = ModelStepper(self.model)
+            while not self._stopping and (self.steps is None or stepper.steps < self.steps):
+                self.publish(await loop.run_in_executor(executor, stepper.step))
+
+    async def _run_process(self):
+        loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        worker = context.Process(target=_stream_worker,
+                                 args=(self.engine, self.params, self.seed, self.steps, child), daemon=True)
+        worker.start()
+        child.close()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                while True:
+                    if self._stopping:
+                        parent.send("stop")
+                        self._stopping = False
+                    try:
+                        update = await loop.run_in_executor(executor, parent.recv)
+                    except EOFError:
+                        break
+                    self.publish(update)
+            finally:
+                parent.close()
+                await loop.run_in_executor(executor, worker.join)
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return [_jsonable(item) for item in value.tolist()]
+    if isinstance(value, dict):
+        return {name: _jsonable(item) for name, item in value.items()}
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, np.generic):
+        return _jsonable(value.item())
+    return value
+
+
+def encode_update(update):
+    return json.dumps(_jsonable(update))
+
+
+def make_app(run):
+    # Local endpoint for a StreamingRun: /ws pushes every update as JSON (add
+    # ?transactions=0 for metrics only) and /metrics returns the latest update
+    import tornado.web
+    import tornado.websocket
+
+    class UpdateSocket(tornado.websocket.WebSocketHandler):
+        def check_origin(self, origin):
+            return True
+
+        def open(self):
+            transactions = self.get_argument("transactions", "1") != "0"
+            self.subscription = run.subscribe(transactions=transactions)
+            self.pump = asyncio.ensure_future(self._pump())
+
+        async def _pump(self):
+            async for update in self.subscription:
+                try:
+                    await self.write_message(encode_update(update))
+                except tornado.websocket.WebSocketClosedError:
+                    break
+            self.close()
+
+        def on_close(self):
+            self.subscription.close()
+
+    class MetricsHandler(tornado.web.RequestHandler):
+        def get(self):
+            self.set_header("Content-Type", "application/json")
+            latest = run.latest
+            if latest is not None:
+                latest = dict(latest, transactions=None)
+            self.write(encode_update({"finished": run.finished, "update": latest}))
+
+    return tornado.web.Application([(r"/ws", UpdateSocket), (r"/metrics", MetricsHandler)])
+
+
+async def serve(run, port=8765, linger=True):
+    app = make_app(run)
+    server = app.listen(port)
+    print(f"Streaming on ws://127.0.0.1:{port}/ws (latest metrics at http://127.0.0.1:{port}/metrics)")
+    try:
+        await run.run()
+        if linger:
+            await asyncio.Event().wait()  # Keep /metrics up until interrupted
+    finally:
+        server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a headless EconomyModel run over WebSocket")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override one model parameter (repeatable)")
+    parser.add_argument("--steps", type=int, default=None, help="Stop after this many steps (default: run forever)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--engine", choices=["object", "vectorized"], default="object")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    args = parser.parse_args(argv)
+
+    params = default_params()
+    for item in args.param:
+        name, value = item.split("=", 1)
+        params[name] = _parse_value(name, value)
+    run = StreamingRun(params, steps=args.steps, engine=args.engine, seed=args.seed, mode=args.mode)
+    try:
+        asyncio.run(serve(run, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# sweep.py
+import argparse
+import contextlib
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from convergence import RunController
+from metrics import replica_summary
+from params import MODEL_PARAMS, INTEGER_PARAMS, default_params
+
+
+def engine_class(engine):
+    if engine == "vectorized":
+        from vectorized import VectorizedEconomyModel
+        return VectorizedEconomyModel
+    if engine == "ensemble":
+        from ensemble import EnsembleEconomyModel
+        return EnsembleEconomyModel
+    if engine == "sharded":
+        from sharded import ShardedEconomyModel
+        return ShardedEconomyModel
+    from model import EconomyModel
+    return EconomyModel
+
+
+def grid(space, base=None):
+    # Cartesian product of the listed values, on top of the default parameters
+    base = dict(base or default_params())
+    names = list(space)
+    runs = []
+    for values in itertools.product(*(space[name] for name in names)):
+        params = dict(base)
+        params.update(zip(names, values))
+        runs.append(params)
+    return runs
+
+
+def latin_hypercube(ranges, samples, seed=0, base=None):
+    # One sample per stratum of each range, strata shuffled independently per parameter
+    base = dict(base or default_params())
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        points = (rng.permutation(samples) + rng.random(samples)) / samples
+        values = low + points * (high - low)
+        if name in INTEGER_PARAMS:
+            values = np.rint(values).astype(int)
+        columns[name] = values.tolist()
+    runs = []
+    for i in range(samples):
+        params = dict(base)
+        params.update({name: values[i] for name, values in columns.items()})
+        runs.append(params)
+    return runs
+
+
+def run_seed(base_seed, run_id):
+    # Depends only on the sweep seed and the run's position, not on scheduling
+    return int(np.random.SeedSequence([base_seed, run_id]).generate_state(1)[0])
+
+
+def run_one(run_id, params, steps, seed, engine="object", until=None):
+    # With `until` (RunController settings), `steps` is a cap and the run stops at
+    # steady state or collapse; the row records how many steps it took and why
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        model = engine_class(engine)(seed=seed, **params)
+        try:
+            model.datacollector.reserve(steps)
+            if until is None:
+                for _ in range(steps):
+                    model.step()
+                outcome = {"stop_reason": "max_steps", "stopped_at": steps}
+            else:
+                outcome = RunController(model, **until).run(steps)
+        finally:
+            if hasattr(model, "close"):
+                model.close()  # Sharded runs stop their shard processes
+    row = {"run_id": run_id, "seed": seed, "steps": outcome["stopped_at"], "max_steps": steps,
+           "stop_reason": outcome["stop_reason"]}
+    row.update(params)
+    for name, values in model.datacollector.model_vars.items():
+        row[name] = values[-1] if values else None
+    # Ensembles report the replica mean above, plus its confidence interval
+    for name, column in getattr(model.datacollector, "replica_vars", {}).items():
+        if len(column):
+            summary = replica_summary(column.view()[-1:])
+            row[f"{name} CI Low"] = summary["ci_low"][0]
+            row[f"{name} CI High"] = summary["ci_high"][0]
+    row["elapsed"] = time.perf_counter() - started
+    return row
+
+
+def completed_runs(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="") as handle:
+        return {int(row["run_id"]) for row in csv.DictReader(handle)}
+
+
+def iter_sweep(runs, steps, out, workers=None, base_seed=0, engine="object", until=None):
+    # Runs every parameter set not already in `out` on a process pool, appending
+    # each result row to the CSV as it finishes and yielding it
+    done = completed_runs(out)
+    pending = [(run_id, params) for run_id, params in enumerate(runs) if run_id not in done]
+    if not pending:
+        return
+
+    new_file = not os.path.exists(out) or os.path.getsize(out) == 0
+    with open(out, "a", newline="") as handle, \
+            ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(run_one, run_id, params, steps, run_seed(base_seed, run_id), engine, until)
+                   for run_id, params in pending]
+        writer = None
+        for future in as_completed(futures):
+            row = future.result()
+            if writer is None:
+                if new_file:
+                    fieldnames = list(row)
+                else:
+                    with open(out, newline="") as existing:
+                        fieldnames = next(csv.reader(existing))
+                writer = csv.DictWriter(handle, fieldnames=fieldnames, extrasaction="ignore")
+                if new_file:
+                    writer.writeheader()
+            writer.writerow(row)
+            handle.flush()
+            yield row
+
+
+def run_sweep(runs, steps, out, workers=None, base_seed=0, engine="object", until=None):
+    for _ in iter_sweep(runs, steps, out, workers, base_seed, engine, until):
+        pass
+    return load_results(out)
+
+
+def load_results(path):
+    import pandas as pd
+
+    return pd.read_csv(path).sort_values("run_id").reset_index(drop=True)
+
+
+def _parse_value(name, text):
+    return int(float(text)) if name in INTEGER_PARAMS else float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless parameter sweep over EconomyModel")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="Values to sweep for one parameter (repeatable)")
+    parser.add_argument("--lhs", type=int, metavar="N",
+                        help="Draw N Latin hypercube samples instead of a grid")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME=LOW:HIGH",
+                        help="Range for a Latin hypercube parameter (defaults to the slider range)")
+    parser.add_argument("--steps", type=int, default=100, help="Steps per run (the cap with --until-steady)")
+    parser.add_argument("--until-steady", action="store_true",
+                        help="Stop each run early at steady state or collapse")
+    parser.add_argument("--window", type=int, default=20, help="Rows the steady-state check looks back over")
+    parser.add_argument("--tolerance", type=float, default=1e-3,
+                        help="Relative spread below which a watched series counts as flat")
+    parser.add_argument("--out", default="sweep_results.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=["object", "vectorized", "ensemble", "sharded"], default="object")
+    parser.add_argument("--replicas", type=int, default=32,
+                        help="Seeds per parameter set with --engine ensemble, advanced together")
+    parser.add_argument("--shards", type=int, default=2,
+                        help="Shard processes per run with --engine sharded (on top of --workers)")
+    args = parser.parse_args(argv)
+
+    if args.lhs:
+        ranges = {}
+        for item in args.range:
+            name, bounds = item.split("=", 1)
+            low, high = bounds.split(":", 1)
+            ranges[name] = (float(low), float(high))
+        if not ranges:
+            ranges = {name: (spec[2], spec[3]) for name, spec in MODEL_PARAMS.items()}
+        runs = latin_hypercube(ranges, args.lhs, seed=args.seed)
+    else:
+        space = {}
+        for item in args.grid:
+            name, values = item.split("=", 1)
+            space[name] = [_parse_value(name, value) for value in values.split(",")]
+        runs = grid(space)
+    if args.engine == "ensemble":
+        for params in runs:
+            params["replicas"] = args.replicas
+    if args.engine == "sharded":
+        for params in runs:
+            params["shards"] = args.shards
+
+    until = {"window": args.window, "tolerance": args.tolerance} if args.until_steady else None
+    for row in iter_sweep(runs, args.steps, args.out, args.workers, args.seed, args.engine, until):
+        print(f"run {row['run_id']}/{len(runs)} finished in {row['elapsed']:.2f}s "
+              f"after {row['steps']} steps ({row['stop_reason']})")
+
+
+if __name__ == "__main__":
+    main()
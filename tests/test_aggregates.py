@@ -0,0 +1,48 @@
+# tests/test_aggregates.py
+import contextlib
+import io
+import pytest
+from agents import Consumer, Firm
+from model import EconomyModel
+from params import default_params
+
+
+def recount(model):
+    # The market getters recomputed from every scheduled agent
+    firms = [agent for agent in model.schedule.agents if isinstance(agent, Firm) and not agent.bankrupt]
+    consumers = [agent for agent in model.schedule.agents if isinstance(agent, Consumer) and not agent.bankrupt]
+    price = sum(firm.price for firm in firms) / len(firms) if firms else 0
+    employed = sum(consumer.employer is not None for consumer in consumers)
+    return (price, employed / len(consumers) if consumers else 0,
+            sum(consumer.satisfaction for consumer in consumers) / len(consumers) if consumers else 0)
+
+
+def test_aggregates_match_a_recount():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        bankrupted = []
+        for _ in range(14):
+            model.step()
+            price, employment, satisfaction = recount(model)
+            assert model.get_average_price() == pytest.approx(price)
+            assert model.get_employment_rate() == employment
+            assert model.get_average_satisfaction() == pytest.approx(satisfaction)
+            bankrupted.append(model.central_bank.bankrupted_firms)
+    # The run went through bankruptcies and lay-offs, down to no active firms
+    assert bankrupted[0] < bankrupted[-1] == model.num_firms
+    assert model.get_average_price() == 0
+
+
+def test_restored_agents_are_counted_back():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        for _ in range(4):
+            model.step()
+        firm = next(iter(model.registry.bankrupt_firms.values()))
+        firm.bankrupt = False
+        consumer = next(iter(model.registry.active_consumers.values()))
+        consumer.bankrupt = True
+    price, employment, satisfaction = recount(model)
+    assert model.get_average_price() == pytest.approx(price)
+    assert model.get_employment_rate() == employment
+    assert model.get_average_satisfaction() == pytest.approx(satisfaction)
@@ -0,0 +1,69 @@
+# tests/test_checkpoint.py
+import contextlib
+import io
+import numpy as np
+import pytest
+from checkpoint import Checkpoint, fork, restore, snapshot
+from model import EconomyModel
+from params import default_params
+
+VARIANTS = [
+    {},
+    {"amortization_rate": 0.05, "remove_bankrupt": True, "goods_market": True, "distress_threshold": 0.6},
+]
+
+
+def model_params(variant):
+    params = default_params()
+    params.update(initial_firm_capital=400000, **variant)
+    return params
+
+
+def assert_same_run(expected, actual):
+    expected_frame = expected.datacollector.get_model_vars_dataframe()
+    actual_frame = actual.datacollector.get_model_vars_dataframe()
+    assert list(actual_frame.index) == list(expected_frame.index)
+    np.testing.assert_array_equal(actual_frame.to_numpy(dtype=float), expected_frame.to_numpy(dtype=float))
+    assert actual.transactions.total == expected.transactions.total
+    assert actual.transactions.edge_totals() == expected.transactions.edge_totals()
+    for expected_firm, actual_firm in zip(expected.registry.firms(), actual.registry.firms()):
+        assert (actual_firm.unique_id, actual_firm.capital, actual_firm.price, len(actual_firm.employees)) == \
+            (expected_firm.unique_id, expected_firm.capital, expected_firm.price, len(expected_firm.employees))
+    for expected_consumer, actual_consumer in zip(expected.registry.consumers(), actual.registry.consumers()):
+        assert (actual_consumer.unique_id, actual_consumer.money, actual_consumer.satisfaction) == \
+            (expected_consumer.unique_id, expected_consumer.money, expected_consumer.satisfaction)
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_restored_run_matches_uninterrupted(tmp_path, variant):
+    path = str(tmp_path / "checkpoint.npz")
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        expected = EconomyModel(seed=7, **model_params(variant))
+        for _ in range(6):
+            expected.step()
+        snapshot(expected).save(path)
+        actual = restore(Checkpoint.load(path))
+        assert_same_run(expected, actual)
+        for _ in range(8):
+            expected.step()
+            actual.step()
+    assert_same_run(expected, actual)
+    # The restore landed mid-run: loans outstanding, some firms gone and some still trading
+    assert len(expected.central_bank.loan_book)
+    assert 0 < len(expected.registry.active_firms) < expected.num_firms
+
+
+def test_unchanged_fork_matches_uninterrupted():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        expected = EconomyModel(seed=7, **model_params(VARIANTS[1]))
+        for _ in range(4):
+            expected.step()
+        checkpoint = snapshot(expected)
+        same, changed = fork(checkpoint, [{}, {"base_interest_rate": 0.2}])
+        for _ in range(5):
+            expected.step()
+            same.step()
+            changed.step()
+    assert_same_run(expected, same)
+    assert changed.central_bank.base_interest_rate == 0.2
+    assert expected.central_bank.base_interest_rate != 0.2
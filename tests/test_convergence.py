@@ -0,0 +1,37 @@
+# tests/test_convergence.py
+import contextlib
+import io
+from convergence import RunController
+from model import EconomyModel
+from params import default_params
+from sinks import NumpySink
+
+
+def controlled_run(sink=None, **collector):
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=2, sink=sink, **collector, **default_params())
+        controller = RunController(model, window=5, stop_on_collapse=False)
+        outcome = controller.run(60)
+    if sink is not None:
+        sink.close()
+    return controller, outcome
+
+
+def test_sink_trimming_does_not_hide_rows(tmp_path):
+    expected, expected_outcome = controlled_run()
+    actual, outcome = controlled_run(NumpySink(str(tmp_path / "run"), flush_every=4))
+    assert expected_outcome["stop_reason"] == "steady_state"
+    assert outcome == expected_outcome
+    for name, window in expected.windows.items():
+        assert list(actual.windows[name].values) == list(window.values)
+
+
+def test_decimated_rows_are_seen_once(tmp_path):
+    expected, _ = controlled_run(collect_interval=2, metric_decimation={"Average Price": 3})
+    actual, _ = controlled_run(NumpySink(str(tmp_path / "run")), collect_interval=2,
+                               metric_decimation={"Average Price": 3})
+    recorded = len(expected.model.datacollector.model_vars["Average Price"])
+    assert recorded > 1
+    assert expected.windows["Average Price"]._pushes == recorded
+    assert actual.windows["Average Price"]._pushes == recorded
+    assert list(actual.windows["Average Price"].values) == list(expected.windows["Average Price"].values)
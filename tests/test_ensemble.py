@@ -0,0 +1,51 @@
+# tests/test_ensemble.py
+import contextlib
+import io
+import numpy as np
+import pytest
+from ensemble import EnsembleEconomyModel
+from metrics import MODEL_METRICS
+from model import EconomyModel
+from params import default_params
+from vectorized import VectorizedEconomyModel
+
+
+def replica_metrics(ensemble, replica):
+    return np.column_stack([ensemble.datacollector.replica_vars[name].view()[:, replica]
+                            for name in MODEL_METRICS]).astype(float)
+
+
+@pytest.mark.parametrize("overrides", [{}, {"amortization_rate": 0.05, "distress_threshold": 0.7,
+                                            "initial_money_supply": 2e7}])
+def test_replicas_follow_vectorized_runs(overrides):
+    params = default_params()
+    params.update(num_consumers=200, num_firms=30, **overrides)
+    ensemble = EnsembleEconomyModel(seed=5, replicas=4, **params)
+    for _ in range(30):
+        ensemble.step()
+    for replica, seed in enumerate(ensemble.seeds):
+        model = VectorizedEconomyModel(seed=seed, **params)
+        for _ in range(30):
+            model.step()
+        expected = model.datacollector.get_model_vars_dataframe()[list(MODEL_METRICS)].to_numpy(dtype=float)
+        np.testing.assert_allclose(replica_metrics(ensemble, replica), expected, rtol=1e-9, atol=1e-9)
+
+
+def test_mean_matches_object_engine():
+    params = default_params()
+    ensemble = EnsembleEconomyModel(seed=3, replicas=20, **params)
+    for _ in range(30):
+        ensemble.step()
+    actual = np.array([replica_metrics(ensemble, replica) for replica in range(ensemble.replicas)])
+    runs = []
+    for seed in range(20):
+        with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+            model = EconomyModel(seed=seed, **params)
+            for _ in range(30):
+                model.step()
+        runs.append(model.datacollector.get_model_vars_dataframe()[list(MODEL_METRICS)].to_numpy(dtype=float))
+    expected = np.array(runs)
+    difference = np.abs(expected.mean(axis=0) - actual.mean(axis=0))
+    standard_error = np.sqrt(expected.var(axis=0, ddof=1) / len(expected) + actual.var(axis=0, ddof=1) / len(actual))
+    tolerance = 4 * standard_error + 1e-6 * np.abs(expected.mean(axis=0)) + 1e-9
+    assert (difference <= tolerance).all()
@@ -0,0 +1,52 @@
+# tests/test_flows.py
+import contextlib
+import io
+import numpy as np
+import pytest
+from flows import FlowAnalytics, REVERSED_TYPES, flow_keys
+from ledger import TRANSACTION_TYPES
+from model import EconomyModel
+from params import default_params
+
+
+def expected_flows(ledger, code, start):
+    # Amount per (payer, payee) over the ledger rows from position start on
+    columns = {name: values[start:] for name, values in ledger.arrays().items()}
+    rows = columns["type"] == code
+    senders, receivers = columns["sender"][rows], columns["receiver"][rows]
+    if code in REVERSED_TYPES:
+        senders, receivers = receivers, senders
+    keys, inverse = np.unique(flow_keys(senders, receivers), return_inverse=True)
+    return keys, np.bincount(inverse.reshape(-1), weights=columns["amount"][rows], minlength=len(keys))
+
+
+@pytest.mark.parametrize("window", [1, 3])
+def test_window_holds_exactly_its_steps(window):
+    # Compared against the rows each step actually wrote, not their step stamps
+    flows = FlowAnalytics(window=window, epsilon=0.0)
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, flows=flows, **default_params())
+        starts = []  # Ledger length when each step began
+        for _ in range(8):
+            starts.append(len(model.transactions))
+            model.step()
+            start = starts[-window] if len(starts) >= window else 0
+            for code in range(len(TRANSACTION_TYPES)):
+                keys, amounts = expected_flows(model.transactions, code, start)
+                matrix = flows.matrices[code]
+                live = np.abs(matrix.values) > 1e-6  # Expired pairs can leave rounding residue
+                np.testing.assert_array_equal(matrix.keys[live], keys)
+                np.testing.assert_allclose(matrix.values[live], amounts, rtol=1e-9)
+
+
+def test_decay_weights_rows_by_age():
+    flows = FlowAnalytics(decay=0.5, epsilon=0.0)
+    with contextlib.redirect_stderr(io.StringIO()):
+        model = EconomyModel(seed=1, flows=flows, **default_params())
+        for _ in range(5):
+            model.step()
+    columns = model.transactions.arrays()
+    for code in range(len(TRANSACTION_TYPES)):
+        rows = columns["type"] == code
+        expected = (columns["amount"][rows] * 0.5 ** (4 - columns["step"][rows])).sum()
+        assert flows.matrices[code].total() == pytest.approx(expected, rel=1e-9)
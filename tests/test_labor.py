@@ -0,0 +1,77 @@
+# tests/test_labor.py
+import contextlib
+import io
+from labor import LaborMarket
+from model import EconomyModel
+from params import default_params
+
+
+def expected_hires(model, max_hires):
+    # One matching round done the slow way: richest firms first (ties by id), each
+    # filling its vacancies from the unemployed in the order they became available
+    unemployed = model.registry.unemployed_consumers
+    waiting = []
+    for consumer in model.labor_market.queue:
+        if consumer.unique_id in unemployed and consumer not in waiting:
+            waiting.append(consumer)
+    hires = {}
+    for firm in sorted(model.registry.active_firms.values(), key=lambda firm: (-firm.capital, firm.unique_id)):
+        for _ in range(LaborMarket.vacancies(firm)):
+            if len(hires) == max_hires or not waiting:
+                return hires
+            hires[waiting.pop(0).unique_id] = firm.unique_id
+    return hires
+
+
+def employers(model):
+    return {consumer.unique_id: consumer.employer.unique_id
+            for consumer in model.registry.active_consumers.values() if consumer.employer is not None}
+
+
+def matched(model, max_hires):
+    expected = expected_hires(model, max_hires)
+    before = employers(model)
+    assert model.labor_market.match(max_hires) == len(expected)
+    after = employers(model)
+    assert {unique_id: firm for unique_id, firm in after.items() if unique_id not in before} == expected
+    return expected
+
+
+def test_matching_order():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        model.step()
+        firms = list(model.registry.active_firms.values())
+        # Lay off every second employee, then reshuffle the firms' capital so the
+        # heap has to follow the changes
+        for firm in firms:
+            for employee in list(firm.employees)[::2]:
+                firm.employees.remove(employee)
+                employee.employer = None
+            model.labor_market.firm_changed(firm)
+        for rank, firm in enumerate(firms):
+            firm.capital = 20000 + 7000 * ((rank * 7) % len(firms))
+        assert matched(model, 5)
+        assert matched(model, 1000)
+        # Equal capital goes to the lower id first
+        for firm in firms:
+            for employee in list(firm.employees):
+                firm.employees.remove(employee)
+                employee.employer = None
+            firm.capital = 30000
+        hires = matched(model, 3)
+        assert set(hires.values()) == {min(firm.unique_id for firm in firms)}
+
+
+def test_rehired_consumers_are_skipped():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        firm = next(iter(model.registry.active_firms.values()))
+        first = next(iter(model.registry.unemployed_consumers.values()))
+        # Hired elsewhere while still queued, then the queue is drained
+        first.employer = firm
+        firm.employees.append(first)
+        model.labor_market.firm_changed(firm)
+        hires = matched(model, len(model.registry.unemployed_consumers))
+    assert first.unique_id not in hires
+    assert first.employer is firm
@@ -0,0 +1,103 @@
+# tests/test_ledger.py
+import contextlib
+import io
+from collections import defaultdict
+import numpy as np
+import pytest
+from ledger import TRANSACTION_TYPES, TransactionLedger
+from model import EconomyModel
+from params import default_params
+
+
+def random_rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(step, int(rng.integers(5)), int(rng.integers(5)), float(rng.uniform(1, 100)),
+             TRANSACTION_TYPES[rng.integers(len(TRANSACTION_TYPES))])
+            for step in range(count // 10) for _ in range(10)]
+
+
+def recorded(rows, **options):
+    ledger = TransactionLedger(**options)
+    for index, row in enumerate(rows):
+        if index % 3:
+            ledger.append(*row)
+        else:
+            step, sender, receiver, amount, transaction_type = row
+            ledger.extend(step, [sender], [receiver], [amount], transaction_type)
+    return ledger
+
+
+def edge_recount(rows):
+    edges = defaultdict(lambda: [0.0, 0])
+    for _, sender, receiver, amount, transaction_type in rows:
+        edge = edges[(sender, receiver, TRANSACTION_TYPES.index(transaction_type))]
+        edge[0] += amount
+        edge[1] += 1
+    return edges
+
+
+def assert_rows(ledger, rows):
+    columns = ledger.arrays()
+    assert columns['step'].tolist() == [row[0] for row in rows]
+    assert columns['sender'].tolist() == [row[1] for row in rows]
+    assert columns['receiver'].tolist() == [row[2] for row in rows]
+    assert columns['amount'].tolist() == [row[3] for row in rows]
+    assert [TRANSACTION_TYPES[code] for code in columns['type']] == [row[4] for row in rows]
+
+
+@pytest.mark.parametrize("retention", [None, 7, 64, 1000])
+def test_retained_rows_are_the_newest(retention):
+    rows = random_rows(500)
+    ledger = recorded(rows, retention=retention, chunk_size=16)
+    kept = rows[-retention:] if retention else rows
+    assert ledger.total == len(rows)
+    assert len(ledger) == len(kept)
+    assert_rows(ledger, kept)
+    assert [(t.timestamp, t.sender, t.receiver, t.amount, t.transaction_type) for t in ledger] == kept
+
+
+@pytest.mark.parametrize("retention", [None, 7])
+def test_edge_totals_cover_the_full_history(retention):
+    rows = random_rows(500, seed=1)
+    edges = recorded(rows, retention=retention, chunk_size=16).edge_totals()
+    expected = edge_recount(rows)
+    assert set(edges) == set(expected)
+    for key, (amount, count) in expected.items():
+        assert edges[key][0] == pytest.approx(amount)
+        assert edges[key][1] == count
+
+
+def test_set_retention_keeps_the_newest_rows():
+    rows = random_rows(200, seed=2)
+    ledger = recorded(rows[:120], chunk_size=16)
+    ledger.set_retention(50)
+    assert_rows(ledger, rows[70:120])
+    for row in rows[120:]:
+        ledger.append(*row)
+    assert_rows(ledger, rows[150:])
+    assert ledger.total == len(rows)
+
+
+def test_listeners_see_each_row_once():
+    rows = random_rows(100, seed=3)
+    ledger = TransactionLedger(retention=10, chunk_size=16)
+    chunks = []
+    ledger.listeners.append(chunks.append)
+    for row in rows:
+        ledger.append(*row)
+    ledger.flush()
+    assert sum(len(chunk['step']) for chunk in chunks) == len(rows)
+    assert np.concatenate([chunk['amount'] for chunk in chunks]).tolist() == [row[3] for row in rows]
+
+
+def test_model_rows_are_stamped_with_their_step():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        totals = []
+        for _ in range(5):
+            model.step()
+            totals.append(model.transactions.total)
+    steps = model.transactions.arrays()['step']
+    # Rows written by the phases after schedule.step carry the same step as the agents'
+    counts = np.bincount(steps, minlength=5)
+    assert counts.tolist() == np.diff([0] + totals).tolist()
@@ -0,0 +1,105 @@
+# tests/test_loanbook.py
+import contextlib
+import io
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from agents.loanbook import LoanBook
+from model import EconomyModel
+from params import default_params
+
+
+class Reference:
+    # The loan book kept as a plain list of per-loan dicts
+    def __init__(self):
+        self.loans = []
+        self.written_off = set()
+
+    def issue(self, agent, amount, rate, step):
+        self.loans.append({"agent": agent, "principal": amount, "rate": rate, "step": step,
+                           "outstanding": amount})
+
+    def dues(self, agents, amortization_rate):
+        interest = {agent.unique_id: 0.0 for agent in agents}
+        principal = dict(interest)
+        for loan in self.loans:
+            interest[loan["agent"].unique_id] += loan["outstanding"] * loan["rate"]
+            principal[loan["agent"].unique_id] += loan["outstanding"] * amortization_rate
+        return interest, principal
+
+    def repay(self, paid, amortization_rate):
+        for loan in self.loans:
+            if loan["agent"].unique_id in paid:
+                loan["outstanding"] -= loan["outstanding"] * amortization_rate
+                if loan["outstanding"] < 1e-9:
+                    loan["outstanding"] = 0.0
+
+    def compact(self):
+        self.loans = [loan for loan in self.loans
+                      if loan["outstanding"] > 0 and loan["agent"].unique_id not in self.written_off]
+        self.written_off.clear()
+
+
+def assert_same(book, reference, agents):
+    assert len(book) == len(reference.loans)
+    for agent in agents:
+        assert book.loans_of(agent) == pytest.approx([
+            (loan["principal"], loan["rate"], loan["step"], loan["outstanding"])
+            for loan in reference.loans if loan["agent"] is agent])
+
+
+def test_dues_and_compaction_match_a_reference():
+    rng = np.random.default_rng(0)
+    agents = [SimpleNamespace(unique_id=unique_id) for unique_id in range(10, 20)]
+    book, reference = LoanBook(capacity=4), Reference()
+    amortization_rate = 0.25
+    for step in range(30):
+        for _ in range(rng.integers(4)):
+            agent = agents[rng.integers(len(agents))]
+            amount, rate = float(rng.uniform(100, 1000)), float(rng.uniform(0.01, 0.1))
+            book.issue(agent, amount, rate, step)
+            reference.issue(agent, amount, rate, step)
+
+        _, principal, interest_due, principal_due = book.dues(amortization_rate)
+        interest, principal_expected = reference.dues(agents, amortization_rate)
+        for agent in agents:
+            index = book.borrower_index.get(agent.unique_id)
+            assert (interest_due[index] if index is not None else 0.0) == pytest.approx(interest[agent.unique_id])
+            assert (principal_due[index] if index is not None else 0.0) == pytest.approx(
+                principal_expected[agent.unique_id])
+
+        paid = [index for index in range(len(book.borrowers)) if rng.random() < 0.5]
+        book.repay(paid, principal)
+        reference.repay({book.borrowers[index].unique_id for index in paid}, amortization_rate)
+        if step % 7 == 3:
+            agent = agents[rng.integers(len(agents))]
+            book.write_off(agent)
+            reference.written_off.add(agent.unique_id)
+        book.compact()
+        reference.compact()
+        assert_same(book, reference, agents)
+    assert len(book.borrowers) == len(agents)
+
+
+def test_full_repayment_drops_the_loan():
+    agent = SimpleNamespace(unique_id=1)
+    book = LoanBook()
+    book.issue(agent, 500.0, 0.05, 0)
+    _, principal, _, _ = book.dues(1.0)
+    book.repay([0], principal)
+    book.compact()
+    assert len(book) == 0
+    assert book.outstanding_by_borrower().tolist() == [0.0]
+
+
+def test_model_book_holds_only_live_loans():
+    params = default_params()
+    params.update(amortization_rate=0.1)
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **params)
+        for _ in range(8):
+            model.step()
+    book = model.central_bank.loan_book
+    assert len(book)
+    assert (book.view('outstanding') > 0).all()
+    assert not any(book.borrowers[index].bankrupt for index in book.view('borrower').tolist())
@@ -0,0 +1,46 @@
+# tests/test_metrics.py
+import pandas as pd
+from metrics import MetricsCollector
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def step(self, collector):
+        collector.collect(self)
+        self.value += 1
+
+
+def collected(steps, **options):
+    collector = MetricsCollector({"value": lambda model: model.value}, **options)
+    model = Counter()
+    for _ in range(steps):
+        model.step(collector)
+    return collector
+
+
+def test_every_step_keeps_datacollector_index():
+    frame = collected(4).get_model_vars_dataframe()
+    pd.testing.assert_index_equal(frame.index, pd.RangeIndex(4))
+    assert list(frame["value"]) == [0, 1, 2, 3]
+
+
+def test_sparse_rows_are_indexed_by_step():
+    frame = collected(7, interval=3).get_model_vars_dataframe()
+    assert frame.index.name == "step"
+    assert list(frame.index) == list(frame["value"]) == [0, 3, 6]
+
+    frame = collected(5, decimation={"value": 2}).get_model_vars_dataframe()
+    assert frame.index.name == "step"
+    assert list(frame.index) == list(frame["value"]) == [0, 2, 4]
+
+
+def test_trimmed_rows_keep_their_steps():
+    collector = collected(3)
+    collector.trim()
+    model = Counter()
+    model.value = 3
+    model.step(collector)
+    frame = collector.get_model_vars_dataframe()
+    assert list(frame.index) == list(frame["value"]) == [3]
@@ -0,0 +1,66 @@
+# tests/test_registry.py
+import contextlib
+import io
+from agents import Consumer, Firm
+from model import EconomyModel
+from params import default_params
+
+
+def partitions(model):
+    # The registry's partitions rebuilt from the scheduled agents' own flags
+    agents = sorted(model.schedule.agents, key=lambda agent: agent.unique_id)
+    firms = [agent for agent in agents if isinstance(agent, Firm)]
+    consumers = [agent for agent in agents if isinstance(agent, Consumer)]
+    return {
+        "active_firms": [firm.unique_id for firm in firms if not firm.bankrupt],
+        "bankrupt_firms": [firm.unique_id for firm in firms if firm.bankrupt],
+        "active_consumers": [consumer.unique_id for consumer in consumers if not consumer.bankrupt],
+        "bankrupt_consumers": [consumer.unique_id for consumer in consumers if consumer.bankrupt],
+        "unemployed_consumers": [consumer.unique_id for consumer in consumers
+                                 if not consumer.bankrupt and consumer.employer is None],
+    }
+
+
+def registered(model):
+    return {name: sorted(getattr(model.registry, name)) for name in partitions(model)}
+
+
+def test_partitions_follow_agent_state():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        assert registered(model) == partitions(model)
+        for _ in range(12):
+            model.step()
+            assert registered(model) == partitions(model)
+        consumer = next(iter(model.registry.active_consumers.values()))
+        consumer.bankrupt = True
+        assert registered(model) == partitions(model)
+        consumer.bankrupt = False
+        firm = next(iter(model.registry.bankrupt_firms.values()))
+        firm.bankrupt = False
+        assert registered(model) == partitions(model)
+    assert list(model.registry.active_firms) == [firm.unique_id]
+
+
+def test_active_partitions_keep_creation_order():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        model.step()
+    active = partitions(model)["active_consumers"]
+    assert list(model.registry.active_consumers) == active
+    assert [agent.unique_id for agent in model.registry.consumers()] == active
+
+
+def test_listeners_see_every_change():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=1, **default_params())
+        seen = []
+        model.registry.listeners.append(lambda kind, agent: seen.append((kind, agent.unique_id)))
+        firm = next(iter(model.registry.active_firms.values()))
+        employees = sorted(employee.unique_id for employee in firm.employees)
+        firm.bankrupt = True
+        firm.bankrupt = False
+    # Each flip is reported for the firm, plus one change per employee laid off
+    assert employees
+    assert seen.count(("firm", firm.unique_id)) == 2
+    assert sorted(unique_id for kind, unique_id in seen if kind == "consumer") == employees
@@ -0,0 +1,41 @@
+# tests/test_run.py
+import csv
+import pytest
+from params import default_params
+from run import build_model, run_model, write_metrics
+
+
+def read_rows(path):
+    with open(path, newline="") as handle:
+        return list(csv.DictReader(handle))
+
+
+def test_rows_are_labelled_with_their_step(tmp_path):
+    params = default_params()
+    params.update(collect_interval=2, metric_decimation={"Average Price": 2})
+    model = build_model(params, seed=1, engine="vectorized")
+    run_model(model, 9)
+    path = tmp_path / "metrics.csv"
+    write_metrics(model, path)
+
+    rows = read_rows(path)
+    assert [int(row["step"]) for row in rows] == [0, 2, 4, 6, 8]
+    collector = model.datacollector
+    assert [float(row["Money Supply"]) for row in rows] == list(collector.model_vars["Money Supply"])
+    # Average Price was only kept on every other recorded row
+    assert [row["Average Price"] != "" for row in rows] == [True, False, True, False, True]
+    assert [float(row["Average Price"]) for row in rows[::2]] == list(collector.model_vars["Average Price"])
+
+    write_metrics(model, path, last_only=True)
+    assert [row["step"] for row in read_rows(path)] == ["8"]
+
+
+def test_trimmed_collector_is_refused(tmp_path):
+    model = build_model(default_params(), seed=1, engine="vectorized")
+    run_model(model, 3)
+    model.datacollector.trim()
+    model.step()
+    with pytest.raises(ValueError):
+        write_metrics(model, tmp_path / "metrics.csv")
+    write_metrics(model, tmp_path / "metrics.csv", last_only=True)
+    assert [row["step"] for row in read_rows(tmp_path / "metrics.csv")] == ["3"]
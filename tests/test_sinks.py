@@ -0,0 +1,28 @@
+# tests/test_sinks.py
+import contextlib
+import io
+import numpy as np
+import pytest
+from model import EconomyModel
+from params import default_params
+from sinks import ColumnarSink, NumpySink, SinkReader
+
+
+def test_columnar_sink_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        ColumnarSink(str(tmp_path / "run"))
+
+
+def test_numpy_sink_round_trip(tmp_path):
+    path = str(tmp_path / "run")
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        expected = EconomyModel(seed=3, **default_params())
+        with NumpySink(path, flush_every=4) as sink:
+            model = EconomyModel(seed=3, sink=sink, **default_params())
+            for _ in range(10):
+                expected.step()
+                model.step()
+    metrics = SinkReader(path).metrics()
+    frame = expected.datacollector.get_model_vars_dataframe()
+    assert list(metrics.index) == list(frame.index)
+    np.testing.assert_array_equal(metrics[list(frame.columns)].to_numpy(dtype=float), frame.to_numpy(dtype=float))
@@ -0,0 +1,51 @@
+# tests/test_vectorized.py
+import contextlib
+import io
+import numpy as np
+import pytest
+from metrics import MODEL_METRICS
+from model import EconomyModel
+from params import default_params
+from vectorized import VectorizedEconomyModel
+
+SEEDS = range(20)
+STEPS = 30
+
+
+def run(model_class, seed, steps=STEPS, **overrides):
+    params = default_params()
+    params.update(overrides)
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = model_class(seed=seed, **params)
+        for _ in range(steps):
+            model.step()
+    return model.datacollector.get_model_vars_dataframe()[list(MODEL_METRICS)].to_numpy(dtype=float)
+
+
+@pytest.mark.parametrize("overrides", [{}, {"amortization_rate": 0.1, "initial_money_supply": 5000000}])
+def test_means_across_seeds_match_object_engine(overrides):
+    # The engines don't share per-seed paths (activation orders are drawn
+    # differently), so compare each series' mean over seeds at every step
+    expected = np.array([run(EconomyModel, seed, **overrides) for seed in SEEDS])
+    actual = np.array([run(VectorizedEconomyModel, seed, **overrides) for seed in SEEDS])
+    difference = np.abs(expected.mean(axis=0) - actual.mean(axis=0))
+    standard_error = np.sqrt((expected.var(axis=0, ddof=1) + actual.var(axis=0, ddof=1)) / len(SEEDS))
+    tolerance = 4 * standard_error + 1e-6 * np.abs(expected.mean(axis=0)) + 1e-9
+    worst = np.unravel_index(np.argmax(difference - tolerance), difference.shape)
+    assert (difference <= tolerance).all(), f"{MODEL_METRICS[worst[1]]} differs at step {worst[0]}"
+
+
+@pytest.mark.parametrize("model_class", [EconomyModel, VectorizedEconomyModel])
+def test_positional_seed(model_class):
+    params = default_params()
+    positional = [params.pop(name) for name in ("num_consumers", "num_firms", "initial_money_supply",
+                                                "base_interest_rate", "initial_firm_capital",
+                                                "initial_consumer_money", "market_volatility",
+                                                "bankruptcy_threshold", "satisfaction_threshold")]
+    with contextlib.redirect_stderr(io.StringIO()):
+        model = model_class(*positional, 20, 20, 7)
+        for _ in range(5):
+            model.step()
+    assert model._seed == 7  # Read back by checkpoints
+    metrics = model.datacollector.get_model_vars_dataframe()[list(MODEL_METRICS)].to_numpy(dtype=float)
+    np.testing.assert_array_equal(metrics, run(model_class, 7, steps=5))
@@ -0,0 +1,91 @@
+# tests/test_watch.py
+import contextlib
+import io
+from types import SimpleNamespace
+import pytest
+from agents import Consumer, Firm
+from model import EconomyModel
+from params import default_params
+from watch import ThresholdWatch
+
+
+class ScannedModel(EconomyModel):
+    # Checks every threshold pass against a full scan of the agents taken just before it
+    def __init__(self, *args, **kwargs):
+        self.passes = []
+        super().__init__(*args, **kwargs)
+
+    def handle_thresholds(self):
+        threshold, distress = self.bankruptcy_threshold, self.distress_threshold
+        firms = sorted(self.registry.active_firms.values(), key=lambda firm: firm.unique_id)
+        consumers = sorted(self.registry.active_consumers.values(), key=lambda consumer: consumer.unique_id)
+        failing = [firm for firm in firms if firm.capital < firm.initial_capital * threshold]
+        failing += [consumer for consumer in consumers if consumer.money < consumer.initial_money * threshold]
+        expected_loans = []
+        supply = self.central_bank.money_supply
+        for firm in firms:
+            if firm.initial_capital * threshold <= firm.capital < firm.initial_capital * distress and supply > 50000:
+                expected_loans.append(firm.unique_id)
+                supply -= 50000
+        book = self.central_bank.loan_book
+        issued_before = len(book)
+        super().handle_thresholds()
+        issued = [book.borrowers[index].unique_id for index in book.view('borrower')[issued_before:].tolist()]
+        self.passes.append((failing, expected_loans, issued))
+        for agent in failing:
+            assert agent.bankrupt
+        assert issued == expected_loans
+
+
+def bankrupt_count(model, kind):
+    return sum(isinstance(agent, kind) and agent.bankrupt for agent in model.schedule.agents)
+
+
+# A tight money supply ends in consumer loan defaults; a loose one funds distress loans
+@pytest.mark.parametrize("money_supply", [2000000, 10000000])
+def test_thresholds_fire_as_a_full_scan_would(money_supply):
+    params = default_params()
+    params.update(initial_money_supply=money_supply, initial_firm_capital=400000, initial_consumer_money=600,
+                  distress_threshold=0.9)
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = ScannedModel(seed=5, **params)
+        for _ in range(12):
+            model.step()
+            # Every bankruptcy is counted once, whichever path caused it
+            assert model.central_bank.bankrupted_firms == bankrupt_count(model, Firm)
+            assert model.central_bank.bankrupted_consumers == bankrupt_count(model, Consumer)
+            # Nobody active is left under the bankruptcy floor
+            for firm in model.registry.active_firms.values():
+                assert firm.capital >= firm.initial_capital * model.bankruptcy_threshold
+            for consumer in model.registry.active_consumers.values():
+                assert consumer.money >= consumer.initial_money * model.bankruptcy_threshold
+    assert any(failing for failing, _, _ in model.passes)
+    if money_supply > 2000000:
+        assert any(issued for _, _, issued in model.passes)
+    else:
+        assert model.central_bank.bankrupted_consumers
+
+
+def test_raising_the_threshold_requeues_agents():
+    with contextlib.redirect_stderr(io.StringIO()):  # Event warnings
+        model = EconomyModel(seed=5, **default_params())
+        model.step()
+        model.watch.drain_below_firms()
+        model.bankruptcy_threshold = 2.0
+        queued = [firm.unique_id for firm in model.watch.drain_below_firms()]
+    assert queued == sorted(firm.unique_id for firm in model.registry.active_firms.values()
+                            if firm.capital < firm.initial_capital * 2.0)
+    assert queued
+
+
+def test_queues_drain_in_id_order():
+    watch = ThresholdWatch()
+    agents = [SimpleNamespace(unique_id=unique_id, capital=0.0, watch_floor=1.0) for unique_id in (7, 3, 5)]
+    for agent in agents:
+        watch.firm_below(agent)
+        watch.firm_below(agent)  # Queued once however often it is reported
+        watch.firm_bankrupted(agent)
+    watch.firm_restored(agents[0])
+    assert [agent.unique_id for agent in watch.drain_bankrupted_firms()] == [3, 5]
+    assert [agent.unique_id for agent in watch.drain_below_firms()] == [3, 5, 7]
+    assert watch.drain_below_firms() == []
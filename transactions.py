@@ -1,7 +1,10 @@
 class Transaction:
-    def __init__(self, sender, receiver, amount, transaction_type):
+    # A single ledger row; agents are referenced by id so records never keep them alive
+    __slots__ = ('sender', 'receiver', 'amount', 'transaction_type', 'timestamp')
+
+    def __init__(self, sender, receiver, amount, transaction_type, timestamp=None):
         self.sender = sender
         self.receiver = receiver
         self.amount = amount
         self.transaction_type = transaction_type
-        self.timestamp = None
+        self.timestamp = timestamp
@@ -0,0 +1,579 @@
+# vectorized.py
+from mesa import Model
+import numpy as np
+from rng import RandomStreams
+from metrics import MetricsCollector, MODEL_METRICS
+
+# Struct-of-arrays engine: the same economy as EconomyModel, but every consumer and
+# firm lives in a slot of a NumPy array and each phase of a step runs as one batched
+# operation. EconomyModel's RandomActivation order is reproduced with per-agent
+# ranks (see step_agents), and the bank approves requests one at a time in that
+# order, resolved as runs over a running total instead of one Python call per
+# agent. Paths differ from EconomyModel's seed for seed, but not in distribution:
+# tests/test_vectorized.py compares the means of every series across seeds.
+#
+# All state carries a leading replica axis, (R, firms) or (R, consumers), with one
+# economy per entry of `seeds`. This model runs a single replica;
+# ensemble.EnsembleEconomyModel runs many through the same step. Only the random
+# draws are made per replica, each from its own named streams, so replica r
+# follows the single run seeded with seeds[r] (up to the rounding of sums taken
+# over padded rows). Agents are addressed by flat index into the state, and the
+# requests the bank serves in order (loans, in activation or id order) become an
+# (R, K) matrix of them, each row padded past its last request, so "approve while
+# the bank still has money" is a cumulative sum along the rows.
+class VectorizedEconomyModel(Model):
+    def __init__(self, num_consumers, num_firms, initial_money_supply, base_interest_rate,
+                 initial_firm_capital, initial_consumer_money, market_volatility=0.2,
+                 bankruptcy_threshold=0.3, satisfaction_threshold=0.5, width=20, height=20,
+                 seed=None, amortization_rate=0.0, collect_interval=1, metric_decimation=None,
+                 distress_threshold=None, seeds=None):
+        super().__init__()
+        if seed is not None:
+            self.reset_randomizer(seed)  # mesa's __new__ only sees a seed passed by keyword
+        self.seeds = [seed] if seeds is None else [int(replica_seed) for replica_seed in seeds]
+        self.replicas = R = len(self.seeds)
+        self.num_consumers = num_consumers
+        self.num_firms = num_firms
+        self.width = width
+        self.height = height
+        self.bankruptcy_threshold = bankruptcy_threshold
+        self.distress_threshold = distress_threshold  # Firms under it get loans; None means the bankruptcy threshold
+        self.satisfaction_threshold = satisfaction_threshold
+        self.market_volatility = market_volatility
+        # Same named streams as EconomyModel, so both engines draw identical shocks per firm
+        self.streams = [RandomStreams(replica_seed) for replica_seed in self.seeds]
+        self.rngs = [streams.stream("activation") for streams in self.streams]  # Agent order within a step
+        self.rows = np.arange(R)[:, None]  # Broadcasts a replica index against (R, n) state
+        # Flat index of each replica's first firm and consumer; gathers and
+        # scatters go through take/put on the flattened state
+        self.firm_offset = self.rows * num_firms
+        self.consumer_offset = self.rows * num_consumers
+        self.steps = 0
+        self.transaction_count = np.zeros(R, dtype=np.int64)
+        self.hire_counter = np.zeros(R, dtype=np.int64)
+        self.queue_counter = np.full(R, num_consumers, dtype=np.int64)
+
+        # Central bank, one per replica
+        self.base_interest_rate = base_interest_rate
+        self.amortization_rate = amortization_rate
+        self.money_supply = np.full(R, initial_money_supply, dtype=np.float64)
+        self.total_loans = np.zeros(R, dtype=np.float64)
+        self.bankrupted_firms = np.zeros(R, dtype=np.int64)
+        self.bankrupted_consumers = np.zeros(R, dtype=np.int64)
+        self.inflation_rate = np.zeros(R, dtype=np.float64)
+
+        # Firm state
+        shape = (R, num_firms)
+        self.firm_capital = np.full(shape, initial_firm_capital, dtype=np.float64)
+        self.firm_initial_capital = self.firm_capital.copy()
+        self.firm_price = np.full(shape, max(1, initial_firm_capital * 0.01), dtype=np.float64)
+        self.firm_capacity = np.full(shape, max(1, int(initial_firm_capital / 1000)), dtype=np.int64)
+        self.firm_inventory = np.zeros(shape, dtype=np.int64)
+        self.firm_wage = np.full(shape, 2000, dtype=np.float64)
+        self.firm_bankrupt = np.zeros(shape, dtype=bool)
+        self.firm_loan_balance = np.zeros(shape, dtype=np.float64)  # outstanding principal over all loans
+        self.firm_interest_due = np.zeros(shape, dtype=np.float64)  # sum of outstanding * rate over loans
+        self.firm_last_cost = np.zeros(shape, dtype=np.float64)
+
+        # Consumer state
+        shape = (R, num_consumers)
+        self.consumer_money = np.full(shape, initial_consumer_money, dtype=np.float64)
+        self.consumer_initial_money = self.consumer_money.copy()
+        self.consumer_satisfaction = np.ones(shape, dtype=np.float64)
+        self.consumer_debt = np.zeros(shape, dtype=np.float64)
+        self.consumer_employer = np.full(shape, -1, dtype=np.int64)  # firm index, -1 = unemployed
+        self.consumer_hired_at = np.zeros(shape, dtype=np.int64)  # hire order, for last-in layoffs
+        self.consumer_queued_at = np.tile(np.arange(num_consumers, dtype=np.int64), (R, 1))  # for FIFO hiring
+        self.consumer_bankrupt = np.zeros(shape, dtype=bool)
+        self.consumer_loan_balance = np.zeros(shape, dtype=np.float64)
+        self.consumer_interest_due = np.zeros(shape, dtype=np.float64)
+
+        # Grid positions (the object path places agents on a MultiGrid)
+        placements = [streams.stream("placement") for streams in self.streams]
+        self.firm_pos = np.stack([placement.integers(0, [width, height], size=(num_firms, 2))
+                                  for placement in placements])
+        self.consumer_pos = np.stack([placement.integers(0, [width, height], size=(num_consumers, 2))
+                                      for placement in placements])
+
+        self.distribute_employment()
+
+        self.datacollector = self.make_collector(collect_interval, metric_decimation)
+
+    def make_collector(self, interval, decimation):
+        # Same series as EconomyModel so they can be compared directly
+        collector = MetricsCollector(interval=interval, decimation=decimation)
+        collector.add_fused(MODEL_METRICS, VectorizedEconomyModel.collect_metrics)
+        return collector
+
+    def step(self):
+        self.volatility_shocks = np.stack([streams.uniform_shocks("volatility", self.num_firms)
+                                           for streams in self.streams])
+        self.step_agents()
+
+        # Collect interest and amortization on all loans
+        self.service_loans()
+
+        active_firms = ~self.firm_bankrupt
+        count = active_firms.sum(axis=1)
+        mean_price = np.where(active_firms, self.firm_price, 0).sum(axis=1) / np.maximum(count, 1)
+        self.inflation_rate = np.where(count > 0, (mean_price / self.money_supply) * 100, self.inflation_rate)
+
+        self.check_bankruptcies()
+
+        # Firms under the distress threshold request loans, in id order
+        distress = self.bankruptcy_threshold if self.distress_threshold is None else self.distress_threshold
+        at_risk = ~self.firm_bankrupt & (self.firm_capital < self.firm_initial_capital * distress)
+        if at_risk.any():
+            firms, valid = self._packed(at_risk)
+            amounts = np.full(firms.shape, 50000.0)
+            self._lend_to_firms(firms, self._approve_in_order(amounts, valid), amounts)
+
+        self.distribute_employment()
+
+        self.steps += 1
+        self.datacollector.collect(self)
+
+    def step_agents(self):
+        # One RandomActivation round in batches. Every slot gets a rank in a fresh
+        # random order of the bank, firms and consumers, and the bank's rank splits
+        # the round in two: the agents that act before it lends and those after.
+        # Within each half the firms step first, then each consumer acts on what it
+        # would have seen at its own rank: an employer ranked after it has not yet
+        # adjusted its price, paid wages or laid anyone off, and only the firms
+        # ranked before it have moved the average price. Each replica draws its own
+        # order.
+        slots = 1 + self.num_firms + self.num_consumers
+        ranks = np.stack([rng.permutation(slots) for rng in self.rngs])
+        bank_rank = ranks[:, :1]
+        self.firm_rank = ranks[:, 1:1 + self.num_firms]
+        self.consumer_rank = ranks[:, 1 + self.num_firms:]
+        # The same round as slots in activation order (the inverse permutation),
+        # split into the firms' and the consumers' orders as flat indices
+        by_rank = np.empty_like(ranks)
+        np.put(by_rank, ranks + self.rows * slots, np.broadcast_to(np.arange(slots), ranks.shape))
+        is_firm = (by_rank > 0) & (by_rank <= self.num_firms)
+        self.firm_order = by_rank[is_firm].reshape(self.firm_rank.shape) - 1 + self.firm_offset
+        self.firms_before = np.cumsum(is_firm, axis=1)  # Firms ranked up to each rank
+        consumer_order = by_rank[by_rank > self.num_firms].reshape(self.consumer_rank.shape)
+        consumer_order += self.consumer_offset - 1 - self.num_firms
+        self.price_before = self.firm_price.copy()
+        self.employer_before = self.consumer_employer.copy()
+        self.wage_received = np.zeros(self.consumer_money.shape, dtype=np.float64)
+
+        firms = ~self.firm_bankrupt
+        self.price_base = (np.where(firms, self.price_before, 0).sum(axis=1), firms.sum(axis=1))
+        early_firms = firms & (self.firm_rank < bank_rank)
+        # Active consumers in activation order; those before the bank lead every row
+        consumers, valid = self._ordered(~self.consumer_bankrupt, consumer_order)
+        early = valid & (self.consumer_rank.take(consumers) < bank_rank)
+        split = early.sum(axis=1)
+        width = int(split.max(initial=0))
+
+        self.step_firms(np.flatnonzero(early_firms))
+        self.step_consumers(consumers[:, :width], early[:, :width], early_firms)
+        self.lend_to_agents()
+        self.step_firms(np.flatnonzero(firms & ~early_firms))
+        self.step_consumers(*self._from_column(consumers, valid, split), firms)
+
+    def _packed(self, mask):
+        # Flat positions of the True entries of each row of an (R, n) mask, packed
+        # to the front of an (R, K) matrix, plus a mask of the real entries. The
+        # padding points at position 0, so only real entries may be written back.
+        entries = np.flatnonzero(mask)
+        if self.replicas == 1:
+            return entries[None], np.ones((1, entries.size), dtype=bool)
+        counts = mask.sum(axis=1)
+        width = int(counts.max(initial=0))
+        # Row r's entries start at r * width
+        start = np.arange(self.replicas) * width - (np.cumsum(counts) - counts)
+        position = np.arange(entries.size) + np.repeat(start, counts)
+        packed = np.zeros((self.replicas, width), dtype=np.int64)
+        valid = np.zeros((self.replicas, width), dtype=bool)
+        packed.ravel()[position] = entries
+        valid.ravel()[position] = True
+        return packed, valid
+
+    def _ordered(self, mask, order):
+        # The slots `mask` selects as flat indices, following `order`: an (R, n)
+        # matrix of the flat indices of every slot in each row, in the order to serve
+        position, valid = self._packed(mask.take(order))
+        return order.take(position), valid
+
+    @staticmethod
+    def _from_column(index, valid, start):
+        # Each row of an (R, K) index matrix from its own column start[r] on,
+        # shifted to the front, with the columns past the end masked off
+        columns = np.arange(index.shape[1] - int(start.min(initial=0))) + start[:, None]
+        inside = columns < index.shape[1]
+        columns = np.minimum(columns, index.shape[1] - 1) + np.arange(index.shape[0])[:, None] * index.shape[1]
+        return index.take(columns), valid.take(columns) & inside
+
+    def _approve_in_order(self, amounts, valid):
+        # CentralBank approves a request while its supply exceeds the amount, one
+        # request at a time in row order. Each round approves every row's run up to
+        # its first denial, then drops whatever the remaining supply no longer covers.
+        approved = np.zeros_like(valid)
+        supply = self.money_supply.copy()
+        pending = valid & (amounts < supply[:, None])
+        columns = np.arange(valid.shape[1])
+        while pending.any():
+            spent = np.cumsum(np.where(pending, amounts, 0.0), axis=1)
+            denied = pending & (spent >= supply[:, None])
+            first = np.where(denied.any(axis=1), denied.argmax(axis=1), valid.shape[1])
+            run = pending & (columns < first[:, None])
+            approved |= run
+            supply -= np.where(run, amounts, 0.0).sum(axis=1)
+            pending &= columns > first[:, None]
+            pending &= amounts < supply[:, None]
+        return approved
+
+    def _lend_to_firms(self, firms, approved, amounts):
+        loans = np.where(approved, amounts, 0.0)
+        self.money_supply -= loans.sum(axis=1)
+        firms, loans = firms[approved], loans[approved]
+        self.firm_capital.ravel()[firms] += loans
+        self.firm_loan_balance.ravel()[firms] += loans
+        self.firm_interest_due.ravel()[firms] += loans * self.base_interest_rate
+
+    @staticmethod
+    def needed_capital(average_price, employed, satisfaction):
+        # Vector form of Consumer.calculate_needed_capital; average_price broadcasts
+        # against the (R, n) consumer values
+        employment_factor = np.where(employed, 0.5, 1.5)
+        satisfaction_factor = 1 - satisfaction
+        needed = (average_price * 10) * employment_factor * (1 + satisfaction_factor)
+        return np.maximum(needed, 0)
+
+    def lend_to_agents(self):
+        # The bank lends to every active consumer in id order, as it walks the registry
+        consumers, valid = self._packed(~self.consumer_bankrupt)
+        needed = self.needed_capital(self.average_price()[:, None], self.consumer_employer.take(consumers) >= 0,
+                                     self.consumer_satisfaction.take(consumers))
+        approved = self._approve_in_order(needed, valid)
+        total = np.where(approved, needed, 0.0).sum(axis=1)
+        self.money_supply -= total
+        self.total_loans += total
+        consumers, loans = consumers[approved], needed[approved]
+        self.consumer_money.ravel()[consumers] += loans
+        self.consumer_debt.ravel()[consumers] += loans
+
+    def headcount(self):
+        employer = self.consumer_employer
+        employed = employer >= 0
+        slots = (employer + self.firm_offset)[employed]
+        return np.bincount(slots, minlength=self.replicas * self.num_firms).reshape(self.replicas, self.num_firms)
+
+    def step_firms(self, firms):
+        # `firms` are the flat indices of the firms stepping now; wage loans reach
+        # the bank in activation order
+        if not firms.size:
+            return
+        self.adjust_price(firms)
+        self.produce(firms)
+        self.pay_wages(firms)
+
+        # invest
+        capital = self.firm_capital.ravel()
+        investing = firms[capital[firms] > 200]
+        capital[investing] -= 200
+        self.firm_capacity.ravel()[investing] += 200 // 1000
+
+    def adjust_price(self, firms):
+        inventory_factor = np.clip(1 - (self.firm_inventory.take(firms) / (self.firm_capacity.take(firms) * 2)), 0.8, 1.2)
+        volatility_factor = 1 + self.volatility_shocks.take(firms) * self.market_volatility
+        price = self.firm_price.ravel()
+        price[firms] = np.maximum(1, price[firms] * inventory_factor * volatility_factor)
+
+    def produce(self, firms):
+        labor_cost = self.firm_wage.take(firms) * self.headcount().take(firms)
+        capacity = self.firm_capacity.take(firms)
+        capital = self.firm_capital.take(firms)
+        total_cost = labor_cost + capacity * 20
+
+        # If unable to pay costs, reduce production capacity
+        short = total_cost > capital
+        capacity = np.where(short, np.maximum(1, np.trunc(capital / (labor_cost + 50))).astype(np.int64), capacity)
+        total_cost = np.where(short, capacity * 50 + labor_cost, total_cost)
+
+        self.firm_capacity.ravel()[firms] = capacity
+        self.firm_capital.ravel()[firms] -= total_cost
+        self.firm_inventory.ravel()[firms] += capacity
+        self.firm_last_cost.ravel()[firms] = total_cost
+
+    def pay_wages(self, firms):
+        headcount = self.headcount()
+        wage = self.firm_wage
+        capital = self.firm_capital.ravel()
+        shortfall = np.zeros(wage.shape)
+        shortfall.ravel()[firms] = np.maximum(0, wage.take(firms) * headcount.take(firms) - capital[firms])
+
+        # Firms short of the wage bill borrow the whole shortfall in bank order
+        borrowing = shortfall > 0
+        if borrowing.any():
+            ordered, valid = self._ordered(borrowing, self.firm_order)
+            requested = shortfall.take(ordered)
+            approved = self._approve_in_order(requested, valid)
+            self._lend_to_firms(ordered, approved, requested)
+
+            # ... and the rest lay off just enough employees to cover wages
+            denied = ordered[valid & ~approved]
+            layoffs = np.minimum(headcount.take(denied),
+                                 np.ceil(shortfall.take(denied) / wage.take(denied)).astype(np.int64))
+            if layoffs.any():
+                quota = np.zeros_like(headcount)
+                np.put(quota, denied, layoffs)
+                self.lay_off_employees(quota)
+                headcount = self.headcount()
+
+            # A firm that still can't cover its (possibly empty) wage bill goes bankrupt
+            failing = denied[wage.take(denied) * headcount.take(denied) > capital[denied]]
+            if failing.size:
+                self.firm_bankrupt.ravel()[failing] = True
+                closing = np.zeros(self.firm_bankrupt.shape, dtype=bool)
+                np.put(closing, failing, True)
+                self._release_employees(closing)
+                firms = firms[~np.isin(firms, failing)]
+
+        capital[firms] -= wage.take(firms) * headcount.take(firms)
+        paying = np.zeros(self.firm_bankrupt.shape, dtype=bool)
+        np.put(paying, firms, True)
+        employer = self.consumer_employer
+        employer_slot = np.maximum(employer, 0) + self.firm_offset
+        paid = np.flatnonzero((employer >= 0) & paying.take(employer_slot))
+        wages = wage.take(employer_slot.ravel()[paid])
+        self.wage_received.ravel()[paid] = wages
+        self.consumer_money.ravel()[paid] += wages
+        self.transaction_count += np.bincount(paid // self.num_consumers, minlength=self.replicas)
+
+    def lay_off_employees(self, quota):
+        # Each firm lets go of its most recent hires first, like Firm.lay_off_employees;
+        # quota holds the number to let go per (replica, firm)
+        employer = self.consumer_employer
+        firm_slot = np.maximum(employer, 0) + self.firm_offset
+        staff = np.flatnonzero((employer >= 0) & (quota.take(firm_slot) > 0))
+        firm_slot = firm_slot.ravel()[staff]
+        order = np.lexsort((-self.consumer_hired_at.ravel()[staff], firm_slot))
+        staff, firm_slot = staff[order], firm_slot[order]
+        group_start = np.searchsorted(firm_slot, firm_slot, side='left')
+        rank = np.arange(staff.size) - group_start
+        let_go = staff[rank < quota.ravel()[firm_slot]]
+        employer.ravel()[let_go] = -1
+        self._queue_unemployed(let_go)
+
+    def _release_employees(self, closing):
+        employer = self.consumer_employer
+        firm_slot = np.maximum(employer, 0) + self.firm_offset
+        released = np.flatnonzero((employer >= 0) & closing.take(firm_slot))
+        order = np.lexsort((self.consumer_hired_at.ravel()[released], firm_slot.ravel()[released]))
+        released = released[order]
+        employer.ravel()[released] = -1
+        self._queue_unemployed(released)
+
+    def _queue_unemployed(self, consumers):
+        # Consumers who just lost their job join the back of their replica's hiring
+        # queue, like LaborMarket's FIFO queue; they come (as flat indices) grouped
+        # by replica, in queue order within each
+        replicas = consumers // self.num_consumers
+        group_start = np.searchsorted(replicas, replicas, side='left')
+        self.consumer_queued_at.ravel()[consumers] = self.queue_counter[replicas] + np.arange(consumers.size) - group_start
+        self.queue_counter += np.bincount(replicas, minlength=self.replicas)
+
+    def service_loans(self):
+        # Vector form of CentralBank.service_loans: every borrower pays interest plus
+        # amortization, or goes bankrupt if it can't cover the total
+        amortization = self.amortization_rate
+        for cash, bankrupt, balance, interest_due in (
+                (self.firm_capital, self.firm_bankrupt, self.firm_loan_balance, self.firm_interest_due),
+                (self.consumer_money, self.consumer_bankrupt, self.consumer_loan_balance, self.consumer_interest_due)):
+            due = interest_due + balance * amortization
+            borrowers = np.flatnonzero(~bankrupt & (due > 0))
+            due = due.ravel()[borrowers]
+            failing = due > cash.ravel()[borrowers]
+            bankrupt.ravel()[borrowers[failing]] = True
+            paying, due = borrowers[~failing], due[~failing]
+            cash.ravel()[paying] -= due
+            self.money_supply += np.bincount(paying // cash.shape[1], weights=due, minlength=self.replicas)
+            if cash is self.consumer_money:
+                debt = self.consumer_debt.ravel()
+                debt[paying] = np.maximum(0, debt[paying] - due)
+            if amortization:
+                balance.ravel()[paying] *= 1 - amortization
+                interest_due.ravel()[paying] *= 1 - amortization
+
+    def average_price_seen(self, ranks, stepped_firms):
+        # Average active price at each of `ranks`: of the firms that have stepped
+        # this round (in activation order), those ranked earlier have adjusted their
+        # price and may have gone bankrupt in pay_wages. Firms that haven't stepped
+        # change nothing.
+        firms = self.firm_order
+        stepped = stepped_firms.take(firms)
+        active = ~self.firm_bankrupt.take(firms)
+        change = np.where(stepped, np.where(active, self.firm_price.take(firms), 0)
+                          - self.price_before.take(firms), 0)
+        zero = np.zeros((self.replicas, 1))
+        price_sum = np.concatenate((zero, np.cumsum(change, axis=1)), axis=1)
+        count = np.concatenate((zero.astype(np.int64), np.cumsum(stepped & ~active, axis=1)), axis=1)
+        # A row's running totals hold one more column than it has firms
+        before = self.firms_before.take(ranks + self.rows * self.firms_before.shape[1])
+        before += self.rows * (self.num_firms + 1)
+        base_sum, base_count = self.price_base
+        price_sum = base_sum[:, None] + price_sum.take(before)
+        count = base_count[:, None] - count.take(before)
+        return np.where(count > 0, price_sum / np.maximum(count, 1), 0)
+
+    def step_consumers(self, consumers, active, stepped_firms):
+        # `consumers` holds each replica's consumers stepping now, in activation
+        # order, as flat indices; `active` masks its real entries, and
+        # `stepped_firms` the firms that have stepped so far this round
+        if not active.any():
+            return
+        ranks = self.consumer_rank.take(consumers)
+        employer = self.employer_before.take(consumers)
+        employer_slot = np.maximum(employer, 0) + self.firm_offset
+        # An employer that already stepped shows its new price, wage and layoffs;
+        # one ranked later still shows the state it started the round with
+        employer_first = (employer >= 0) & (self.firm_rank.take(employer_slot) < ranks)
+        employer = np.where(employer_first, self.consumer_employer.take(consumers), employer)
+        price = np.where(employer_first, self.firm_price.take(employer_slot), self.price_before.take(employer_slot))
+        withheld = np.where(employer_first, 0.0, self.wage_received.take(consumers))
+        money = self.consumer_money.take(consumers) - withheld
+
+        # make_purchase from the employer
+        purchase = np.where(employer >= 0, np.minimum(money, price), 0)
+        buying = active & (purchase > 0)
+        money -= np.where(buying, purchase, 0)
+        self.transaction_count += buying.sum(axis=1)
+
+        # update_satisfaction
+        low = money < self.consumer_initial_money.take(consumers) * self.satisfaction_threshold
+        satisfaction = np.clip(self.consumer_satisfaction.take(consumers) + np.where(low, -0.1, 0.05), 0, 1)
+
+        # service_loans: consumers who can't cover basic expenditures request a
+        # loan, capped at their borrowing limit, and the bank serves them in order
+        basic_expenditure = self.needed_capital(self.average_price_seen(ranks, stepped_firms), employer >= 0,
+                                                satisfaction)
+        debt = self.consumer_debt.take(consumers)
+        loan_needed = np.minimum(basic_expenditure - money, money * 2.0 - debt)
+        requests, valid = self._packed(active & (money < basic_expenditure) & (loan_needed > 0))
+        amounts = loan_needed.take(requests)
+        approved = self._approve_in_order(amounts, valid)
+        self.money_supply -= np.where(approved, amounts, 0.0).sum(axis=1)
+        requests, amounts = requests[approved], amounts[approved]
+        money.ravel()[requests] += amounts
+        debt.ravel()[requests] += amounts
+
+        stepped = consumers[active]
+        np.put(self.consumer_satisfaction, stepped, satisfaction[active])
+        np.put(self.consumer_money, stepped, (money + withheld)[active])
+        borrowers = consumers.take(requests)
+        np.put(self.consumer_debt, borrowers, debt.take(requests))
+        self.consumer_loan_balance.ravel()[borrowers] += amounts
+        self.consumer_interest_due.ravel()[borrowers] += amounts * self.base_interest_rate
+
+    def check_bankruptcies(self):
+        # Threshold failures, then the bookkeeping for every bankruptcy however it
+        # came about (threshold, wage shortfall or loan default), as in
+        # EconomyModel.handle_thresholds: the counters follow the bankrupt masks and
+        # nobody stays employed by, or as, a bankrupt agent
+        threshold = self.bankruptcy_threshold
+        self.firm_bankrupt |= self.firm_capital < self.firm_initial_capital * threshold
+        self.consumer_bankrupt |= self.consumer_money < self.consumer_initial_money * threshold
+        self._release_employees(self.firm_bankrupt)
+        self.consumer_employer[self.consumer_bankrupt] = -1
+        self.bankrupted_firms = self.firm_bankrupt.sum(axis=1)
+        self.bankrupted_consumers = self.consumer_bankrupt.sum(axis=1)
+
+    def distribute_employment(self, initial_employment_rate=0.6):
+        active_consumers = ~self.consumer_bankrupt
+        employer = self.consumer_employer
+        available = active_consumers & (employer < 0)
+        active_firms = ~self.firm_bankrupt
+        # Active firms by capital, richest first (stable); bankrupt ones sort last
+        order = np.argsort(np.where(active_firms, -self.firm_capital, np.inf), axis=1, kind='stable')
+
+        initial_employment_target = (initial_employment_rate * active_consumers.sum(axis=1)).astype(np.int64)
+        currently_employed = (active_consumers & (employer >= 0)).sum(axis=1)
+        max_employees = np.minimum(
+            self.firm_capacity,
+            np.trunc(self.firm_capital / (self.firm_wage * 3)).astype(np.int64)
+        )
+        needed_employees = np.where(active_firms, np.maximum(0, max_employees - self.headcount()), 0)
+        needed_employees = np.take_along_axis(needed_employees, order, axis=1)
+
+        # Firms hire in capital order until the target or the candidate pool runs out
+        limit = np.maximum(0, np.minimum(initial_employment_target - currently_employed, available.sum(axis=1)))
+        hired_until = np.minimum(np.cumsum(needed_employees, axis=1), limit[:, None])
+        total = hired_until[:, -1] if self.num_firms else np.zeros(self.replicas, dtype=np.int64)
+        if not total.any():
+            return
+
+        # The k-th consumer in a replica's unemployment queue joins the firm whose
+        # hiring range covers k. Candidates sort by replica, then queue position, and
+        # rows are offset so one search serves every replica.
+        candidates = np.flatnonzero(available)
+        replicas = candidates // self.num_consumers
+        key = self.consumer_queued_at.ravel()[candidates] + replicas * (int(self.queue_counter.max()) + 1)
+        order_by_queue = np.argsort(key)
+        candidates, replicas = candidates[order_by_queue], replicas[order_by_queue]
+        counts = np.bincount(replicas, minlength=self.replicas)
+        rank = np.arange(candidates.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        hiring = rank < total[replicas]
+        hired, replicas, rank = candidates[hiring], replicas[hiring], rank[hiring]
+        stride = self.num_consumers + 1
+        position = np.searchsorted((hired_until + self.rows * stride).ravel(), rank + replicas * stride, side='right')
+        employer.ravel()[hired] = order.ravel()[position]
+        self.consumer_hired_at.ravel()[hired] = self.hire_counter[replicas] + rank
+        self.hire_counter += total
+
+    def collapsed(self):
+        # Every replica has run out of firms or consumers
+        return bool((self.firm_bankrupt.all(axis=1) | self.consumer_bankrupt.all(axis=1)).all())
+
+    def average_price(self):
+        # Average active price, per replica
+        active = ~self.firm_bankrupt
+        count = active.sum(axis=1)
+        return np.where(count > 0, np.where(active, self.firm_price, 0).sum(axis=1) / np.maximum(count, 1), 0.0)
+
+    def replica_metrics(self):
+        # All MODEL_METRICS as one value per replica, from one pass over the masks
+        active = ~self.consumer_bankrupt
+        count = active.sum(axis=1)
+        safe_count = np.maximum(count, 1)
+        employed = (active & (self.consumer_employer >= 0)).sum(axis=1)
+        employment_rate = np.where(count > 0, employed / safe_count, 0.0)
+        satisfaction = np.where(count > 0, np.where(active, self.consumer_satisfaction, 0).sum(axis=1) / safe_count, 0.0)
+        return (self.inflation_rate.copy(), employment_rate, satisfaction, self.bankrupted_firms.copy(),
+                self.bankrupted_consumers.copy(), self.money_supply.copy(), self.total_loans.copy(),
+                self.average_price(), self.economic_health_index(employment_rate, satisfaction))
+
+    def collect_metrics(self):
+        # Fused reporter for MODEL_METRICS: the single replica's values
+        return tuple(values[0].item() for values in self.replica_metrics())
+
+    def get_total_transactions(self):
+        return int(self.transaction_count[0])
+
+    def get_employment_rate(self):
+        return self.replica_metrics()[1][0].item()
+
+    def get_average_satisfaction(self):
+        return self.replica_metrics()[2][0].item()
+
+    def get_average_price(self):
+        return self.average_price()[0].item()
+
+    def get_economic_health_index(self):
+        return self.replica_metrics()[8][0].item()
+
+    def economic_health_index(self, employment_rate, satisfaction):
+        employment_weight = 0.3
+        satisfaction_weight = 0.2
+        bankruptcy_weight = 0.5
+
+        total_agents = self.num_consumers + self.num_firms
+        bankruptcy_rate = 1 - ((self.bankrupted_firms + self.bankrupted_consumers) / total_agents)
+
+        return (employment_rate * employment_weight +
+                satisfaction * satisfaction_weight +
+                bankruptcy_rate * bankruptcy_weight)
@@ -0,0 +1,295 @@
+# visualization.py
+import math
+import os
+import numpy as np
+from mesa.visualization.ModularVisualization import VisualizationElement, D3_JS_FILE
+from mesa.visualization.modules import CanvasGrid
+from ledger import TRANSACTION_TYPES
+
+NODE_STYLES = {"bank": ("red", 8), "firm": ("blue", 6), "consumer": ("green", 4)}
+BANKRUPT_COLOR = "gray"
+# Edge colour by the transaction types on it, first match wins
+EDGE_COLORS = (("purchase", "#00ff00"), ("wage", "#0000ff"), ("loan", "#ff0000"))
+DEFAULT_EDGE_COLOR = "#666666"
+
+
+def edge_width(amount):
+    # One width step per two orders of magnitude, so an edge is only resent when its
+    # volume moves between bands rather than on every purchase
+    return min(5, 1 + int(math.log10(1 + amount)) // 2)
+
+
+# Keeps the network as plain node and edge portrayals built from the registry and
+# the ledger's edge totals. Edges are collapsed to one per node pair, coloured by
+# type and sized by a banded weight. Above `max_consumers` consumers the view
+# switches to level-of-detail mode: consumers are clustered by employer (plus one
+# cluster each for the unemployed and the bankrupt), so the graph has about as many
+# nodes as there are firms. After the first frame on a model only what the
+# registry and ledger listeners reported is redone: the agents that were added or
+# changed partition, and the ledger edges that received transactions (plus, in
+# level-of-detail mode, the edges of consumers that moved between clusters).
+class NetworkView:
+    def __init__(self, max_consumers=500):
+        self.max_consumers = max_consumers
+        self.model = None
+        self.nodes = {}
+        self.edges = {}
+
+    def build(self, model):
+        # The whole graph, as of now
+        self.update(model)
+        return self.nodes, self.edges
+
+    def update(self, model):
+        # Bring the graph up to date. Returns (reset, nodes, edges, removed node ids,
+        # removed edge ids): after a reset nodes and edges are the whole graph,
+        # otherwise only the portrayals that changed since the previous call.
+        reset = model is not self.model
+        if reset:
+            model.registry.listeners.append(self._agent_changed)
+            model.transactions.listeners.append(self._chunk_flushed)
+            self.model = model
+        elif (self._consumer_count(model) > self.max_consumers) != self.lod:
+            reset = True  # Crossed into or out of level-of-detail mode
+        if reset:
+            self._start(model)
+        model.transactions.flush()
+
+        changed_nodes, removed_nodes = self._apply(self.nodes, self._update_nodes())
+        changed_edges, removed_edges = self._apply(self.edges, self._update_edges(model.transactions.edges))
+        if reset:
+            return True, list(self.nodes.values()), list(self.edges.values()), [], []
+        return False, changed_nodes, changed_edges, removed_nodes, removed_edges
+
+    def _start(self, model):
+        # Forget everything and queue every agent and ledger edge as changed
+        registry = model.registry
+        bank = model.central_bank
+        self.lod = self._consumer_count(model) > self.max_consumers
+        self.nodes = {bank.unique_id: self._node(bank.unique_id, "bank", False, f"bank {bank.unique_id}")}
+        self.edges = {}
+        self.node_of = {}  # consumer id -> cluster key, in level-of-detail mode
+        self.clusters = {}  # cluster key -> [label, count, bankrupt]
+        self.incident = {}  # consumer id -> ledger edges it is on, in level-of-detail mode
+        self.pair_of = {}  # ledger edge -> collapsed (source, target), None for a self-loop
+        self.folded = {}  # ledger edge -> amount folded into its collapsed edge so far
+        self.collapsed = {}  # (source, target) -> [amount, {type code: ledger edges}]
+        self.changed_agents = {}
+        self.changed_edges = {}  # Ledger edges with new transactions
+        self.moved_edges = {}  # Ledger edges of consumers that changed cluster
+        for firm in registry.firms():
+            self.changed_agents[firm.unique_id] = ("firm", firm)
+        for consumer in registry.consumers():
+            self.changed_agents[consumer.unique_id] = ("consumer", consumer)
+        self.changed_edges.update(dict.fromkeys(model.transactions.edge_totals()))
+
+    @staticmethod
+    def _consumer_count(model):
+        registry = model.registry
+        return len(registry.active_consumers) + len(registry.bankrupt_consumers)
+
+    def _agent_changed(self, kind, agent):
+        self.changed_agents[agent.unique_id] = (kind, agent)
+
+    def _chunk_flushed(self, chunk):
+        keys = np.stack((chunk['sender'], chunk['receiver'], chunk['type'].astype(np.int64)), axis=1)
+        self.changed_edges.update(dict.fromkeys(map(tuple, np.unique(keys, axis=0).tolist())))
+
+    def _update_nodes(self):
+        updates = {}
+        clusters_changed = {}
+        for unique_id, (kind, agent) in self.changed_agents.items():
+            if kind == "firm" or not self.lod:
+                updates[unique_id] = self._node(unique_id, kind, agent.bankrupt, f"{kind} {unique_id}")
+                continue
+            key, label = self._cluster_key(agent)
+            old = self.node_of.get(unique_id)
+            if old == key:
+                continue
+            if old is not None:
+                self.clusters[old][1] -= 1
+                clusters_changed[old] = True
+            cluster = self.clusters.get(key)
+            if cluster is None:
+                self.clusters[key] = [label, 1, agent.bankrupt]
+            else:
+                cluster[1] += 1
+            clusters_changed[key] = True
+            self.node_of[unique_id] = key
+            self.moved_edges.update(dict.fromkeys(self.incident.get(unique_id, ())))
+        self.changed_agents.clear()
+
+        color, size = NODE_STYLES["consumer"]
+        for key in clusters_changed:
+            label, count, bankrupt = self.clusters[key]
+            if not count:
+                del self.clusters[key]
+                updates[key] = None
+                continue
+            updates[key] = {"id": key, "size": round(size + math.sqrt(count), 1),
+                            "color": BANKRUPT_COLOR if bankrupt else color,
+                            "tooltip": f"{count} consumers ({label})"}
+        return updates
+
+    def _update_edges(self, totals):
+        # Collapsed totals are running sums, so only the ledger edges that moved or
+        # received transactions are folded in again
+        node_of, pair_of, folded, collapsed = self.node_of, self.pair_of, self.folded, self.collapsed
+        pairs_changed = {}
+        for edge in self.moved_edges:
+            sender, receiver, code = edge
+            source, target = node_of.get(sender, sender), node_of.get(receiver, receiver)
+            pair = None if source == target else (source, target)
+            old = pair_of[edge]
+            if pair != old:
+                amount = folded[edge]
+                if old is not None:
+                    entry = collapsed[old]
+                    entry[0] -= amount
+                    types = entry[1]
+                    types[code] -= 1
+                    if not types[code]:
+                        del types[code]
+                self._fold(pair, code, amount)
+                pair_of[edge] = pair
+                pairs_changed[old] = pairs_changed[pair] = True
+        self.moved_edges.clear()
+
+        for edge in self.changed_edges:
+            amount = totals[edge][0]
+            pair = pair_of.get(edge, False)
+            if pair is False:
+                sender, receiver, code = edge
+                source, target = node_of.get(sender, sender), node_of.get(receiver, receiver)
+                if source != sender:
+                    self.incident.setdefault(sender, []).append(edge)
+                if target != receiver:
+                    self.incident.setdefault(receiver, []).append(edge)
+                pair = pair_of[edge] = None if source == target else (source, target)
+                self._fold(pair, code, amount)
+            elif pair is not None:
+                collapsed[pair][0] += amount - folded[edge]
+            folded[edge] = amount
+            pairs_changed[pair] = True
+        self.changed_edges.clear()
+        pairs_changed.pop(None, None)
+
+        updates = {}
+        for pair in pairs_changed:
+            source, target = pair
+            key = f"{source}>{target}"
+            entry = collapsed.get(pair)
+            if entry is None or not entry[1]:
+                collapsed.pop(pair, None)
+                updates[key] = None
+                continue
+            types = {TRANSACTION_TYPES[code] for code in entry[1]}
+            color = next((color for name, color in EDGE_COLORS if name in types), DEFAULT_EDGE_COLOR)
+            updates[key] = {"id": key, "source": source, "target": target, "color": color,
+                            "width": edge_width(entry[0])}
+        return updates
+
+    def _fold(self, pair, code, amount):
+        # Add a ledger edge's amount to a collapsed edge, counting it under its type
+        if pair is None:
+            return
+        entry = self.collapsed.get(pair)
+        if entry is None:
+            self.collapsed[pair] = [amount, {code: 1}]
+            return
+        entry[0] += amount
+        types = entry[1]
+        types[code] = types.get(code, 0) + 1
+
+    @staticmethod
+    def _apply(portrayals, updates):
+        # Fold updates (None removes) into portrayals; returns what actually changed
+        changed, removed = [], []
+        for key, portrayal in updates.items():
+            if portrayal is None:
+                if portrayals.pop(key, None) is not None:
+                    removed.append(key)
+            elif portrayals.get(key) != portrayal:
+                portrayals[key] = portrayal
+                changed.append(portrayal)
+        return changed, removed
+
+    @staticmethod
+    def _node(unique_id, kind, bankrupt, tooltip):
+        color, size = NODE_STYLES[kind]
+        return {"id": unique_id, "size": size, "color": BANKRUPT_COLOR if bankrupt else color, "tooltip": tooltip}
+
+    @staticmethod
+    def _cluster_key(consumer):
+        if consumer.bankrupt:
+            return "consumers-bankrupt", "bankrupt"
+        if consumer.employer is None:
+            return "consumers-unemployed", "unemployed"
+        employer = consumer.employer.unique_id
+        return f"consumers-firm-{employer}", f"firm {employer}"
+
+
+# Network element that sends only what changed since the previous tick: new or
+# changed nodes and edges, plus the ids of removed ones. The full graph is sent
+# once after each model reset. All dashboard tabs share the server's one model,
+# so the deltas assume a single client, as the rest of the server does.
+class DeltaNetworkModule(VisualizationElement):
+    package_includes = [D3_JS_FILE]
+    local_includes = ["DeltaNetworkModule.js"]
+    local_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js")
+
+    def __init__(self, canvas_width=500, canvas_height=500, max_consumers=500):
+        self.view = NetworkView(max_consumers)
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.js_code = f"elements.push(new DeltaNetworkModule({canvas_width}, {canvas_height}));"
+
+    def render(self, model):
+        reset, nodes, edges, removed_nodes, removed_edges = self.view.update(model)
+        return {"reset": reset, "nodes": nodes, "edges": edges,
+                "removed_nodes": removed_nodes, "removed_edges": removed_edges}
+
+
+# CanvasGrid with a level-of-detail mode: above `max_consumers` consumers, each
+# cell's consumers are drawn as one circle sized by how many there are and shaded
+# by their average money ratio, while firms are still drawn one by one. The
+# payload is then bounded by the grid size rather than the population.
+class ClusteredCanvasGrid(CanvasGrid):
+    def __init__(self, portrayal_method, grid_width, grid_height, canvas_width=500, canvas_height=500,
+                 max_consumers=500, cell_capacity=20):
+        super().__init__(portrayal_method, grid_width, grid_height, canvas_width, canvas_height)
+        self.max_consumers = max_consumers
+        self.cell_capacity = cell_capacity  # Consumers per cell drawn at full size
+
+    def render(self, model):
+        consumers = model.registry.consumers()
+        if len(consumers) <= self.max_consumers:
+            return super().render(model)
+
+        grid_state = {0: [], 1: []}
+        for firm in model.registry.firms():
+            portrayal = self.portrayal_method(firm)
+            portrayal["x"], portrayal["y"] = firm.pos
+            grid_state[portrayal["Layer"]].append(portrayal)
+
+        cells = {}  # pos -> [consumers, active consumers, money ratio sum]
+        for consumer in consumers:
+            cell = cells.get(consumer.pos)
+            if cell is None:
+                cell = cells[consumer.pos] = [0, 0, 0.0]
+            cell[0] += 1
+            if not consumer.bankrupt:
+                cell[1] += 1
+                cell[2] += consumer.money / consumer.initial_money
+        for (x, y), (count, active, ratio_sum) in cells.items():
+            if active:
+                green = max(0, min(255, int(ratio_sum / active * 255)))
+                color = f"rgb(0,{green},0)"
+            else:
+                color = BANKRUPT_COLOR
+            grid_state[0].append({
+                "Shape": "circle", "Filled": "true", "Layer": 0, "x": x, "y": y, "Color": color,
+                "r": round(0.2 + 0.3 * min(1.0, count / self.cell_capacity), 2),
+                "text": str(count), "text_color": "white",
+            })
+        return grid_state
@@ -0,0 +1,70 @@
+# watch.py
+
+# Queues for the model's once-per-step bankruptcy handling, so nothing has to scan
+# every agent to find the few near a threshold:
+#   below      - agents whose balance was written under their watch floor (the
+#                distress floor for firms, the bankruptcy floor for consumers);
+#                Firm.capital and Consumer.money report every such write
+#   bankrupted - agents that went bankrupt since the last handling, by whatever
+#                path (threshold, wage shortfall or loan default), still waiting
+#                for their counters and employment links to be settled
+# Both are keyed by unique_id and drained in id order, which is the order the
+# full scans used to visit agents in.
+class ThresholdWatch:
+    def __init__(self):
+        self.below_firms = {}
+        self.below_consumers = {}
+        self.bankrupted_firms = {}
+        self.bankrupted_consumers = {}
+
+    def firm_below(self, firm):
+        self.below_firms[firm.unique_id] = firm
+
+    def consumer_below(self, consumer):
+        self.below_consumers[consumer.unique_id] = consumer
+
+    def firm_bankrupted(self, firm):
+        self.bankrupted_firms[firm.unique_id] = firm
+
+    def consumer_bankrupted(self, consumer):
+        self.bankrupted_consumers[consumer.unique_id] = consumer
+
+    def firm_restored(self, firm):
+        self.bankrupted_firms.pop(firm.unique_id, None)
+        if firm.capital < firm.watch_floor:
+            self.firm_below(firm)
+
+    def consumer_restored(self, consumer):
+        self.bankrupted_consumers.pop(consumer.unique_id, None)
+        if consumer.money < consumer.watch_floor:
+            self.consumer_below(consumer)
+
+    @staticmethod
+    def _drain(queue):
+        agents = [queue[unique_id] for unique_id in sorted(queue)]
+        queue.clear()
+        return agents
+
+    def drain_below_firms(self):
+        return self._drain(self.below_firms)
+
+    def drain_below_consumers(self):
+        return self._drain(self.below_consumers)
+
+    def drain_bankrupted_firms(self):
+        return self._drain(self.bankrupted_firms)
+
+    def drain_bankrupted_consumers(self):
+        return self._drain(self.bankrupted_consumers)
+
+    def rescan(self, firms, consumers):
+        # Rebuild the below queues from scratch, e.g. after the floors change or a
+        # model is restored from a checkpoint
+        self.below_firms.clear()
+        self.below_consumers.clear()
+        for firm in firms:
+            if not firm.bankrupt and firm.capital < firm.watch_floor:
+                self.firm_below(firm)
+        for consumer in consumers:
+            if not consumer.bankrupt and consumer.money < consumer.watch_floor:
+                self.consumer_below(consumer)